@@ -6,11 +6,12 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # Imported lazily by app.py / gui.py, so list them for the bundle
+    hiddenimports=['gui', 'settings_dialog', 'cli', 'lexicon', 'engines', 'watcher'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter'],
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,416 @@
+"""Transpiler benchmark suite over the synthetic corpus (see corpus.py).
+
+Usage:
+    python benchmark.py --sizes 1KB,1MB,100MB --output bench.json
+    python benchmark.py --compare bench.json --tolerance 0.2
+    python benchmark.py --sizes 1KB --skip-stages --adversarial 1MB
+
+Results are JSON; --compare exits non-zero when any case is slower than the
+baseline by more than the tolerance, --adversarial when a hostile input is
+not transpiled in linear time or runs past its time budget.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from corpus import (ADVERSARIAL_LINES, adversarial_document, adversarial_table, generate_document, parse_size,
+                    write_document)
+from transpiler import MATH_MAP, LatexTranspiler, TranspileTimeout, split_blocks
+
+# Documents up to this size are also benchmarked in memory; larger ones only stream from disk
+IN_MEMORY_LIMIT = 16 * 1024 * 1024
+
+# Adversarial inputs are timed at size / ADVERSARIAL_STEP and at size; a linear path keeps its
+# throughput, a quadratic one loses a factor ADVERSARIAL_STEP. Less than this share of the
+# smaller input's throughput counts as a collapse.
+ADVERSARIAL_STEP = 8
+ADVERSARIAL_MIN_SCALING = 0.5
+
+# Single-block inputs whose cost is per token or row, so a budget must stop them part-way
+# (the others are a few regex scans of one line, which a budget cannot interrupt)
+BUDGET_CASES = ('giant_math', 'many_articles', 'list_item', 'function_calls')
+
+# Budgeted runs get this share of the input's unbudgeted time and must stop before
+# BUDGET_MAX_SHARE of it has passed; inputs faster than BUDGET_MIN_SECONDS are too noisy to check.
+BUDGET_SHARE = 0.25
+BUDGET_MAX_SHARE = 0.75
+BUDGET_MIN_SECONDS = 0.01
+
+
+# Symbol-heavy tokens for the transpile_math comparison, and the speedup over
+# legacy_transpile_math it must keep (test_transpiler checks it)
+MATH_SAMPLE_TOKENS = 20000
+MATH_MIN_SPEEDUP = 5.0
+
+
+class NullWriter:
+    """Output sink that only counts characters."""
+
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, text: str) -> int:
+        self.chars += len(text)
+        return len(text)
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """Runs func repeat times and returns the fastest wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def result(name: str, seconds: float, ops: int, size_bytes: int = 0, **extra) -> Dict:
+    entry = {
+        'name': name,
+        'seconds': seconds,
+        'ops': ops,
+        'ops_per_s': ops / seconds if seconds else 0.0,
+        'ns_per_op': seconds * 1e9 / ops if ops else 0.0,
+    }
+    if size_bytes:
+        entry['size_bytes'] = size_bytes
+        entry['mb_per_s'] = size_bytes / 1e6 / seconds if seconds else 0.0
+    entry.update(extra)
+    return entry
+
+
+def bench_document(size_bytes: int, seed: int, repeat: int, jobs: int = 1) -> List[Dict]:
+    results = []
+    if size_bytes <= IN_MEMORY_LIMIT:
+        text = generate_document(size_bytes, seed)
+        encoded = len(text.encode('utf-8'))
+        # A new transpiler per run starts with an empty token cache, as in a new process
+        seconds = best_of(repeat, lambda: LatexTranspiler().transpile(text))
+        results.append(result(f'transpile/{size_bytes}', seconds, 1, encoded))
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                seconds = best_of(repeat, lambda: LatexTranspiler().transpile_parallel(text, jobs, executor=pool))
+            results.append(result(f'transpile_parallel/{size_bytes}', seconds, 1, encoded, jobs=jobs))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'corpus.txt')
+        write_document(path, size_bytes, seed)
+        encoded = os.path.getsize(path)
+
+        def run_stream():
+            with open(path, 'r', encoding='utf-8') as f:
+                LatexTranspiler().transpile_stream(f, NullWriter())
+
+        seconds = best_of(repeat, run_stream)
+        results.append(result(f'transpile_stream/{size_bytes}', seconds, 1, encoded))
+    return results
+
+
+def bench_stages(seed: int, repeat: int, sample_bytes: int = 256 * 1024) -> List[Dict]:
+    """Micro-benchmarks of the individual transpiler stages over one sample document."""
+    text = generate_document(sample_bytes, seed)
+    lines = [line.strip() for line in text.split('\n')[1:]]
+    body_lines = [line for line in lines if line and '\t' not in line]
+    paragraphs = [line for line in body_lines if not line.startswith(('-', '*', '#'))]
+    tokens = [token for line in paragraphs for token in line.split(' ') if token]
+    tables = [block for block in split_blocks(lines) if all('\t' in line for line in block)]
+    table_rows = sum(len(block) for block in tables)
+
+    transpiler = LatexTranspiler()
+    # Cold runs use a cache-less instance so math rendering is measured, not the LRU
+    uncached = LatexTranspiler(cache_size=0)
+    cases = [
+        ('detect_structure', len(body_lines), lambda: [transpiler.detect_structure(l) for l in body_lines]),
+        ('is_math_line', len(body_lines), lambda: [transpiler.is_math_line(l) for l in body_lines]),
+        ('is_math_token', len(tokens), lambda: [transpiler.is_math_token(t) for t in tokens]),
+        ('transpile_math', len(tokens), lambda: [transpiler.transpile_math(t) for t in tokens]),
+        ('process_inline_math/cold', len(paragraphs), lambda: [uncached.process_inline_math(l) for l in paragraphs]),
+        ('process_inline_math/warm', len(paragraphs), lambda: [transpiler.process_inline_math(l) for l in paragraphs]),
+        ('generate_table_block', table_rows, lambda: [uncached.generate_table_block(b) for b in tables]),
+    ]
+    return [result(name, best_of(repeat, func), ops) for name, ops, func in cases]
+
+
+def legacy_transpile_math(transpiler: LatexTranspiler, text: str) -> str:
+    """transpile_math as it was before the single-pass engine, kept as the baseline it is timed against."""
+    text = text.replace('%', r'\%')
+    text = text.replace('#', r'\#')
+    text = text.replace('$', r'\$')
+    text = text.replace('&', r'\&')
+
+    text = re.sub(r'\bPr(?=[\[\(])', r'\\Pr', text)
+    text = re.sub(r'\blog(?=[\[\(])', r'\\log', text)
+    text = re.sub(r'\bsin(?=[\[\(])', r'\\sin', text)
+    text = re.sub(r'\bcos(?=[\[\(])', r'\\cos', text)
+    text = re.sub(r'\blim(?=[\[\(])', r'\\lim', text)
+    text = re.sub(r'\b(Enc|Dec)k(?=\()', r'\\text{\1}_k', text)
+
+    for char, command in MATH_MAP.items():
+        text = text.replace(char, f" {command} ")
+
+    if '√' in text:
+        text = re.sub(r'√(\w+)', r'\\sqrt{\1}', text)
+        text = re.sub(r'√', r'\\sqrt', text)
+
+    text = re.sub(r'(?<!\\)\b([a-zA-Z])(\d)\b', r'\1_\2', text)
+
+    def two_letter_sub(match):
+        word = match.group(0)
+        if word in transpiler.english_anchors or "Pr" in word:
+            return word
+        return f"{match.group(1)}_{match.group(2)}"
+
+    text = re.sub(r'(?<!\\)\b([a-zA-Z])([a-zA-Z])\b', two_letter_sub, text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def math_sample_tokens(count: int, seed: int) -> List[str]:
+    """Short, symbol-heavy math tokens (operators, Greek letters, subscripts, function calls), as found inline."""
+    rng = random.Random(seed)
+    symbols = [char for char in MATH_MAP if char not in '{}']
+    pieces = symbols + ['x1', 'ab', 'y', '2', 'Pr[', 'log(', 'Enck(', ')', ']', '√n', '%', '=']
+    return [''.join(rng.choice(pieces) for _ in range(rng.randint(1, 4))) for _ in range(count)]
+
+
+def bench_math_engine(seed: int, repeat: int, count: int = MATH_SAMPLE_TOKENS) -> Tuple[List[Dict], List[str]]:
+    """Times transpile_math against legacy_transpile_math on symbol-heavy tokens.
+
+    Returns the results (the fused entry carries its speedup) and a
+    description of every token rendered differently by the two (expected: none).
+    """
+    tokens = math_sample_tokens(count, seed)
+    transpiler = LatexTranspiler()
+    mismatches = [f"transpile_math/compare: {token!r}" for token in tokens
+                  if transpiler.transpile_math(token) != legacy_transpile_math(transpiler, token)]
+    legacy = best_of(repeat, lambda: [legacy_transpile_math(transpiler, t) for t in tokens])
+    fused = best_of(repeat, lambda: [transpiler.transpile_math(t) for t in tokens])
+    return [
+        result('transpile_math/symbols/legacy', legacy, len(tokens)),
+        result('transpile_math/symbols', fused, len(tokens), speedup=legacy / fused if fused else 0.0),
+    ], mismatches
+
+
+def bench_adversarial(size_chars: int, repeat: int) -> Tuple[List[Dict], List[str]]:
+    """Times every corpus.ADVERSARIAL_LINES input at two sizes.
+
+    Returns the results and a description of every case whose throughput
+    collapsed at the larger size (i.e. that is not linear in its input).
+    """
+    results = []
+    collapses = []
+    for name, make_line in ADVERSARIAL_LINES.items():
+        entries = []
+        for size in (max(1, size_chars // ADVERSARIAL_STEP), size_chars):
+            if '\n' in make_line(16):
+                line = make_line(size)
+                encoded = len(line.encode('utf-8'))
+                seconds = best_of(repeat, lambda: LatexTranspiler(cache_size=0).process_inline_math(line))
+            else:
+                text = adversarial_document(name, size)
+                encoded = len(text.encode('utf-8'))
+                seconds = best_of(repeat, lambda: LatexTranspiler(cache_size=0).transpile(text))
+            entries.append(result(f'adversarial/{name}/{size}', seconds, 1, encoded))
+        small, large = entries
+        scaling = large['mb_per_s'] / small['mb_per_s'] if small['mb_per_s'] else 1.0
+        large['scaling'] = scaling
+        if scaling < ADVERSARIAL_MIN_SCALING:
+            collapses.append(f"adversarial/{name}: throughput at {size_chars} chars is "
+                             f"{scaling:.2f}x of that at {small['name'].rsplit('/', 1)[1]}")
+        results.extend(entries)
+    return results, collapses
+
+
+def bench_budget(size_chars: int, repeat: int) -> Tuple[List[Dict], List[str]]:
+    """Checks that a time budget stops the BUDGET_CASES documents and one huge table in time.
+
+    Each of them is a single block, so this catches budgets that are only
+    checked between blocks. Returns the results and the overruns.
+    """
+    documents = {name: adversarial_document(name, size_chars) for name in BUDGET_CASES}
+    documents['table'] = adversarial_table(size_chars)
+    results = []
+    overruns = []
+    for name, text in documents.items():
+        seconds = best_of(repeat, lambda: LatexTranspiler(cache_size=0).transpile(text))
+        if seconds < BUDGET_MIN_SECONDS:
+            continue
+        budget = seconds * BUDGET_SHARE
+        start = time.perf_counter()
+        try:
+            LatexTranspiler(cache_size=0).transpile(text, budget=budget)
+            timed_out = False
+        except TranspileTimeout:
+            timed_out = True
+        elapsed = time.perf_counter() - start
+        results.append(result(f'budget/{name}/{size_chars}', elapsed, 1, len(text.encode('utf-8')),
+                              budget=budget, unbudgeted_seconds=seconds, timed_out=timed_out))
+        if not timed_out or elapsed > seconds * BUDGET_MAX_SHARE:
+            overruns.append(f"budget/{name}: a {budget * 1000:.1f} ms budget stopped after "
+                            f"{elapsed * 1000:.1f} ms (unbudgeted: {seconds * 1000:.1f} ms)")
+    return results, overruns
+
+
+def profile_document(size_bytes: int, seed: int) -> Dict:
+    """Runs one profiled transpile and returns its per-stage stats (report goes to stderr)."""
+    transpiler = LatexTranspiler(profile=True)
+    transpiler.transpile(generate_document(size_bytes, seed))
+    print(transpiler.stats.report(), file=sys.stderr)
+    return transpiler.stats.as_dict()
+
+
+def time_command(command: List[str], repeat: int, env: Optional[Dict[str, str]] = None) -> float:
+    """Best wall time of a fresh Python process running command (raises if it fails)."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    full_env = {**os.environ, **(env or {})}
+
+    def run():
+        subprocess.run(command, cwd=here, env=full_env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return best_of(repeat, run)
+
+
+def bench_startup(repeat: int) -> List[Dict]:
+    """Cold-start times of the interpreter alone, the CLI path and the GUI path."""
+    python = sys.executable
+    results = [
+        result('startup/python', time_command([python, '-c', 'pass'], repeat), 1),
+        result('startup/import_transpiler', time_command([python, '-c', 'import transpiler'], repeat), 1),
+        result('startup/cli', time_command([python, 'app.py', '--help'], repeat), 1),
+    ]
+    # The CLI path must never pull in Qt
+    probe = ("import sys, app, cli; "
+             "sys.exit(any(m.startswith('PyQt6') for m in sys.modules))")
+    qt_free = subprocess.run([python, '-c', probe],
+                             cwd=os.path.dirname(os.path.abspath(__file__))).returncode == 0
+    results[-1]['qt_free'] = qt_free
+
+    # GUI: until the main window has been shown (needs PyQt6; offscreen so no display is required)
+    try:
+        seconds = time_command([python, 'app.py'], repeat,
+                               {'TEXT2TEX_STARTUP_PROBE': '1', 'QT_QPA_PLATFORM': 'offscreen'})
+        results.append(result('startup/gui', seconds, 1))
+    except subprocess.CalledProcessError:
+        results.append({'name': 'startup/gui', 'skipped': 'GUI failed to start (is PyQt6 installed?)'})
+    return results
+
+
+def environment() -> Dict:
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        revision = ''
+    return {
+        'revision': revision,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Returns a description of every case whose throughput regressed past tolerance."""
+    previous = {entry['name']: entry for entry in baseline.get('results', [])}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry['name'])
+        if not old or not old.get('ops_per_s') or 'ops_per_s' not in entry:
+            continue
+        ratio = entry['ops_per_s'] / old['ops_per_s']
+        entry['baseline_ratio'] = ratio
+        if ratio < 1 - tolerance:
+            regressions.append(f"{entry['name']}: {ratio:.2f}x of baseline")
+    return regressions
+
+
+def size_list(value: str) -> List[int]:
+    """argparse type for --sizes: one or more comma-separated sizes."""
+    sizes = [parse_size(s) for s in value.split(',') if s]
+    if not sizes:
+        raise argparse.ArgumentTypeError("needs at least one size")
+    return sizes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark LatexTranspiler on synthetic documents.")
+    parser.add_argument('--sizes', type=size_list, default='1KB,100KB,1MB',
+                        help="Comma-separated document sizes (default: 1KB,100KB,1MB; up to 100MB)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per case; the best is kept")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Processes for the transpile_parallel cases (default: CPU count; 1 skips them)")
+    parser.add_argument('--skip-stages', action='store_true', help="Only run whole-document cases")
+    parser.add_argument('--startup', action='store_true',
+                        help="Also measure cold-start time of the CLI and GUI entry points")
+    parser.add_argument('--adversarial', nargs='?', const='256KB', metavar='SIZE',
+                        help="Also time hostile inputs (corpus.ADVERSARIAL_LINES) of SIZE characters "
+                             "(default: 256KB) and fail if any is not linear-time or a budget fails to stop one")
+    parser.add_argument('--profile', action='store_true',
+                        help="Also run one profiled transpile of the largest in-memory size")
+    parser.add_argument('--output', help="Write JSON results here instead of stdout")
+    parser.add_argument('--compare', help="Baseline JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed throughput loss vs the baseline (default: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes
+    results = []
+    for size in sizes:
+        results.extend(bench_document(size, args.seed, args.repeat, args.jobs))
+    mismatches = []
+    if not args.skip_stages:
+        results.extend(bench_stages(args.seed, args.repeat))
+        math_results, mismatches = bench_math_engine(args.seed, args.repeat)
+        results.extend(math_results)
+    if args.startup:
+        results.extend(bench_startup(args.repeat))
+    collapses = []
+    if args.adversarial:
+        adversarial, collapses = bench_adversarial(parse_size(args.adversarial), args.repeat)
+        results.extend(adversarial)
+        budgeted, overruns = bench_budget(parse_size(args.adversarial), args.repeat)
+        results.extend(budgeted)
+        collapses.extend(overruns)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    report = {'environment': environment(), 'seed': args.seed, 'results': results}
+    if args.profile:
+        report['profile'] = profile_document(min(max(sizes), IN_MEMORY_LIMIT), args.seed)
+    if regressions:
+        report['regressions'] = regressions
+    if collapses:
+        report['collapses'] = collapses
+    if mismatches:
+        report['mismatches'] = mismatches
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload + '\n')
+    else:
+        print(payload)
+
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    for line in collapses:
+        print(f"COLLAPSE {line}", file=sys.stderr)
+    for line in mismatches:
+        print(f"MISMATCH {line}", file=sys.stderr)
+    return 1 if regressions or collapses or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
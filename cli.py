@@ -0,0 +1,371 @@
+"""Headless batch converter: NotebookLM .txt exports -> .tex (and optionally .pdf).
+
+Usage:
+    python cli.py exports/ more/*.txt -o out/ -j 8 --pdf
+    python cli.py --watch exports/ -o out/ --pdf
+
+Never imports Qt, so it can run on build hosts without a display.
+"""
+import argparse
+import glob
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from transpiler import LatexTranspiler
+
+
+class JobResult(NamedTuple):
+    source: str
+    tex_path: str
+    pdf_path: Optional[str]
+    input_bytes: int
+    transpile_seconds: float
+    compile_seconds: float
+    error: Optional[str]
+    latex_errors: int = 0    # recoverable LaTeX errors in a PDF that was still produced
+
+
+# One transpiler per worker process, built once by the pool initializer
+_worker_transpiler: Optional[LatexTranspiler] = None
+
+
+def _init_worker(settings: dict):
+    global _worker_transpiler
+    _worker_transpiler = LatexTranspiler()
+    _worker_transpiler.update_settings(settings)
+
+
+def glob_root(pattern: str) -> str:
+    """The directory part of a glob pattern before its first wildcard."""
+    parts = []
+    for part in os.path.dirname(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or os.curdir
+
+
+def collect_inputs(patterns: List[str], extension: str = '.txt') -> List[Tuple[str, str]]:
+    """Expands files, directories (searched recursively) and globs into sorted (file, root) pairs.
+
+    The root is the directory the file was found under; output_path_for
+    mirrors the file's path below it.
+    """
+    found = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for path in glob.glob(os.path.join(pattern, '**', f'*{extension}'), recursive=True):
+                found.setdefault(path, pattern)
+        elif os.path.isfile(pattern):
+            found.setdefault(pattern, os.path.dirname(pattern) or os.curdir)
+        else:
+            root = glob_root(pattern)
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    found.setdefault(path, root)
+    return sorted(found.items())
+
+
+def output_path_for(source: str, output_dir: Optional[str], root: Optional[str] = None) -> str:
+    """Next to the source, or under output_dir at the source's path relative to root."""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    if not output_dir:
+        return os.path.join(os.path.dirname(source), stem + '.tex')
+    relative = os.path.relpath(os.path.dirname(source), root) if root else os.curdir
+    return os.path.normpath(os.path.join(output_dir, relative, stem + '.tex'))
+
+
+def watch_root(source: str, roots: List[str]) -> Optional[str]:
+    """The innermost of roots that contains source."""
+    source = os.path.abspath(source)
+    containing = [root for root in roots
+                  if os.path.commonpath([os.path.abspath(root), source]) == os.path.abspath(root)]
+    return max(containing, key=lambda root: len(os.path.abspath(root)), default=None)
+
+
+def output_collisions(jobs: List[tuple]) -> List[Tuple[str, List[str]]]:
+    """Output paths that more than one job would write, with their sources."""
+    sources = {}
+    for job in jobs:
+        key = os.path.normcase(os.path.abspath(job[1]))
+        sources.setdefault(key, (job[1], []))[1].append(job[0])
+    return [(tex_path, names) for tex_path, names in sources.values() if len(names) > 1]
+
+
+def write_if_changed(path: str, content: str) -> None:
+    """Leaves unchanged files alone, so their mtimes stay meaningful to other tools.
+
+    Changed files are written to a temporary file and moved into place, as
+    in convert_file, so an interrupted run never leaves a truncated one.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return
+    except (OSError, UnicodeDecodeError):
+        pass
+    partial_path = f'{path}.{os.getpid()}.part'
+    try:
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(partial_path, path)
+    except BaseException:
+        try:
+            os.remove(partial_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_sections(transpiler: LatexTranspiler, source: str, tex_path: str,
+                   time_budget: Optional[float] = None) -> None:
+    """Writes tex_path as a master document plus one part file per section next to it."""
+    with open(source, 'r', encoding='utf-8') as f:
+        raw = f.read()
+    stem = os.path.splitext(os.path.basename(tex_path))[0]
+    # Part names end up in \include, which does not cope with spaces or special characters
+    prefix = re.sub(r'[^A-Za-z0-9_-]', '_', stem)
+    master, parts = transpiler.transpile_sections(raw, prefix, time_budget)
+    directory = os.path.dirname(tex_path)
+    for name, content in parts:
+        write_if_changed(os.path.join(directory, name + '.tex'), content)
+    write_if_changed(tex_path, master)
+
+
+def convert_file(source: str, tex_path: str, compile_pdf: bool = False,
+                 engine: Optional[str] = None, engine_path: Optional[str] = None, use_cache: bool = True,
+                 split_sections: bool = False, time_budget: Optional[float] = None,
+                 chunk_jobs: int = 1) -> JobResult:
+    """Transpiles one file (streaming) and optionally compiles it. Runs inside a worker.
+
+    With chunk_jobs > 1 the body is still read lazily, but transpiled in
+    chunks by that many processes (for a single large input). The .tex is
+    written to a temporary file and only moved into place once complete, so
+    a file that fails (e.g. by taking longer than time_budget seconds)
+    leaves any previous .tex untouched.
+    """
+    transpiler = _worker_transpiler or LatexTranspiler()
+    # Recompiles the rules if the lexicon was rebuilt since the last job (interned otherwise)
+    transpiler.update_settings({})
+    pdf_path = None
+    transpile_seconds = compile_seconds = 0.0
+    latex_errors = 0
+    try:
+        input_bytes = os.path.getsize(source)
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(tex_path) or os.curdir, exist_ok=True)
+        if split_sections:
+            write_sections(transpiler, source, tex_path, time_budget)
+        else:
+            partial_path = f'{tex_path}.{os.getpid()}.part'
+            try:
+                with open(source, 'r', encoding='utf-8') as src, open(partial_path, 'w', encoding='utf-8') as dst:
+                    if chunk_jobs > 1:
+                        transpiler.transpile_parallel_stream(src, dst, chunk_jobs, budget=time_budget)
+                    else:
+                        transpiler.transpile_stream(src, dst, time_budget)
+                os.replace(partial_path, tex_path)
+            except BaseException:
+                try:
+                    os.remove(partial_path)
+                except OSError:
+                    pass
+                raise
+        transpile_seconds = time.perf_counter() - start
+
+        if compile_pdf:
+            import compiler
+            from engines import resolve_engine
+            tex_engine = resolve_engine(engine, engine_path)
+            start, started = time.perf_counter(), time.time()
+            if split_sections:
+                pdf_path = compiler.compile_pdf_sections(tex_path, tex_engine)
+            else:
+                pdf_path = compiler.compile_pdf(tex_path, tex_engine, use_cache=use_cache)
+            compile_seconds = time.perf_counter() - start
+            latex_errors = len(compiler.log_errors(tex_path, started))
+    except subprocess.CalledProcessError as e:
+        return JobResult(source, tex_path, None, 0, transpile_seconds, 0.0,
+                         f"LaTeX compilation failed: {(e.stdout or '')[-200:].strip()}")
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return JobResult(source, tex_path, None, 0, transpile_seconds, 0.0, str(e))
+
+    return JobResult(source, tex_path, pdf_path, input_bytes, transpile_seconds, compile_seconds, None,
+                     latex_errors)
+
+
+def settings_from_args(args) -> dict:
+    """Builds the same settings dict the GUI's SettingsDialog produces."""
+    settings = {'include_title': not args.no_title}
+    if args.anchors:
+        settings['anchors'] = [a for a in args.anchors.split(',') if a]
+    if args.primers:
+        settings['primers'] = [p for p in args.primers.split(',') if p]
+    if args.lexicon:
+        settings['lexicon'] = args.lexicon
+    if args.section_id:
+        settings['section_id'] = args.section_id
+    if args.subsection_id:
+        settings['subsection_id'] = args.subsection_id
+    if args.table_segment_rows:
+        settings['table_segment_rows'] = args.table_segment_rows
+    return settings
+
+
+def non_negative_int(value: str) -> int:
+    """argparse type for counts where 0 means "off"."""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, not {number}")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Convert NotebookLM text exports to LaTeX.")
+    parser.add_argument('inputs', nargs='+', help="Files, directories or glob patterns")
+    parser.add_argument('-o', '--output-dir', help="Where to write .tex files (default: next to each input)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: CPU count; 1 runs in-process). "
+                             "A single input is split into chunks across them")
+    parser.add_argument('--pdf', action='store_true', help="Also compile each .tex to PDF")
+    parser.add_argument('--engine', help="TeX engine: pdflatex, lualatex, xelatex, tectonic or latexmk "
+                                          "(default: the one saved by `engines.py benchmark --save`, "
+                                          "else the first installed)")
+    parser.add_argument('--engine-path', help="Path to the engine binary, if not on PATH")
+    parser.add_argument('--pdflatex', help="Path to the pdflatex binary (same as --engine pdflatex --engine-path)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always run the engine, even for sources compiled before")
+    parser.add_argument('--split-sections', action='store_true',
+                        help="Write each section to its own file; --pdf then only recompiles changed sections")
+    parser.add_argument('--time-budget', type=float,
+                        help="Fail any file that takes longer than this many seconds to transpile")
+    parser.add_argument('--no-title', action='store_true', help="Omit \\maketitle")
+    parser.add_argument('--anchors', help="Comma-separated extra anchor words (force text mode)")
+    parser.add_argument('--primers', help="Comma-separated math primers (tokens containing one are math)")
+    parser.add_argument('--lexicon', help="Anchor lexicon built with lexicon.py (e.g. a full English word list)")
+    parser.add_argument('--section-id', help="Section marker (default: ##)")
+    parser.add_argument('--subsection-id', help="Subsection marker (default: ###)")
+    parser.add_argument('--table-segment-rows', type=non_negative_int, metavar='N',
+                        help="Split tables longer than N rows into several xltabulars (faster pdflatex runs; "
+                             "0: never)")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and convert files in the input directories as they are added or changed")
+    parser.add_argument('--poll', action='store_true',
+                        help="With --watch, poll instead of using inotify (e.g. on network shares)")
+    parser.add_argument('--debounce', type=float, default=1.0,
+                        help="With --watch, seconds a file must be unchanged before it is converted (default: 1)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only print the summary")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.watch:
+        missing = [p for p in args.inputs if not os.path.isdir(p)]
+        if missing:
+            print(f"--watch needs directories: {', '.join(missing)}", file=sys.stderr)
+            return 2
+        sources = []
+    else:
+        sources = collect_inputs(args.inputs)
+    if not sources and not args.watch:
+        print("No input files found.", file=sys.stderr)
+        return 2
+
+    if args.lexicon and not os.path.isfile(args.lexicon):
+        print(f"Lexicon not found: {args.lexicon}", file=sys.stderr)
+        return 2
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    settings = settings_from_args(args)
+    if args.pdflatex:
+        args.engine, args.engine_path = 'pdflatex', args.pdflatex
+
+    def make_job(src: str, root: Optional[str] = None) -> tuple:
+        return (src, output_path_for(src, args.output_dir, root), args.pdf, args.engine, args.engine_path,
+                not args.no_cache, args.split_sections, args.time_budget)
+    jobs = [make_job(src, root) for src, root in sources]
+    collisions = output_collisions(jobs)
+    if collisions:
+        for tex_path, names in collisions:
+            print(f"Several inputs would write {tex_path}: {', '.join(names)}", file=sys.stderr)
+        return 2
+
+    results = []
+
+    def report(result: JobResult):
+        results.append(result)
+        if args.quiet:
+            return
+        if result.error:
+            print(f"FAIL  {result.source}: {result.error}", file=sys.stderr)
+        else:
+            timing = f"{result.transpile_seconds * 1000:8.1f} ms"
+            if result.pdf_path:
+                timing += f"  + pdf {result.compile_seconds * 1000:8.1f} ms"
+            print(f"ok    {timing}  {result.source} -> {result.pdf_path or result.tex_path}")
+            if result.latex_errors:
+                log_path = os.path.splitext(result.tex_path)[0] + '.log'
+                print(f"      {result.latex_errors} LaTeX error(s), PDF produced anyway; see {log_path}")
+
+    start = time.perf_counter()
+    if args.pdf:
+        # Build the preamble format once, before workers race to build it
+        from compiler import ensure_format
+        from engines import resolve_engine
+        try:
+            engine = resolve_engine(args.engine, args.engine_path)
+        except (FileNotFoundError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 2
+        if engine.supports_format:
+            try:
+                ensure_format(engine.path)
+            except OSError as e:
+                print(f"Cannot build the preamble format: {e}", file=sys.stderr)
+                return 2
+    if args.watch:
+        from watcher import watch_folders
+        if not args.quiet:
+            print(f"Watching {', '.join(args.inputs)} (Ctrl-C to stop)")
+        def watch_job(src: str) -> tuple:
+            return make_job(src, watch_root(src, args.inputs))
+
+        processed, skipped = watch_folders(args.inputs, watch_job, lambda src: watch_job(src)[1],
+                                           settings, report, max(args.jobs, 1), args.debounce, args.poll)
+        failed = sum(1 for r in results if r.error)
+        print(f"{processed - failed}/{processed} files converted, {skipped} unchanged skipped")
+        return 1 if failed else 0
+    if args.jobs <= 1 or len(jobs) == 1:
+        _init_worker(settings)
+        # A single input gets the workers for its own chunks instead
+        chunk_jobs = args.jobs if len(jobs) == 1 and not args.split_sections else 1
+        for job in jobs:
+            report(convert_file(*job, chunk_jobs=chunk_jobs))
+    else:
+        # Imported here: multiprocessing is a noticeable share of CLI start-up
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker,
+                                 initargs=(settings,)) as pool:
+            futures = [pool.submit(convert_file, *job) for job in jobs]
+            for future in as_completed(futures):
+                report(future.result())
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    failed = sum(1 for r in results if r.error)
+    total_mb = sum(r.input_bytes for r in results) / 1e6
+    transpile_total = sum(r.transpile_seconds for r in results)
+    print(f"{len(results) - failed}/{len(results)} files in {elapsed:.2f} s "
+          f"({len(results) / elapsed:.1f} files/s, {total_mb / elapsed:.2f} MB/s wall, "
+          f"{total_mb / transpile_total if transpile_total else 0:.2f} MB/s per worker, "
+          f"{args.jobs} jobs)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
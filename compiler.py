@@ -0,0 +1,641 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+from engines import Engine, locate, resolve_engine
+from transpiler import LATEX_PREAMBLE
+
+# Preamble exactly as transpile() emits it; documents starting with it can use the format
+PREAMBLE_TEXT = '\n'.join(LATEX_PREAMBLE) + '\n'
+
+# Formats whose build failed this session (e.g. a missing package); not retried
+_failed_formats = set()
+
+# Upper bound for the compiled-PDF cache before least-recently-used entries are evicted
+PDF_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Sources using it typeset the compile date, so their cache key includes it (transpile() always emits \date{\today})
+TODAY_MACRO = b'\\today'
+# A cached entry must start with the header and end with the trailer marker within its last bytes
+PDF_HEADER = b'%PDF-'
+PDF_TRAILER = b'%%EOF'
+PDF_TRAILER_WINDOW = 1024
+
+_default_pdf_cache = None
+
+# Log messages asking for another pass (xltabular/longtable widths, labels, references)
+RERUN_PATTERN = re.compile(r'Rerun to get|Rerun LaTeX|Label\(s\) may have changed|Table widths have changed')
+# Source constructs whose output depends on the .aux of a previous pass
+AUX_DEPENDENT_PATTERN = re.compile(
+    r'\\(?:begin\{(?:xltabular|longtable)\}|ref\{|pageref\{|label\{|tableofcontents|cite\{)')
+# Output lines after which pdflatex cannot produce a usable PDF (TeX itself gives up after 100 errors)
+FATAL_PATTERN = re.compile(r'Emergency stop|Fatal error occurred|==> Fatal error|That makes 100 errors')
+# A run that ended without typesetting anything, whatever its errors
+NO_OUTPUT_PATTERN = re.compile(r'No pages of output')
+# Upper bound on passes, in case rerun requests never settle
+MAX_PASSES = 5
+
+# Parts of a master written by LatexTranspiler.transpile_sections
+INCLUDE_PATTERN = re.compile(r'^\\include\{([^}]*)\}$', re.M)
+# Counter checkpoint written to a part's .aux at its end (page is the number of the next page)
+AUX_COUNTER_PATTERN = re.compile(r'\\setcounter\{([^}]*)\}\{(-?\d+)\}')
+
+
+def cache_dir(*parts: str) -> str:
+    """Returns (creating it if needed) a directory under ~/.cache/text2tex."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'text2tex', *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def pdf_path_for(tex_file_path: str) -> str:
+    return os.path.splitext(tex_file_path)[0] + '.pdf'
+
+
+def engine_identity(engine_path: str) -> str:
+    """Identifies the engine build by resolved path and mtime (changes on TeX updates)."""
+    real_path = os.path.realpath(engine_path)
+    return f"{real_path}@{os.stat(real_path).st_mtime_ns}"
+
+
+def format_name(pdflatex_path: str) -> str:
+    """Format file name for the current preamble and pdflatex binary.
+
+    Formats are tied to the engine build, so a changed preamble or TeX
+    update yields a new name.
+    """
+    key = '\n'.join([PREAMBLE_TEXT, engine_identity(pdflatex_path)])
+    return 'text2tex-' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+class PdfCache:
+    """Content-addressed store of compiled PDFs, keyed by LaTeX source + engine + flags.
+
+    Entries are copied in and out rather than hard-linked: pdflatex rewrites
+    its output file in place, which would corrupt a linked cache entry.
+    Sources using \\today are also keyed by the current date, so a PDF is
+    never served with an earlier day's date. Entries that are not complete
+    PDFs (e.g. truncated by a full disk) are dropped on fetch.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.directory = directory or cache_dir('pdf')
+        self.max_bytes = max_bytes
+
+    def key_for(self, tex_file_path: str, command: List[str]) -> str:
+        digest = hashlib.sha256()
+        # Engine build and flags, but not the file name (last argument)
+        digest.update(engine_identity(command[0]).encode('utf-8'))
+        digest.update('\0'.join(command[1:-1]).encode('utf-8'))
+        digest.update(b'\0')
+        dated = False
+        tail = b''
+        with open(tex_file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+                # The tail catches a macro split across two chunks
+                dated = dated or TODAY_MACRO in tail + chunk
+                tail = chunk[-len(TODAY_MACRO):]
+        if dated:
+            digest.update(b'\0' + date.today().isoformat().encode('ascii'))
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pdf')
+
+    def fetch(self, key: str, pdf_path: str) -> bool:
+        """Copies the cached PDF to pdf_path; returns False on a miss (a corrupt entry is removed)."""
+        entry = self.entry_path(key)
+        try:
+            if not is_complete_pdf(entry):
+                os.remove(entry)
+                return False
+            shutil.copyfile(entry, pdf_path)
+            os.utime(entry)  # mark as recently used
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, key: str, pdf_path: str) -> None:
+        entry = self.entry_path(key)
+        partial = f"{entry}.{os.getpid()}.tmp"
+        try:
+            shutil.copyfile(pdf_path, partial)
+            os.replace(partial, entry)
+        except OSError:
+            if os.path.exists(partial):
+                os.remove(partial)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes least-recently-used entries until the cache fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def is_complete_pdf(path: str) -> bool:
+    """True if path starts like a PDF and has the end-of-file marker near its end."""
+    with open(path, 'rb') as f:
+        if f.read(len(PDF_HEADER)) != PDF_HEADER:
+            return False
+        f.seek(max(os.fstat(f.fileno()).st_size - PDF_TRAILER_WINDOW, 0))
+        return PDF_TRAILER in f.read()
+
+
+def default_pdf_cache() -> PdfCache:
+    global _default_pdf_cache
+    if _default_pdf_cache is None:
+        _default_pdf_cache = PdfCache()
+    return _default_pdf_cache
+
+
+def ensure_format(pdflatex_path: Optional[str] = None) -> Optional[str]:
+    """Builds the precompiled preamble format once and returns its name.
+
+    Returns None if pdflatex is missing or the format cannot be built, in
+    which case callers compile without it.
+    """
+    pdflatex_path = pdflatex_path or locate('pdflatex')
+    if not pdflatex_path or not os.path.exists(pdflatex_path):
+        return None
+    name = format_name(pdflatex_path)
+    formats_dir = cache_dir('formats')
+    if os.path.exists(os.path.join(formats_dir, name + '.fmt')):
+        return name
+    if name in _failed_formats:
+        return None
+
+    # The document repeats the preamble, so the format turns those lines into no-ops
+    ini_source = (PREAMBLE_TEXT
+                  + '\\renewcommand{\\documentclass}[2][]{}\n'
+                  + '\\renewcommand{\\usepackage}[2][]{}\n'
+                  + '\\dump\n')
+    # Build under a per-process job name, then rename: concurrent builders never see a partial file
+    job_name = f'{name}-{os.getpid()}'
+    ini_path = os.path.join(formats_dir, job_name + '.ini.tex')
+    with open(ini_path, 'w', encoding='utf-8') as f:
+        f.write(ini_source)
+    try:
+        result = subprocess.run(
+            [pdflatex_path, '-ini', '-interaction=nonstopmode', f'-jobname={job_name}',
+             '&pdflatex', os.path.basename(ini_path)],
+            cwd=formats_dir,
+            capture_output=True
+        )
+        built = os.path.join(formats_dir, job_name + '.fmt')
+        if result.returncode != 0 or not os.path.exists(built):
+            _failed_formats.add(name)
+            return None
+        os.replace(built, os.path.join(formats_dir, name + '.fmt'))
+    finally:
+        for ext in ('.ini.tex', '.log', '.fmt'):
+            try:
+                os.remove(os.path.join(formats_dir, job_name + ext))
+            except OSError:
+                pass
+    return name
+
+
+def has_standard_preamble(tex_file_path: str) -> bool:
+    with open(tex_file_path, 'r', encoding='utf-8') as f:
+        return f.read(len(PREAMBLE_TEXT)) == PREAMBLE_TEXT
+
+
+def compile_command(tex_file_path: str, engine: Optional[Engine] = None,
+                    use_format: bool = True) -> Tuple[List[str], str, Dict[str, str]]:
+    """Returns (command, working_dir, env_overrides) for compiling tex_file_path.
+
+    engine defaults to resolve_engine(). When it can load formats and the
+    file starts with the standard preamble, the precompiled format is used
+    (built on first use). Raises FileNotFoundError if no engine is installed.
+    """
+    engine = engine or resolve_engine()
+    working_dir = os.path.dirname(os.path.abspath(tex_file_path))
+    base_name = os.path.basename(tex_file_path)
+    fmt = None
+    env = {}
+    if use_format and engine.supports_format and has_standard_preamble(tex_file_path):
+        fmt = ensure_format(engine.path)
+        if fmt:
+            # Trailing separator keeps kpathsea's default search path after ours
+            env['TEXFORMATS'] = cache_dir('formats') + os.pathsep
+    return engine.command(base_name, fmt), working_dir, env
+
+
+def latex_errors(log: str) -> List[str]:
+    """The error messages ('! ...' lines) in pdflatex output or a .log file."""
+    return [line[2:].strip() for line in log.split('\n') if line.startswith('! ')]
+
+
+def output_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identifies the current version of a file (None if missing), to tell whether a run rewrote it."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def output_written(path: str, before: Optional[Tuple[int, int, int]]) -> bool:
+    """True if path was (re)written since output_stamp returned before."""
+    return output_stamp(path) not in (None, before)
+
+
+def errors_lost_output(errors: List[str], pdf_path: str, before: Optional[Tuple[int, int, int]]) -> bool:
+    """True if the last pass of a compile failed: its errors are only recoverable if it wrote the PDF anyway."""
+    return bool(errors) and not output_written(pdf_path, before)
+
+
+def log_errors(tex_file_path: str, since: float) -> List[str]:
+    """latex_errors of the .log next to tex_file_path, if written at or after since (time.time())."""
+    log_path = os.path.splitext(tex_file_path)[0] + '.log'
+    try:
+        if os.path.getmtime(log_path) < since:
+            return []  # Served from the PDF cache, or not compiled: the log is from an earlier run
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            return latex_errors(f.read())
+    except OSError:
+        return []
+
+
+class LogWatcher:
+    """Scans pdflatex output as it streams in and spots fatal errors early.
+
+    In nonstopmode pdflatex keeps going after most errors (an unknown
+    character, an undefined control sequence) and still writes the PDF,
+    exiting non-zero at the end; those errors are collected and the pass
+    runs to completion. Only a fatal error (emergency stop, or TeX giving
+    up after 100 errors) abandons the run at once.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.errors: List[str] = []
+        self.fatal = False
+        self.no_output = False
+        self._partial = ''
+
+    def feed(self, chunk: str) -> bool:
+        """Consumes output; returns True once the run should be aborted."""
+        self.chunks.append(chunk)
+        lines = (self._partial + chunk).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            if line.startswith('! '):
+                self.errors.append(line[2:].strip())
+            if FATAL_PATTERN.search(line):
+                self.fatal = True
+            elif NO_OUTPUT_PATTERN.search(line):
+                self.no_output = True
+        return self.fatal
+
+    def failed(self, returncode: int) -> bool:
+        """True if the run produced no usable output; recoverable errors alone do not count."""
+        if self.fatal:
+            return True
+        return returncode != 0 and (not self.errors or self.no_output)
+
+    def text(self) -> str:
+        return ''.join(self.chunks)
+
+
+def aux_digest(aux_paths: List[str]) -> Optional[str]:
+    """Hash of .aux files, to tell whether a pass changed them (None if the first is missing)."""
+    digest = hashlib.sha1()
+    for index, aux_path in enumerate(aux_paths):
+        try:
+            with open(aux_path, 'rb') as f:
+                # The last-page count changes with any edit but is never worth a rerun
+                lines = [line for line in f.read().splitlines() if b'@abspage@last' not in line]
+        except OSError:
+            if index == 0:
+                return None
+            lines = []
+        digest.update(b'\n'.join(lines) + b'\0')
+    return digest.hexdigest()
+
+
+class PassScheduler:
+    """Plans pdflatex passes so each document gets as few as it needs.
+
+    A first pass whose result is certain to be rerun (aux-dependent content
+    and no .aux yet) runs in -draftmode, which skips writing the PDF. After
+    every pass, another one is scheduled only if the log asks for a rerun or
+    the .aux changed; a draft pass is always followed by a real one.
+    aux_paths overrides the .aux files watched for changes (the document's
+    own first), e.g. to include the part files of an \\includeonly pass.
+    """
+
+    def __init__(self, tex_file_path: str, command: List[str], engine: Engine,
+                 aux_paths: Optional[List[str]] = None):
+        self.command = command
+        self.engine = engine
+        self.aux_paths = aux_paths or [os.path.splitext(tex_file_path)[0] + '.aux']
+        self.passes = 0
+        self.aux_digest = aux_digest(self.aux_paths)
+        with open(tex_file_path, 'r', encoding='utf-8', errors='replace') as f:
+            uses_aux = AUX_DEPENDENT_PATTERN.search(f.read()) is not None
+        self.draft = uses_aux and self.aux_digest is None and engine.draft_flag is not None
+
+    def next_command(self) -> List[str]:
+        if self.draft:
+            return [self.command[0], self.engine.draft_flag, *self.command[1:]]
+        return self.command
+
+    def finish_pass(self, log: str) -> bool:
+        """Records a successful pass; returns True if another pass is needed."""
+        self.passes += 1
+        was_draft, self.draft = self.draft, False
+        digest = aux_digest(self.aux_paths)
+        aux_changed = self.aux_digest is not None and digest != self.aux_digest
+        self.aux_digest = digest
+        if self.engine.manages_passes or self.passes >= MAX_PASSES:
+            return False
+        # pdflatex wraps its output at 79 columns, which can split the messages
+        return was_draft or aux_changed or RERUN_PATTERN.search(log.replace('\n', '')) is not None
+
+
+def stream_pass(command: List[str], working_dir: str, env: Dict[str, str]) -> str:
+    """Runs one pdflatex pass, returning its output; aborts early on fatal errors.
+
+    Raises subprocess.CalledProcessError (log in .stdout) if the pass fails;
+    a pass whose errors were recoverable returns normally (see latex_errors).
+    """
+    watcher = LogWatcher()
+    with subprocess.Popen(command, cwd=working_dir, env={**os.environ, **env} if env else None,
+                          stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          encoding='utf-8', errors='replace') as process:
+        for line in process.stdout:
+            if watcher.feed(line):
+                process.kill()
+                break
+        process.wait()
+    if watcher.failed(process.returncode):
+        raise subprocess.CalledProcessError(process.returncode or 1, command, output=watcher.text())
+    return watcher.text()
+
+
+def run_passes(tex_file_path: str, command: List[str], working_dir: str, env: Dict[str, str],
+               engine: Engine) -> str:
+    """Runs as many passes as the document needs (see PassScheduler); returns the last log."""
+    scheduler = PassScheduler(tex_file_path, command, engine)
+    pdf_path = pdf_path_for(tex_file_path)
+    while True:
+        before = output_stamp(pdf_path)
+        log = stream_pass(scheduler.next_command(), working_dir, env)
+        if not scheduler.finish_pass(log):
+            if errors_lost_output(latex_errors(log), pdf_path, before):
+                raise subprocess.CalledProcessError(1, scheduler.command, output=log)
+            return log
+
+
+def compile_pdf(tex_file_path: str, engine: Optional[Engine] = None,
+                use_format: bool = True, use_cache: bool = True) -> str:
+    """Compiles a .tex file in its own directory and returns the PDF path.
+
+    Identical sources compiled before are served from the PDF cache without
+    running the engine; otherwise the passes are planned by PassScheduler.
+    Raises FileNotFoundError if no engine is installed and
+    subprocess.CalledProcessError (with the log in .stdout) if compilation fails.
+    A PDF typeset despite recoverable errors is returned but not cached, so
+    the errors are reported (from the .log, see latex_errors) on every compile.
+    """
+    engine = engine or resolve_engine()
+    command, working_dir, env = compile_command(tex_file_path, engine, use_format)
+    pdf_path = pdf_path_for(tex_file_path)
+
+    pdf_cache = default_pdf_cache() if use_cache else None
+    key = pdf_cache.key_for(tex_file_path, command) if pdf_cache else None
+    if key and pdf_cache.fetch(key, pdf_path):
+        return pdf_path
+
+    log = run_passes(tex_file_path, command, working_dir, env, engine)
+    if key and not latex_errors(log):
+        pdf_cache.store(key, pdf_path)
+    return pdf_path
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def part_checkpoint(aux_path: str) -> Optional[Dict[str, int]]:
+    """Every counter's value at the end of a part, from the checkpoint in its .aux (None if missing)."""
+    try:
+        with open(aux_path, 'r', encoding='utf-8', errors='replace') as f:
+            checkpoint = {name: int(value) for name, value in AUX_COUNTER_PATTERN.findall(f.read())}
+    except OSError:
+        return None
+    return checkpoint if 'page' in checkpoint else None
+
+
+def part_checkpoints(working_dir: str, parts: List[str]) -> Optional[Dict[str, Dict[str, int]]]:
+    """The checkpoint of every part, read from the .aux files of a complete build."""
+    checkpoints = {}
+    for part in parts:
+        checkpoint = part_checkpoint(os.path.join(working_dir, part + '.aux'))
+        if checkpoint is None:
+            return None
+        checkpoints[part] = checkpoint
+    return checkpoints
+
+
+def page_layout(parts: List[str], checkpoints: Dict[str, Dict[str, int]]) -> Dict[str, List[int]]:
+    """[first, last] page of every part (last < first for a part without pages)."""
+    layout = {}
+    first = 1
+    for part in parts:
+        end = checkpoints[part]['page']
+        layout[part] = [first, end - 1]
+        first = end
+    return layout
+
+
+def assemble_pdf(pieces: List[Tuple[str, int, int]], output_pdf: str, working_dir: str,
+                 engine: Engine, env: Dict[str, str]) -> None:
+    """Concatenates page ranges (pdf, first, last) of PDFs in working_dir into output_pdf (pdfpages)."""
+    job_name = os.path.splitext(os.path.basename(output_pdf))[0] + '-assemble'
+    lines = [r'\documentclass{article}', r'\usepackage{pdfpages}', r'\begin{document}']
+    for pdf, first, last in pieces:
+        lines.append(f'\\includepdf[pages={{{first}-{last}}}]{{{pdf}}}')
+    lines.append(r'\end{document}')
+    source = os.path.join(working_dir, job_name + '.tex')
+    with open(source, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    try:
+        subprocess.run(engine.command(job_name + '.tex'), cwd=working_dir,
+                       env={**os.environ, **env} if env else None, capture_output=True, text=True, check=True)
+        os.replace(os.path.join(working_dir, job_name + '.pdf'), output_pdf)
+    finally:
+        for ext in ('.tex', '.aux', '.log'):
+            try:
+                os.remove(os.path.join(working_dir, job_name + ext))
+            except OSError:
+                pass
+
+
+def typeset_parts(parts: List[str], included: set, old_checkpoints: Dict[str, Dict[str, int]], working_dir: str,
+                  compile_only: Callable[[List[str]], None]) -> Dict[str, Dict[str, int]]:
+    """Typesets the included parts and returns the new checkpoints of all parts.
+
+    Each part starts from the counters the previous one ended with; an
+    untouched part whose starting counters changed (page, table, section or
+    any other number) is added to included, with everything after it, and
+    typeset again.
+    """
+    while True:
+        compile_only([part for part in parts if part in included])
+        checkpoints = {}
+        entering = old_entering = {}
+        shifted = None
+        for index, part in enumerate(parts):
+            if part in included:
+                checkpoint = part_checkpoint(os.path.join(working_dir, part + '.aux'))
+                if checkpoint is None:
+                    raise OSError(f"No counter checkpoint in {part}.aux")
+            elif entering == old_entering:
+                checkpoint = old_checkpoints[part]
+            else:
+                shifted = index
+                break
+            checkpoints[part] = checkpoint
+            entering, old_entering = checkpoint, old_checkpoints[part]
+        if shifted is None:
+            return checkpoints
+        included.update(parts[shifted:])
+
+
+def compile_pdf_sections(tex_file_path: str, engine: Optional[Engine] = None,
+                         use_format: bool = True) -> str:
+    """Compiles a master from LatexTranspiler.transpile_sections, retypesetting only changed parts.
+
+    Part sources are hashed against the last build (saved next to the PDF).
+    Changed parts are typeset with \\includeonly, taking the counters of the
+    others from their saved .aux files, and their pages are spliced into the
+    previous PDF. The \\includeonly pass is repeated like a full build's (see
+    PassScheduler). If a changed part ends with different counters (page
+    count, tables, sections...), the parts after it are retypeset too, so
+    page and table numbers in the result stay consistent. A full
+    compile runs when there is no previous build, the master changed,
+    splicing fails, or the engine runs its own passes (latexmk, tectonic),
+    which cannot be given \\includeonly. Raises like compile_pdf.
+    """
+    engine = engine or resolve_engine()
+    command, working_dir, env = compile_command(tex_file_path, engine, use_format)
+    pdf_path = pdf_path_for(tex_file_path)
+    state_path = os.path.splitext(tex_file_path)[0] + '.parts.json'
+    job_name = os.path.splitext(os.path.basename(tex_file_path))[0]
+
+    with open(tex_file_path, 'r', encoding='utf-8') as f:
+        master = f.read()
+    parts = INCLUDE_PATTERN.findall(master)
+    digests = {part: file_digest(os.path.join(working_dir, part + '.tex')) for part in parts}
+    signature = hashlib.sha256('\0'.join([master, engine_identity(command[0]), *command[1:-1]])
+                               .encode('utf-8')).hexdigest()
+
+    def compile_only(selected: List[str]):
+        """Typesets the selected parts, with as many passes as PassScheduler asks for."""
+        args = command[:-1] + [f'-jobname={job_name}',
+                               f'\\includeonly{{{",".join(selected)}}}\\input{{{command[-1]}}}']
+        aux_paths = [os.path.join(working_dir, name + '.aux') for name in [job_name, *selected]]
+        scheduler = PassScheduler(tex_file_path, args, engine, aux_paths)
+        while True:
+            log = stream_pass(scheduler.next_command(), working_dir, env)
+            if not scheduler.finish_pass(log):
+                return
+
+    def save_state(checkpoints: Optional[Dict[str, Dict[str, int]]]):
+        if checkpoints is None:
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            return
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump({'signature': signature, 'digests': digests, 'checkpoints': checkpoints}, f)
+
+    def full_build() -> str:
+        save_state(None)
+        run_passes(tex_file_path, command, working_dir, env, engine)
+        save_state(part_checkpoints(working_dir, parts))
+        return pdf_path
+
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = None
+    if (engine.manages_passes or not state or state.get('signature') != signature or not os.path.exists(pdf_path)
+            or any(part not in state.get('checkpoints', {}) for part in parts)):
+        return full_build()
+
+    old_digests, old_checkpoints = state['digests'], state['checkpoints']
+    included = {part for part in parts if old_digests.get(part) != digests[part]}
+    if not included:
+        return pdf_path
+
+    root = os.path.splitext(pdf_path)[0]
+    previous_pdf, partial_pdf = root + '-prev.pdf', root + '-partial.pdf'
+    os.replace(pdf_path, previous_pdf)
+    try:
+        try:
+            checkpoints = typeset_parts(parts, included, old_checkpoints, working_dir, compile_only)
+        except subprocess.CalledProcessError:
+            # An error in the document itself: keep the last good PDF, rebuild fully next time
+            os.replace(previous_pdf, pdf_path)
+            save_state(None)
+            raise
+        except OSError:
+            # Unreadable .aux state: start over
+            return full_build()
+
+        if len(included) < len(parts):
+            layout = page_layout(parts, checkpoints)
+            pieces = []
+            partial_page = 1
+            for part in parts:
+                first, last = layout[part]
+                if last < first:
+                    continue
+                if part in included:
+                    count = last - first + 1
+                    piece = (os.path.basename(partial_pdf), partial_page, partial_page + count - 1)
+                    partial_page += count
+                else:
+                    piece = (os.path.basename(previous_pdf), first, last)
+                if pieces and pieces[-1][0] == piece[0] and pieces[-1][2] + 1 == piece[1]:
+                    piece = (piece[0], pieces.pop()[1], piece[2])
+                pieces.append(piece)
+            if partial_page > 1:
+                os.replace(pdf_path, partial_pdf)
+            try:
+                assemble_pdf(pieces, pdf_path, working_dir, engine, env)
+            except (subprocess.CalledProcessError, OSError):
+                # Splicing failed (e.g. pdfpages is not installed), not the document
+                return full_build()
+    finally:
+        for leftover in (previous_pdf, partial_pdf):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    save_state(checkpoints)
+    return pdf_path
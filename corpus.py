@@ -0,0 +1,211 @@
+"""Seeded generator of NotebookLM-style documents for benchmarking the transpiler.
+
+Usage:
+    python corpus.py out.txt --size 10MB --seed 1
+"""
+import argparse
+import random
+import sys
+from typing import Iterator, List
+
+# --- Vocabulary ---
+PROSE_WORDS = [
+    'the', 'and', 'for', 'is', 'this', 'that', 'with', 'from', 'to', 'in', 'on', 'by', 'we', 'of',
+    'protocol', 'adversary', 'challenger', 'scheme', 'security', 'advantage', 'negligible',
+    'message', 'ciphertext', 'key', 'oracle', 'game', 'proof', 'reduction', 'probability',
+    'distribution', 'random', 'function', 'output', 'input', 'query', 'hybrid', 'bound',
+    'verifier', 'prover', 'sends', 'response', 'commitment', 'challenge', 'then', 'hence',
+]
+MATH_TOKENS = [
+    'x1', 'x2', 'y1', 'k', 'm', 'n', 'λ', 'ε', 'Enck(m)', 'Deck(c)', 'Pr[A', '=', '1]', 'f(x)',
+    'Gen(1^λ)', 'O(n)', 'a+b', 'x⊕y', 'p≤q', 'q≥1', 'α', 'β', 'Σ', 'H(x)', 'g^x', 'sk', 'pk',
+    'c=Enck(m)', 'negl(λ)', '{0,1}', '...', 'x∈S', 'A→B', '√n', 'π', '2^n', 'N/2', '|x|',
+]
+DISPLAY_MATH = [
+    'Pr[Exp(A) = 1] ≤ 1/2 + negl(λ)',
+    'c = Enck(m) ⊕ r',
+    '∑ x1 ≤ ε · n',
+    'f(x) = g^x mod p',
+    '∀ x ∈ S, ∃ y : H(y) = x',
+    'Adv(A) = |Pr[b = b1] - 1/2| ≥ 1/poly(λ)',
+    'Deck(Enck(m)) = m',
+    'α × β ≠ γ → δ',
+]
+HEADER_WORDS = ['Definitions', 'Construction', 'Security Proof', 'Hybrid Argument', 'Correctness',
+                'Efficiency', 'Preliminaries', 'Key Generation', 'Encryption', 'Discussion']
+
+
+class DocumentGenerator:
+    """Produces an endless, deterministic stream of document lines for a seed."""
+
+    def __init__(self, seed: int = 0, math_density: float = 0.2):
+        self.rng = random.Random(seed)
+        self.math_density = math_density
+        self.section = 0
+        self.subsection = 0
+
+    def word(self) -> str:
+        if self.rng.random() < self.math_density:
+            return self.rng.choice(MATH_TOKENS)
+        return self.rng.choice(PROSE_WORDS)
+
+    def sentence(self, min_words: int = 6, max_words: int = 24) -> str:
+        words = [self.word() for _ in range(self.rng.randint(min_words, max_words))]
+        words[0] = words[0].capitalize()
+        return ' '.join(words) + self.rng.choice(['.', '.', '.', ',', ':', '?'])
+
+    def title(self) -> str:
+        return ' '.join(self.rng.sample(HEADER_WORDS, 3))
+
+    def section_block(self) -> List[str]:
+        self.section += 1
+        self.subsection = 0
+        if self.rng.random() < 0.5:
+            return [f"{self.section}.0 {self.rng.choice(HEADER_WORDS)}", '']
+        return [f"## {self.rng.choice(HEADER_WORDS)}", '']
+
+    def subsection_block(self) -> List[str]:
+        self.subsection += 1
+        return [f"{self.section}.{self.subsection} {self.rng.choice(HEADER_WORDS)}", '']
+
+    def paragraph_block(self) -> List[str]:
+        return [' '.join(self.sentence() for _ in range(self.rng.randint(1, 5))), '']
+
+    def list_block(self) -> List[str]:
+        numbered = self.rng.random() < 0.4
+        lines = []
+        for i in range(self.rng.randint(2, 8)):
+            label = f"{i + 1}. " if numbered else self.rng.choice(['- ', '* '])
+            body = self.sentence(4, 16)
+            if self.rng.random() < 0.5:
+                body = f"{self.rng.choice(HEADER_WORDS)}: {body}"
+            lines.append(label + body)
+        return lines + ['']
+
+    def table_block(self) -> List[str]:
+        cols = self.rng.randint(2, 5)
+        rows = [
+            '\t'.join(self.rng.choice(HEADER_WORDS) for _ in range(cols))
+        ]
+        for _ in range(self.rng.randint(2, 12)):
+            rows.append('\t'.join(
+                ' '.join(self.word() for _ in range(self.rng.randint(1, 4))) for _ in range(cols)
+            ))
+        return rows + ['']
+
+    def display_block(self) -> List[str]:
+        return [self.rng.choice(DISPLAY_MATH), '']
+
+    def iter_lines(self) -> Iterator[str]:
+        yield self.title()
+        yield ''
+        blocks = [
+            (self.section_block, 3), (self.subsection_block, 5), (self.paragraph_block, 40),
+            (self.list_block, 20), (self.table_block, 8), (self.display_block, 12),
+        ]
+        makers = [maker for maker, _ in blocks]
+        weights = [weight for _, weight in blocks]
+        yield from self.section_block()
+        while True:
+            yield from self.rng.choices(makers, weights)[0]()
+
+
+# --- Adversarial Inputs ---
+# One hostile line of about n characters per tokenizer path; the transpiler must stay
+# linear in their length (benchmark.py --adversarial). Lines containing a newline
+# only reach the tokenizer through direct process_inline_math calls.
+ADVERSARIAL_LINES = {
+    'punct_run': lambda n: 'x' + '.' * n + 'y',
+    'punct_mix': lambda n: '.,;:?!()[]"\'' * (n // 12) + 'x',
+    'deep_parens': lambda n: 'f' + '(' * (n // 2) + 'x' + ')' * (n // 2) + '.',
+    'deep_brackets': lambda n: '[' * (n // 2) + 'x' + ']' * (n // 2) + '].',
+    'closing_run': lambda n: 'f(' + 'x(' * (n // 4) + ')' * (n // 2),
+    'giant_word': lambda n: 'a' * n,
+    'giant_greek': lambda n: 'α' * n,
+    'giant_math': lambda n: 'x1=' * (n // 3),
+    'ellipsis_run': lambda n: '...' * (n // 3) + 'x',
+    'function_calls': lambda n: 'Pr(' * (n // 3),
+    'capital_call': lambda n: 'A' * n + '(',
+    'roots': lambda n: '√' * n + 'x',
+    'backslashes': lambda n: '\\' * n + 'ab',
+    'many_articles': lambda n: 'a ' * (n // 2),
+    'space_run': lambda n: 'x' + ' ' * n + 'y',
+    'header_dots': lambda n: '1.' * (n // 2) + 'x',
+    'list_item': lambda n: '- ' + 'word ' * (n // 5) + ':',
+    'table_row': lambda n: '\t'.join(['x=1'] * (n // 4)),
+    'newline_token': lambda n: '\n' + '.x' * (n // 2),
+}
+
+
+def adversarial_document(name: str, size_chars: int) -> str:
+    """A document made of a title and the ADVERSARIAL_LINES[name] line."""
+    return 'Adversarial input\n' + ADVERSARIAL_LINES[name](size_chars) + '\n'
+
+
+def adversarial_table(size_chars: int) -> str:
+    """A document that is one tab-separated table (distinct rows) of about size_chars characters."""
+    rows = []
+    produced = 0
+    while produced < size_chars or len(rows) < 2:
+        index = len(rows)
+        rows.append(f'x{index} = y\t{index} α + β\tword {index}')
+        produced += len(rows[-1]) + 1
+    return 'Adversarial table\n' + '\n'.join(rows) + '\n'
+
+
+def iter_document_lines(size_bytes: int, seed: int = 0) -> Iterator[str]:
+    """Yields newline-terminated lines until roughly size_bytes of UTF-8 have been produced."""
+    produced = 0
+    for line in DocumentGenerator(seed).iter_lines():
+        if produced >= size_bytes:
+            return
+        line += '\n'
+        produced += len(line.encode('utf-8'))
+        yield line
+
+
+def generate_document(size_bytes: int, seed: int = 0) -> str:
+    return ''.join(iter_document_lines(size_bytes, seed))
+
+
+def write_document(path: str, size_bytes: int, seed: int = 0) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(iter_document_lines(size_bytes, seed))
+
+
+def parse_size(text: str) -> int:
+    """Parses sizes like '1KB', '10MB', '512' (bytes)."""
+    units = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'B': 1}
+    text = text.strip().upper()
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic NotebookLM-style document.")
+    parser.add_argument('output', help="Output .txt path ('-' for stdout)")
+    parser.add_argument('--size', default='100KB', help="Approximate size, e.g. 1KB, 10MB (default: 100KB)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--adversarial', choices=sorted(ADVERSARIAL_LINES),
+                        help="Write this hostile input instead (size in characters)")
+    args = parser.parse_args(argv)
+
+    size = parse_size(args.size)
+    if args.adversarial:
+        text = adversarial_document(args.adversarial, size)
+        if args.output == '-':
+            sys.stdout.write(text)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text)
+    elif args.output == '-':
+        sys.stdout.writelines(iter_document_lines(size, args.seed))
+    else:
+        write_document(args.output, size, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""TeX engine backends: discovery on PATH, invocation and a benchmark that picks the fastest.
+
+Usage:
+    python engines.py list
+    python engines.py benchmark --samples 3 --size 20KB --save
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+# MacTeX installs here without necessarily being on the PATH of GUI apps
+MACTEX_BIN = "/Library/TeX/texbin"
+
+
+class Engine(NamedTuple):
+    """How to drive one TeX engine. path is None until the engine has been located."""
+    name: str
+    draft_flag: Optional[str] = None      # preliminary pass without PDF output
+    supports_format: bool = False         # can load the precompiled preamble format (compiler.ensure_format)
+    manages_passes: bool = False          # reruns itself until stable (no PassScheduler)
+    base_args: tuple = ('-interaction=nonstopmode',)
+    path: Optional[str] = None
+
+    def command(self, base_name: str, fmt: Optional[str] = None) -> List[str]:
+        args = [self.path, *self.base_args]
+        if fmt and self.supports_format:
+            args.append(f'-fmt={fmt}')
+        return args + [base_name]
+
+
+# In order of preference when nothing is configured or benchmarked
+ENGINES = {
+    'pdflatex': Engine('pdflatex', draft_flag='-draftmode', supports_format=True),
+    'lualatex': Engine('lualatex', draft_flag='--draftmode'),
+    'xelatex': Engine('xelatex', draft_flag='-no-pdf'),
+    'tectonic': Engine('tectonic', manages_passes=True, base_args=('--keep-logs',)),
+    'latexmk': Engine('latexmk', manages_passes=True, base_args=('-pdf', '-interaction=nonstopmode')),
+}
+
+
+def locate(name: str) -> Optional[str]:
+    """Path of an engine binary: the MacTeX directory first, then PATH."""
+    mactex = os.path.join(MACTEX_BIN, name)
+    if os.path.exists(mactex):
+        return mactex
+    return shutil.which(name)
+
+
+def discover_engines() -> Dict[str, Engine]:
+    """All known engines that are installed, with their paths filled in."""
+    found = {}
+    for name, engine in ENGINES.items():
+        path = locate(name)
+        if path:
+            found[name] = engine._replace(path=path)
+    return found
+
+
+def preference_path() -> str:
+    from compiler import cache_dir
+    return os.path.join(cache_dir(), 'engine.json')
+
+
+def load_preference() -> Optional[str]:
+    """Engine name saved by the last `engines.py benchmark --save`, if any."""
+    try:
+        with open(preference_path(), 'r', encoding='utf-8') as f:
+            return json.load(f).get('engine')
+    except (OSError, ValueError):
+        return None
+
+
+def resolve_engine(name: Optional[str] = None, path: Optional[str] = None) -> Engine:
+    """Picks the engine to compile with.
+
+    An explicit name (and optionally path) wins; a bare path is matched to an
+    engine by its file name. Otherwise the benchmarked preference is used if
+    still installed, then the first installed engine in ENGINES order.
+    Raises FileNotFoundError if nothing usable is found.
+    """
+    if path and not name:
+        name = os.path.splitext(os.path.basename(path))[0].lower()
+        if name not in ENGINES:
+            name = 'pdflatex'
+    if name:
+        if name not in ENGINES:
+            raise ValueError(f"Unknown engine '{name}' (known: {', '.join(ENGINES)})")
+        path = path or locate(name)
+        if not path or not os.path.exists(path):
+            raise FileNotFoundError(f"Could not find {name} at: {path or 'PATH'}")
+        return ENGINES[name]._replace(path=path)
+
+    installed = discover_engines()
+    preferred = load_preference()
+    if preferred in installed:
+        return installed[preferred]
+    if installed:
+        return next(iter(installed.values()))
+    raise FileNotFoundError("No TeX engine found (looked for " + ', '.join(ENGINES) + " on PATH)")
+
+
+def benchmark_engines(engines: Dict[str, Engine], samples: int = 3, size_bytes: int = 20 * 1024,
+                      seed: int = 0) -> List[Dict]:
+    """Compiles generated documents with each engine (no PDF cache) and times them.
+
+    Each engine first compiles the first sample untimed, which builds the
+    preamble format where the engine uses one and warms its file caches, so
+    one-off set-up does not count against any engine. Returns one entry per
+    engine, fastest working engine first; failures carry an 'error' and sort last.
+    """
+    from compiler import compile_pdf
+    from corpus import generate_document
+    from transpiler import LatexTranspiler
+
+    if samples < 1:
+        raise ValueError(f"samples must be 1 or more, not {samples}")
+    transpiler = LatexTranspiler()
+    documents = [transpiler.transpile(generate_document(size_bytes, seed + i)) for i in range(samples)]
+    results = []
+    for name, engine in engines.items():
+        entry = {'engine': name, 'path': engine.path}
+        seconds = []
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                # Index -1 is the untimed warm-up run
+                for index, tex in enumerate([documents[0], *documents], -1):
+                    tex_path = os.path.join(tmp, f'sample{index}.tex' if index >= 0 else 'warmup.tex')
+                    with open(tex_path, 'w', encoding='utf-8') as f:
+                        f.write(tex)
+                    start = time.perf_counter()
+                    pdf_path = compile_pdf(tex_path, engine, use_cache=False)
+                    if index >= 0:
+                        seconds.append(time.perf_counter() - start)
+                    if not os.path.getsize(pdf_path):
+                        raise OSError("empty PDF")
+            except (subprocess.CalledProcessError, OSError) as e:
+                entry['error'] = str(e).strip()[-200:] or type(e).__name__
+        if 'error' not in entry:
+            entry['seconds_mean'] = sum(seconds) / len(seconds)
+            entry['seconds_best'] = min(seconds)
+        results.append(entry)
+    results.sort(key=lambda e: ('error' in e, e.get('seconds_mean', 0.0)))
+    return results
+
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be 1 or more, not {number}")
+    return number
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from corpus import parse_size
+
+    parser = argparse.ArgumentParser(description="List or benchmark the installed TeX engines.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="Show installed engines and the current choice")
+    bench = sub.add_parser('benchmark', help="Time each engine on generated documents")
+    bench.add_argument('--samples', type=positive_int, default=3, help="Timed documents per engine (default: 3)")
+    bench.add_argument('--size', default='20KB', help="Size of each generated document (default: 20KB)")
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--engines', help="Comma-separated subset to try (default: all installed)")
+    bench.add_argument('--save', action='store_true', help="Make the fastest working engine the default")
+    args = parser.parse_args(argv)
+
+    installed = discover_engines()
+    if args.command == 'list':
+        try:
+            current = resolve_engine().name
+        except FileNotFoundError:
+            current = None
+        for name, engine in installed.items():
+            print(f"{'*' if name == current else ' '} {name:<10} {engine.path}")
+        if not installed:
+            print("No TeX engine found.", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.engines:
+        installed = {n: e for n, e in installed.items() if n in args.engines.split(',')}
+    if not installed:
+        print("No TeX engine to benchmark.", file=sys.stderr)
+        return 1
+    results = benchmark_engines(installed, args.samples, parse_size(args.size), args.seed)
+    for entry in results:
+        if 'error' in entry:
+            print(f"  {entry['engine']:<10} failed: {entry['error']}")
+        else:
+            print(f"  {entry['engine']:<10} {entry['seconds_mean'] * 1000:8.1f} ms mean"
+                  f"  {entry['seconds_best'] * 1000:8.1f} ms best")
+    best = results[0]
+    if 'error' in best:
+        print("No engine compiled the samples.", file=sys.stderr)
+        return 1
+    print(f"Fastest: {best['engine']}")
+    if args.save:
+        with open(preference_path(), 'w', encoding='utf-8') as f:
+            json.dump({'engine': best['engine'], 'results': results}, f, indent=2)
+        print(f"Saved as default ({preference_path()})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,413 @@
+import codecs
+import math
+import sys
+import os
+import re
+import subprocess
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                             QTextEdit, QPushButton, QFileDialog, QMessageBox, 
+                             QLabel, QComboBox, QPlainTextEdit)
+from PyQt6.QtCore import QProcess, QProcessEnvironment, QThread, QTimer, QUrl, pyqtSignal
+from PyQt6.QtGui import QDesktopServices
+
+from compiler import (LogWatcher, PassScheduler, compile_command, default_pdf_cache, ensure_format,
+                      errors_lost_output, output_stamp, pdf_path_for)
+from engines import resolve_engine
+from transpiler import LatexTranspiler, TranspileCancelled
+
+# Page markers pdflatex prints as it ships out pages, e.g. "[3]"
+PAGE_PATTERN = re.compile(r'\[(\d+)')
+
+
+class TranspileWorker(QThread):
+    """Runs update_settings + transpile off the UI thread; emits exactly one of done/failed."""
+    done = pyqtSignal(int, str)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, transpiler, settings, raw_content, generation, warm_format=False, parent=None):
+        super().__init__(parent)
+        self.transpiler = transpiler
+        self.settings = settings
+        self.raw_content = raw_content
+        self.generation = generation
+        self.warm_format = warm_format
+        self.cancelled = False
+
+    def cancel(self):
+        """Stops the transpile at its next check (called from the UI thread); failed is emitted."""
+        self.cancelled = True
+        self.transpiler.cancel()
+
+    def run(self):
+        try:
+            if self.cancelled:
+                raise TranspileCancelled("Transpile cancelled")
+            self.transpiler.update_settings(self.settings)
+            # No time limit, but the budget's checks are what cancel() stops it at
+            tex_content = self.transpiler.transpile_incremental(self.raw_content, budget=math.inf)
+        except Exception as e:
+            self.failed.emit(self.generation, str(e))
+            return
+        if self.warm_format and not self.cancelled:
+            # First compile builds the preamble format; do it here rather than on the UI thread
+            try:
+                engine = resolve_engine(self.settings.get('engine'), self.settings.get('engine_path'))
+                if engine.supports_format:
+                    ensure_format(engine.path)
+            except (OSError, ValueError):
+                pass
+        self.done.emit(self.generation, tex_content)
+
+class LatexCompilerApp(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.transpiler = LatexTranspiler()
+        
+        # Initialize default settings
+        self.current_settings = {
+            'include_title': True,
+            'anchors': ['Figure', 'Table'],
+            'primers': []
+        }
+
+        # --- Background Job State ---
+        # Only one transpile/compile job runs at a time; clicks during a job are
+        # coalesced into a single re-run. Bumping the generation cancels a job.
+        self.generation = 0
+        self.job_target = None          # (mode, file_path) of the running job
+        self.pending_run = False
+        self.transpile_worker = None
+        self.compile_process = None
+        self.compile_log = LogWatcher()
+        self.compile_decoder = None     # UTF-8 decoder of the running pass, keeps characters split across reads
+        self.pdf_before_pass = None
+        self.compile_status = "Compiling..."
+        
+        self.setWindowTitle("AI Text to LaTeX Compiler")
+        self.resize(800, 600)
+        self.init_ui()
+
+    def init_ui(self):
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QVBoxLayout(central_widget)
+
+        # --- Toolbar Area ---
+        toolbar_layout = QHBoxLayout()
+        
+        # Settings Button
+        settings_btn = QPushButton("⚙ Settings")
+        settings_btn.clicked.connect(self.open_settings)
+        toolbar_layout.addWidget(settings_btn)
+        
+        toolbar_layout.addStretch()
+        
+        # --- Mode Selector ---
+        toolbar_layout.addWidget(QLabel("Output Mode:"))
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(["Compile to PDF", "Export .tex Only"])
+        toolbar_layout.addWidget(self.mode_combo)
+        
+        main_layout.addLayout(toolbar_layout)
+
+        # --- Text Area ---
+        self.text_area = DragDropTextEdit()
+        self.text_area.setPlaceholderText("Paste text here or drag a .txt file...")
+        main_layout.addWidget(self.text_area, stretch=4)
+
+        # --- Compiler Log (streamed from pdflatex) ---
+        self.log_view = QPlainTextEdit()
+        self.log_view.setReadOnly(True)
+        self.log_view.setMaximumBlockCount(2000)
+        self.log_view.setPlaceholderText("pdflatex output appears here while compiling...")
+        main_layout.addWidget(self.log_view, stretch=1)
+
+        # --- Action Buttons ---
+        action_layout = QHBoxLayout()
+        self.status_label = QLabel("Ready")
+        action_layout.addWidget(self.status_label, stretch=1)
+
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_process)
+        action_layout.addWidget(self.cancel_btn)
+
+        self.action_btn = QPushButton("Process")
+        self.action_btn.clicked.connect(self.run_process)
+        action_layout.addWidget(self.action_btn)
+        main_layout.addLayout(action_layout)
+
+    def open_settings(self):
+        # Imported on first use to keep it off the startup path
+        from settings_dialog import SettingsDialog
+        dialog = SettingsDialog(self, self.current_settings)
+        if dialog.exec():
+            # Applied by the worker on the next run, so a running job never sees a half-update
+            self.current_settings = dialog.get_settings()
+
+    def is_busy(self):
+        return self.transpile_worker is not None or self.compile_process is not None
+
+    def run_process(self):
+        """Orchestrates the transpilation and output based on mode selection."""
+        raw_content = self.text_area.toPlainText()
+        if not raw_content.strip():
+            self.show_error("Input Empty", "Please provide text or a file.")
+            return
+
+        # Coalesce clicks: re-run once with the latest text when the current job ends
+        if self.is_busy():
+            self.pending_run = True
+            self.status_label.setText("Queued: will re-run when the current job finishes")
+            return
+
+        # 1. Check Mode & Choose Output File
+        mode = self.mode_combo.currentText()
+        if mode == "Export .tex Only":
+            file_path, _ = QFileDialog.getSaveFileName(self, "Save LaTeX File", os.path.expanduser("~"), "TeX Files (*.tex)")
+        else:
+            file_path, _ = QFileDialog.getSaveFileName(self, "Save & Compile", os.path.expanduser("~"), "TeX Files (*.tex)")
+        if not file_path: return
+
+        # 2. Update Settings & Transpile in the background
+        self.job_target = (mode, file_path)
+        self.start_transpile(raw_content)
+
+    def start_transpile(self, raw_content):
+        self.generation += 1
+        warm_format = self.job_target[0] != "Export .tex Only"
+        worker = TranspileWorker(self.transpiler, dict(self.current_settings), raw_content,
+                                 self.generation, warm_format, self)
+        worker.done.connect(self.on_transpiled)
+        worker.failed.connect(self.on_transpile_failed)
+        self.transpile_worker = worker
+        self.set_busy("Transpiling...")
+        worker.start()
+
+    def release_worker(self):
+        worker, self.transpile_worker = self.transpile_worker, None
+        if worker is not None:
+            worker.wait()
+            worker.deleteLater()
+
+    def on_transpile_failed(self, generation, message):
+        self.release_worker()
+        if generation == self.generation:
+            self.pending_run = False
+            self.show_error("Transpilation Error", message)
+        self.finish_job()
+
+    def on_transpiled(self, generation, tex_content):
+        self.release_worker()
+        if generation != self.generation:
+            self.finish_job()
+            return
+
+        mode, file_path = self.job_target
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(tex_content)
+        except IOError as e:
+            self.pending_run = False
+            self.show_error("File Save Error", str(e))
+            self.finish_job()
+            return
+
+        if mode == "Export .tex Only":
+            if not self.pending_run:
+                QMessageBox.information(self, "Success", f"File saved successfully:\n{file_path}")
+            self.finish_job()
+        else:
+            self.execute_pdflatex(file_path)
+
+    def execute_pdflatex(self, tex_file_path):
+        """Starts the TeX engine as a QProcess, streaming its output into the log view."""
+        try:
+            engine = resolve_engine(self.current_settings.get('engine'), self.current_settings.get('engine_path'))
+            command, working_dir, env = compile_command(tex_file_path, engine)
+            # Identical LaTeX compiled before: reuse the cached PDF, skip the engine
+            pdf_cache = default_pdf_cache()
+            cache_key = pdf_cache.key_for(tex_file_path, command)
+            cached = pdf_cache.fetch(cache_key, pdf_path_for(tex_file_path))
+        except (ValueError, OSError, subprocess.CalledProcessError) as e:
+            # FileNotFoundError (no engine) and PermissionError (bad engine path) are OSErrors
+            self.pending_run = False
+            self.show_error("Configuration Error", 
+                            f"{e}\n"
+                            "Please choose the TeX engine in Settings")
+            self.finish_job()
+            return
+
+        if cached:
+            self.log_view.setPlainText("Unchanged since last compile: reused cached PDF.")
+            self.on_compile_succeeded(tex_file_path)
+            self.finish_job()
+            return
+
+        self.log_view.clear()
+        scheduler = PassScheduler(tex_file_path, command, engine)
+        self.start_pass(scheduler, tex_file_path, working_dir, env, cache_key)
+
+    def start_pass(self, scheduler, tex_file_path, working_dir, env, cache_key):
+        """Runs the next engine pass planned by scheduler as a QProcess."""
+        self.compile_log = LogWatcher()
+        self.compile_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.pdf_before_pass = output_stamp(pdf_path_for(tex_file_path))
+        process = QProcess(self)
+        process.setWorkingDirectory(working_dir)
+        if env:
+            process_env = QProcessEnvironment.systemEnvironment()
+            for key, value in env.items():
+                process_env.insert(key, value)
+            process.setProcessEnvironment(process_env)
+        process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        generation = self.generation
+        process.readyReadStandardOutput.connect(lambda: self.on_compile_output(process))
+        process.finished.connect(
+            lambda code, status: self.on_compiled(generation, scheduler, tex_file_path, working_dir, env,
+                                                  cache_key, code, status))
+        process.errorOccurred.connect(lambda error: self.on_compile_error(generation, error))
+        self.compile_process = process
+        self.compile_status = f"Compiling (pass {scheduler.passes + 1})..."
+        self.set_busy(self.compile_status)
+        if scheduler.passes:
+            self.log_view.appendPlainText(f"\n--- pass {scheduler.passes + 1} (rerun requested) ---")
+        command = scheduler.next_command()
+        process.start(command[0], command[1:])
+
+    def on_compile_output(self, process, final=False):
+        chunk = self.compile_decoder.decode(bytes(process.readAllStandardOutput()), final)
+        if not chunk:
+            return
+        self.log_view.appendPlainText(chunk.rstrip('\n'))
+        if self.compile_log.feed(chunk):
+            # A fatal error: the run cannot produce a PDF, so stop it now
+            process.kill()
+            return
+        # pdflatex prints [n] as each page is shipped out
+        pages = PAGE_PATTERN.findall(chunk)
+        if pages:
+            self.status_label.setText(f"{self.compile_status} page {pages[-1]}")
+
+    def on_compile_error(self, generation, error):
+        # Crashes and kills also emit finished(); only a failed start needs handling here
+        if error != QProcess.ProcessError.FailedToStart:
+            return
+        self.release_process()
+        if generation == self.generation:
+            self.pending_run = False
+            self.show_error("Configuration Error", "Could not start the TeX engine.")
+        self.finish_job()
+
+    def on_compiled(self, generation, scheduler, tex_file_path, working_dir, env, cache_key,
+                    exit_code, exit_status):
+        if generation == self.generation:
+            # Whatever was still buffered, including a trailing partial character
+            self.on_compile_output(self.compile_process, final=True)
+        self.release_process()
+        if generation != self.generation:
+            self.finish_job()
+            return
+
+        log = self.compile_log.text()
+        errors = self.compile_log.errors
+        if self.compile_log.failed(exit_code) or exit_status != QProcess.ExitStatus.NormalExit:
+            self.on_compile_failed(log)
+        elif scheduler.finish_pass(log):
+            self.start_pass(scheduler, tex_file_path, working_dir, env, cache_key)
+            return
+        elif errors_lost_output(errors, pdf_path_for(tex_file_path), self.pdf_before_pass):
+            self.on_compile_failed(log)
+        else:
+            if not errors:
+                # PDFs with errors are not cached, so their errors are reported on every compile
+                default_pdf_cache().store(cache_key, pdf_path_for(tex_file_path))
+            self.on_compile_succeeded(tex_file_path, errors)
+        self.finish_job()
+
+    def on_compile_failed(self, log):
+        self.pending_run = False
+        error_msg = f"LaTeX Compilation Failed.\n\nLog tail:\n{log[-500:]}"
+        self.show_error("Compilation Error", error_msg)
+
+    def on_compile_succeeded(self, tex_file_path, errors=()):
+        if not self.pending_run:
+            if errors:
+                listed = '\n'.join(errors[:5])
+                QMessageBox.warning(self, "Compiled With Errors",
+                                    f"PDF compiled, but LaTeX reported {len(errors)} error(s) "
+                                    f"(see the compile log):\n\n{listed}")
+            else:
+                QMessageBox.information(self, "Success", "PDF compiled successfully!")
+            QDesktopServices.openUrl(QUrl.fromLocalFile(pdf_path_for(tex_file_path)))
+
+    def release_process(self):
+        process, self.compile_process = self.compile_process, None
+        if process is not None:
+            process.deleteLater()
+
+    def finish_job(self):
+        """Starts the coalesced re-run if one is pending, otherwise returns to idle."""
+        if self.is_busy():
+            return
+        if self.pending_run and self.job_target:
+            self.pending_run = False
+            raw_content = self.text_area.toPlainText()
+            if raw_content.strip():
+                self.start_transpile(raw_content)
+                return
+        self.pending_run = False
+        self.cancel_btn.setEnabled(False)
+        self.status_label.setText("Ready")
+
+    def cancel_process(self):
+        """Abandons the running job: kills pdflatex and stops any in-flight transpile."""
+        self.generation += 1
+        self.pending_run = False
+        self.status_label.setText("Cancelling...")
+        if self.transpile_worker is not None:
+            self.transpile_worker.cancel()
+        if self.compile_process is not None:
+            self.compile_process.kill()
+
+    def set_busy(self, status):
+        self.status_label.setText(status)
+        self.cancel_btn.setEnabled(True)
+
+    def closeEvent(self, event):
+        self.cancel_process()
+        if self.compile_process is not None:
+            self.compile_process.waitForFinished(3000)
+        if self.transpile_worker is not None:
+            self.transpile_worker.wait()
+        super().closeEvent(event)
+
+    def show_error(self, title, message):
+        QMessageBox.critical(self, title, message)
+
+class DragDropTextEdit(QTextEdit):
+    def __init__(self):
+        super().__init__()
+        self.setAcceptDrops(True)
+    def dragEnterEvent(self, e):
+        if e.mimeData().hasUrls(): e.accept()
+        else: e.ignore()
+    def dropEvent(self, e):
+        files = [u.toLocalFile() for u in e.mimeData().urls()]
+        if files:
+            try:
+                with open(files[0], 'r', encoding='utf-8') as f: self.setText(f.read())
+            except Exception as e: print(e)
+
+def run(argv=None):
+    """Starts the GUI event loop and returns its exit code."""
+    app = QApplication(sys.argv if argv is None else argv)
+    window = LatexCompilerApp()
+    window.show()
+    if os.environ.get('TEXT2TEX_STARTUP_PROBE'):
+        # Used by benchmark.py --startup: quit as soon as the window has been shown
+        QTimer.singleShot(0, app.quit)
+    return app.exec()
+
+if __name__ == "__main__":
+    sys.exit(run())
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""Memory-mapped English word list used as extra anchor words (force text mode).
+
+The file is built once from any plain word list:
+    python lexicon.py /usr/share/dict/words -o english.lex
+
+Layout (little-endian): MAGIC, uint32 word count n, n + 1 uint32 offsets
+into the blob, then the blob of the sorted, lower-cased UTF-8 words. Lookups
+binary-search the mapped file, so opening it costs no set build and the
+pages are shared by every process that maps the same file.
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b'T2TLEX1\0'
+HEADER = struct.Struct('<8sI')
+
+# Single letters are left out: x, y, n ... must stay math
+MIN_WORD_LENGTH = 2
+
+# Bound on the per-process memo of looked-up words (cleared when full)
+MEMO_SIZE = 65536
+
+# realpath -> ((st_mtime_ns, st_size) when mapped, Lexicon)
+_open_lexicons: Dict[str, Tuple[Optional[Tuple[int, int]], 'Lexicon']] = {}
+
+
+class Lexicon:
+    """Read-only sorted word set over a memory-mapped file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a text2tex lexicon: {path}")
+        self.count = count
+        offsets = memoryview(self._map)[HEADER.size:HEADER.size + 4 * (count + 1)]
+        if sys.byteorder == 'little':
+            self._offsets = offsets.cast('I')
+        else:
+            self._offsets = array('I', offsets.tobytes())
+            self._offsets.byteswap()
+            offsets.release()
+        self._blob_start = HEADER.size + 4 * (count + 1)
+        self._memo: Dict[str, bool] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, word: str) -> bool:
+        found = self._memo.get(word)
+        if found is None:
+            found = self._search(word.encode('utf-8'))
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[word] = found
+        return found
+
+    def _search(self, key: bytes) -> bool:
+        offsets, data, base = self._offsets, self._map, self._blob_start
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = data[base + offsets[mid]:base + offsets[mid + 1]]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def close(self):
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._map.close()
+
+
+def lexicon_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """(st_mtime_ns, st_size) of the file at path, which changes when lexicon.py rebuilds it (None if missing)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def open_lexicon(path: str) -> Lexicon:
+    """Returns the lexicon at path, mapping each version of a file at most once per process.
+
+    A file rebuilt since it was mapped is mapped again; the old mapping
+    stays valid for whoever still holds it (build_lexicon replaces the file
+    rather than rewriting it).
+    """
+    key = os.path.realpath(path)
+    stamp = lexicon_stamp(key)
+    entry = _open_lexicons.get(key)
+    if entry is None or entry[0] != stamp:
+        entry = _open_lexicons[key] = (stamp, Lexicon(key))
+    return entry[1]
+
+
+def normalize_words(words: Iterable[str], min_length: int = MIN_WORD_LENGTH) -> List[bytes]:
+    """Lower-cases, de-duplicates and sorts words (as UTF-8 bytes, the lookup order)."""
+    unique = set()
+    for word in words:
+        word = word.strip().lower()
+        if len(word) >= min_length and not any(c.isspace() for c in word):
+            unique.add(word.encode('utf-8'))
+    return sorted(unique)
+
+
+def build_lexicon(words: Iterable[str], path: str, min_length: int = MIN_WORD_LENGTH) -> int:
+    """Writes a lexicon file from words and returns the number of entries."""
+    entries = normalize_words(words, min_length)
+    offsets = [0]
+    for entry in entries:
+        offsets.append(offsets[-1] + len(entry))
+
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(entries)))
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.write(b''.join(entries))
+    os.replace(partial, path)
+    return len(entries)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build an anchor lexicon from a word list (one word per line).")
+    parser.add_argument('words', help="Word list ('-' for stdin)")
+    parser.add_argument('-o', '--output', required=True, help="Lexicon file to write")
+    parser.add_argument('--min-length', type=int, default=MIN_WORD_LENGTH,
+                        help=f"Skip shorter words (default: {MIN_WORD_LENGTH})")
+    args = parser.parse_args(argv)
+
+    if args.words == '-':
+        count = build_lexicon(sys.stdin, args.output, args.min_length)
+    else:
+        with open(args.words, 'r', encoding='utf-8', errors='replace') as f:
+            count = build_lexicon(f, args.output, args.min_length)
+    print(f"{count} words -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
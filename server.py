@@ -0,0 +1,307 @@
+"""Long-running transpile server speaking JSON lines, for tools that convert many documents.
+
+Usage:
+    python server.py                          # requests on stdin, responses on stdout
+    python server.py --socket /tmp/text2tex.sock
+
+One JSON object per line in each direction:
+    {"id": 1, "text": "...", "settings": {"anchors": ["Figure"]}}
+        -> {"id": 1, "latex": "...", "ms": 0.42}
+    {"id": 2, "batch": [{"text": "..."}, {"text": "...", "settings": {...}}]}
+        -> {"id": 2, "results": [{"latex": "...", "ms": ...}, ...], "ms": ...}
+    {"id": 3, "cmd": "stats"}  -> request counts, latency percentiles, warm rule sets
+    {"id": 4, "cmd": "ping"}   -> {"id": 4, "ok": true}
+    {"id": 5, "text": "...", "budget_ms": 200}
+        -> {"id": 5, "error": "TranspileTimeout: ..."} if transpiling takes longer
+
+Failed requests (and failed batch items) get {"id": ..., "error": "..."} and
+are counted in stats; the server keeps running. Settings are checked: unknown
+keys, values of the wrong type (e.g. "anchors" given as a string) and values
+out of range (e.g. a negative "table_segment_rows") fail, as does a
+"budget_ms" that is not a positive number.
+A warm transpiler is kept per distinct settings, so repeated settings pay
+neither for rule compilation nor for a cold token cache again, and
+connections transpile concurrently without sharing mutable state.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, TextIO
+
+from transpiler import LatexTranspiler, rules_key
+
+# Warm transpilers kept at once (one per distinct settings, least recently used dropped)
+MAX_INSTANCES = 16
+
+# Latencies kept for the percentiles reported by the stats command
+LATENCY_WINDOW = 10000
+
+# Settings a request may give (the keys of TranspileRules.settings): accepted types, and how to describe them
+SETTING_TYPES = {
+    'section_id': ((str,), "a string"),
+    'subsection_id': ((str,), "a string"),
+    'include_title': ((bool,), "true or false"),
+    'anchors': ((list,), "a list of strings"),
+    'primers': ((list,), "a list of strings"),
+    'lexicon': ((str, type(None)), "a path or null"),
+    'table_segment_rows': ((int, type(None)), "an integer or null"),
+}
+
+# Settings whose values are further restricted: the check (run after the type check), and how to describe it
+SETTING_RANGES = {
+    'section_id': (lambda value: value != '', "a non-empty string"),
+    'subsection_id': (lambda value: value != '', "a non-empty string"),
+    'table_segment_rows': (lambda value: value is None or value >= 0, "0 (no split) or more"),
+}
+
+
+def validate_settings(settings) -> Optional[dict]:
+    """Returns settings if a request may use them; raises ValueError for unknown keys, wrong types or bad values."""
+    if settings is None:
+        return None
+    if not isinstance(settings, dict):
+        raise ValueError("'settings' must be an object")
+    for name, value in settings.items():
+        if name not in SETTING_TYPES:
+            raise ValueError(f"Unknown setting '{name}' (known: {', '.join(SETTING_TYPES)})")
+        types, description = SETTING_TYPES[name]
+        # bool is an int subclass, but true is no row count
+        if (not isinstance(value, types) or (isinstance(value, bool) and bool not in types)
+                or (isinstance(value, list) and not all(isinstance(entry, str) for entry in value))):
+            raise ValueError(f"Setting '{name}' must be {description}")
+        if name in SETTING_RANGES:
+            check, description = SETTING_RANGES[name]
+            if not check(value):
+                raise ValueError(f"Setting '{name}' must be {description}")
+    return settings
+
+
+def validate_budget(budget_ms) -> Optional[float]:
+    """Returns the budget in seconds for a request's budget_ms; raises ValueError unless it is a positive number."""
+    if budget_ms is None:
+        return None
+    if isinstance(budget_ms, bool) or not isinstance(budget_ms, (int, float)) or not budget_ms > 0:
+        raise ValueError("'budget_ms' must be a positive number")
+    return budget_ms / 1000
+
+
+class TranspilerPool:
+    """Transpilers keyed by rules_key (which changes with a rebuilt lexicon), held so their token caches stay warm.
+
+    compile_rules interns the rules themselves; the pool is what keeps a
+    token cache per settings, since each transpiler owns its own.
+    """
+
+    def __init__(self, max_instances: int = MAX_INSTANCES):
+        self.max_instances = max_instances
+        self._instances = OrderedDict()
+
+    def get(self, settings: Optional[dict]) -> LatexTranspiler:
+        key = rules_key(settings or {})
+        transpiler = self._instances.get(key)
+        if transpiler is None:
+            transpiler = LatexTranspiler()
+            if settings:
+                transpiler.update_settings(settings)
+            self._instances[key] = transpiler
+            if len(self._instances) > self.max_instances:
+                self._instances.popitem(last=False)
+        else:
+            self._instances.move_to_end(key)
+        return transpiler
+
+    def __len__(self):
+        return len(self._instances)
+
+
+class TranspileServer:
+    """Handles decoded requests for every connection; the lock only guards the pool and counters."""
+
+    def __init__(self, max_instances: int = MAX_INSTANCES):
+        self.pool = TranspilerPool(max_instances)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def transpile_one(self, item: dict) -> dict:
+        start = time.perf_counter()
+        try:
+            text = item.get('text')
+            if not isinstance(text, str):
+                raise TypeError("'text' must be a string")
+            settings = validate_settings(item.get('settings'))
+            budget = validate_budget(item.get('budget_ms'))
+            with self.lock:
+                transpiler = self.pool.get(settings)
+            # Runs outside the lock: a transpile only shares the thread-safe token cache
+            latex = transpiler.transpile(text, budget=budget)
+        except Exception as e:
+            return self.error(f"{type(e).__name__}: {e}")
+        ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(ms)
+        return {'latex': latex, 'ms': ms}
+
+    def error(self, message: str) -> dict:
+        """A counted error response."""
+        with self.lock:
+            self.errors += 1
+        return {'error': message}
+
+    def stats(self) -> dict:
+        with self.lock:
+            ordered = sorted(self.latencies)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'uptime_s': time.time() - self.started,
+            'rule_sets': len(self.pool),
+            'ms_mean': sum(ordered) / len(ordered) if ordered else 0.0,
+            'ms_p50': percentile(0.5),
+            'ms_p99': percentile(0.99),
+        }
+
+    def handle(self, request: dict) -> dict:
+        if 'batch' in request:
+            start = time.perf_counter()
+            if isinstance(request['batch'], list):
+                results = [self.transpile_one(item) if isinstance(item, dict)
+                           else self.error("batch items must be objects") for item in request['batch']]
+                response = {'results': results, 'ms': (time.perf_counter() - start) * 1000}
+            else:
+                response = self.error("'batch' must be a list")
+        elif request.get('cmd') == 'stats':
+            response = self.stats()
+        elif request.get('cmd') == 'ping':
+            response = {'ok': True}
+        elif 'cmd' in request:
+            response = self.error(f"Unknown command: {request['cmd']}")
+        else:
+            response = self.transpile_one(request)
+        if 'id' in request:
+            response = {'id': request['id'], **response}
+        return response
+
+    def handle_line(self, line: str) -> Optional[str]:
+        """Returns the response line for one request line (None for blank lines)."""
+        if not line.strip():
+            return None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            response = {'id': None, **self.error(f"Invalid request: {e}")}
+        else:
+            response = self.handle(request)
+        return json.dumps(response, ensure_ascii=False)
+
+    def serve_stream(self, reader: TextIO, writer: TextIO):
+        for line in reader:
+            response = self.handle_line(line)
+            if response is not None:
+                writer.write(response + '\n')
+                writer.flush()
+
+
+def serve_stdio(server: TranspileServer):
+    """Serves requests from stdin until it is closed (UTF-8 regardless of locale)."""
+    stdin = open(sys.stdin.fileno(), 'r', encoding='utf-8', errors='replace', closefd=False)
+    stdout = open(sys.stdout.fileno(), 'w', encoding='utf-8', closefd=False)
+    server.serve_stream(stdin, stdout)
+
+
+def serve_socket(server: TranspileServer, path: str):
+    """Serves clients on a Unix socket, one thread per connection, until interrupted.
+
+    A stale socket left at path (one nobody accepts connections on) is
+    replaced; raises FileExistsError if anything else is there, including
+    a socket a running server still answers on.
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        pass
+    else:
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"Not a socket, refusing to replace it: {path}")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                os.remove(path)
+            else:
+                raise FileExistsError(f"A server is already listening on {path}")
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                response = server.handle_line(raw.decode('utf-8', errors='replace'))
+                if response is not None:
+                    self.wfile.write(response.encode('utf-8') + b'\n')
+
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as unix_server:
+        unix_server.daemon_threads = True
+        try:
+            unix_server.serve_forever()
+        finally:
+            os.remove(path)
+
+
+def send_requests(path: str, requests: List[Dict]) -> List[Dict]:
+    """Client helper: sends requests over the Unix socket and returns the responses in order."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        payload = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in requests).encode('utf-8')
+
+        # Send from a thread: the server answers while we are still sending, so both sides must drain
+        def send():
+            sock.sendall(payload)
+            sock.shutdown(socket.SHUT_WR)
+        sender = threading.Thread(target=send, daemon=True)
+        sender.start()
+        with sock.makefile('r', encoding='utf-8') as responses:
+            results = [json.loads(line) for line in responses]
+        sender.join()
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve LatexTranspiler over JSON lines.")
+    parser.add_argument('--socket', help="Listen on this Unix socket instead of stdin/stdout")
+    parser.add_argument('--max-instances', type=int, default=MAX_INSTANCES,
+                        help=f"Distinct settings whose transpilers are kept warm (default: {MAX_INSTANCES})")
+    args = parser.parse_args(argv)
+
+    server = TranspileServer(args.max_instances)
+    # Exit normally on SIGTERM so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        if args.socket:
+            serve_socket(server, args.socket)
+        else:
+            serve_stdio(server)
+    except KeyboardInterrupt:
+        pass
+    except FileExistsError as e:
+        print(e, file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
+                             QDialog, QLabel, QListWidget, QCheckBox,
+                             QTabWidget, QInputDialog, QLineEdit, QFileDialog, QComboBox,
+                             QSpinBox)
+
+from engines import discover_engines
+
+class SettingsDialog(QDialog):
+    def __init__(self, parent=None, current_settings=None):
+        super().__init__(parent)
+        self.setWindowTitle("Compiler Settings")
+        self.resize(400, 300)
+        self.settings = current_settings or {}
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        tabs = QTabWidget()
+
+        # --- Tab 1: Formatting ---
+        fmt_tab = QWidget()
+        fmt_layout = QVBoxLayout(fmt_tab)
+
+        # Title Toggle
+        self.title_check = QCheckBox("Include Document Title (First Line)")
+        self.title_check.setChecked(self.settings.get('include_title', True))
+        fmt_layout.addWidget(self.title_check)
+
+        # TeX engine: Auto uses the benchmarked preference, else the first installed
+        fmt_layout.addWidget(QLabel("TeX Engine:"))
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("Auto", None)
+        for name, engine in discover_engines().items():
+            self.engine_combo.addItem(f"{name} ({engine.path})", name)
+        index = self.engine_combo.findData(self.settings.get('engine'))
+        self.engine_combo.setCurrentIndex(max(index, 0))
+        fmt_layout.addWidget(self.engine_combo)
+
+        engine_path_layout = QHBoxLayout()
+        self.engine_path_edit = QLineEdit(self.settings.get('engine_path') or '')
+        self.engine_path_edit.setPlaceholderText("Engine binary (optional, if not on PATH)")
+        engine_browse_btn = QPushButton("Browse...")
+        engine_browse_btn.clicked.connect(self.browse_engine)
+        engine_path_layout.addWidget(self.engine_path_edit)
+        engine_path_layout.addWidget(engine_browse_btn)
+        fmt_layout.addLayout(engine_path_layout)
+
+        # Long tables are split into several xltabulars, which pdflatex typesets much faster
+        fmt_layout.addWidget(QLabel("Split tables longer than N rows (0: never):"))
+        self.table_segment_spin = QSpinBox()
+        self.table_segment_spin.setRange(0, 1000000)
+        self.table_segment_spin.setSingleStep(100)
+        self.table_segment_spin.setValue(self.settings.get('table_segment_rows') or 0)
+        fmt_layout.addWidget(self.table_segment_spin)
+        
+        fmt_layout.addStretch()
+        tabs.addTab(fmt_tab, "Structure")
+
+        # --- Tab 2: Keywords ---
+        lists_tab = QWidget()
+        lists_layout = QVBoxLayout(lists_tab)
+        
+        def create_list_section(label_text, key):
+            lbl = QLabel(label_text)
+            lst = QListWidget()
+            lst.addItems(self.settings.get(key, []))
+            
+            btn_layout = QHBoxLayout()
+            add_btn = QPushButton("Add")
+            del_btn = QPushButton("Remove")
+            
+            add_btn.clicked.connect(lambda: self.add_item(lst))
+            del_btn.clicked.connect(lambda: self.remove_item(lst))
+            
+            btn_layout.addWidget(add_btn)
+            btn_layout.addWidget(del_btn)
+            
+            lists_layout.addWidget(lbl)
+            lists_layout.addWidget(lst)
+            lists_layout.addLayout(btn_layout)
+            return lst
+
+        self.anchor_list = create_list_section("Anchor Words (Force Text Mode):", 'anchors')
+
+        # Lexicon file (built with lexicon.py), consulted after the anchor words
+        lexicon_layout = QHBoxLayout()
+        self.lexicon_edit = QLineEdit(self.settings.get('lexicon') or '')
+        self.lexicon_edit.setPlaceholderText("Anchor lexicon file (optional)")
+        browse_btn = QPushButton("Browse...")
+        browse_btn.clicked.connect(self.browse_lexicon)
+        lexicon_layout.addWidget(self.lexicon_edit)
+        lexicon_layout.addWidget(browse_btn)
+        lists_layout.addLayout(lexicon_layout)
+        
+        # Separator
+        line = QLabel()
+        line.setFrameStyle(QLabel.Shape.HLine | QLabel.Shadow.Sunken)
+        lists_layout.addWidget(line)
+        
+        self.primer_list = create_list_section("Math Primers (Force Math Mode):", 'primers')
+        
+        tabs.addTab(lists_tab, "Keywords")
+        layout.addWidget(tabs)
+
+        # Save Button
+        save_btn = QPushButton("Save Settings")
+        save_btn.clicked.connect(self.accept)
+        layout.addWidget(save_btn)
+
+    def add_item(self, list_widget):
+        text, ok = QInputDialog.getText(self, "Add Item", "Value:")
+        if ok and text:
+            list_widget.addItem(text)
+
+    def remove_item(self, list_widget):
+        for item in list_widget.selectedItems():
+            list_widget.takeItem(list_widget.row(item))
+
+    def browse_lexicon(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Select Lexicon", "", "Lexicon Files (*.lex);;All Files (*)")
+        if path:
+            self.lexicon_edit.setText(path)
+
+    def browse_engine(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Select TeX Engine", "", "All Files (*)")
+        if path:
+            self.engine_path_edit.setText(path)
+
+    def get_settings(self):
+        anchors = [self.anchor_list.item(i).text() for i in range(self.anchor_list.count())]
+        primers = [self.primer_list.item(i).text() for i in range(self.primer_list.count())]
+        
+        return {
+            'include_title': self.title_check.isChecked(),
+            'anchors': anchors,
+            'lexicon': self.lexicon_edit.text().strip() or None,
+            'primers': primers,
+            'engine': self.engine_combo.currentData(),
+            'engine_path': self.engine_path_edit.text().strip() or None,
+            'table_segment_rows': self.table_segment_spin.value()
+        }
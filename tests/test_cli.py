@@ -0,0 +1,68 @@
+"""Writing converted files atomically, and the app.py command line staying free of Qt."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+
+
+def test_write_if_changed_replaces_files_whole(tmp_path, monkeypatch):
+    path = tmp_path / 'part.tex'
+    cli.write_if_changed(str(path), 'first')
+    assert path.read_text() == 'first'
+    stamp = os.stat(path).st_mtime_ns
+    os.utime(path, ns=(stamp - 10 ** 9, stamp - 10 ** 9))
+    cli.write_if_changed(str(path), 'first')
+    assert os.stat(path).st_mtime_ns == stamp - 10 ** 9    # unchanged content is not rewritten
+
+    # A run interrupted before the move leaves the previous file, and no temporary one
+    def interrupted(src, dst):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(os, 'replace', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        cli.write_if_changed(str(path), 'second, much longer')
+    assert path.read_text() == 'first'
+    assert os.listdir(tmp_path) == ['part.tex']
+
+    monkeypatch.undo()
+    cli.write_if_changed(str(path), 'second')
+    assert path.read_text() == 'second' and os.listdir(tmp_path) == ['part.tex']
+
+
+# Runs the app.py given as first argument as `python app.py ARGS` would, recording every
+# attempt to import Qt (whether or not it is installed)
+QT_PROBE = r'''
+import os, runpy, sys
+attempts = []
+
+class QtImports:
+    def find_spec(self, name, path=None, target=None):
+        if name.split('.')[0] == 'PyQt6':
+            attempts.append(name)
+        return None
+
+sys.meta_path.insert(0, QtImports())
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit as e:
+    code = e.code
+else:
+    code = 0
+sys.stdout.flush()
+print('QT', code, attempts + sorted(m for m in sys.modules if m.startswith('PyQt6')))
+'''
+
+
+@pytest.mark.parametrize('args', [['--help'], ['notes.txt']], ids=['help', 'convert'])
+def test_cli_entry_point_never_imports_qt(args, tmp_path):
+    (tmp_path / 'notes.txt').write_text('Title\nx = y\n', encoding='utf-8')
+    app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+    result = subprocess.run([sys.executable, '-c', QT_PROBE, app, *args],
+                            cwd=tmp_path, capture_output=True, text=True, timeout=60)
+    assert result.stdout.splitlines()[-1] == 'QT 0 []', result.stderr
+    if args == ['notes.txt']:
+        assert (tmp_path / 'notes.tex').exists()
@@ -0,0 +1,350 @@
+"""Builds against a fake pdflatex that models pages, table counters, reruns and errors; formats; the PDF cache."""
+import os
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+
+import compiler
+from cli import write_sections
+from engines import ENGINES
+from transpiler import LatexTranspiler
+
+# Typesets every third line of a part as a page, numbers its tables, checkpoints
+# page and table in the part's .aux and, like longtable, asks for a rerun
+# whenever a part's table widths are not in its .aux yet. A document without
+# \include is typeset as a single part of its own. FATAL in a part stops the
+# run as TeX would (and then hangs, unless killed); UNDEFINED is a
+# recoverable error. -draftmode writes no PDF. -ini dumps a format, or fails
+# like a missing package when FAKE_INI_FAIL is set.
+FAKE_PDFLATEX = r'''
+import hashlib, os, re, sys, time
+args = sys.argv[1:]
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calls'), 'a') as f:
+    f.write(' '.join(args) + '\n')
+job = next((a[len('-jobname='):] for a in args if a.startswith('-jobname=')), None)
+if '-ini' in args:
+    if os.environ.get('FAKE_INI_FAIL'):
+        print("! LaTeX Error: File `xltabular.sty' not found.")
+        sys.exit(1)
+    open(job + '.fmt', 'w').write(open(args[-1]).read())
+    sys.exit(0)
+src, only = args[-1], None
+m = re.match(r'\\includeonly\{([^}]*)\}\\input\{([^}]*)\}', src)
+if m:
+    only, src = m.group(1).split(','), m.group(2)
+job = job or os.path.splitext(src)[0]
+text = open(src).read()
+if 'pdfpages' in text:
+    out = []
+    for first, last, pdf in re.findall(r'\\includepdf\[pages=\{(\d+)-(\d+)\}\]\{([^}]*)\}', text):
+        out += open(pdf).read().splitlines()[int(first) - 1:int(last)]
+    open(job + '.pdf', 'w').write('\n'.join(out) + '\n')
+    sys.exit(0)
+pages, page, table, rerun, failed = [], 1, 0, False, False
+parts = re.findall(r'^\\include\{([^}]*)\}$', text, re.M)
+standalone = not parts
+for part in parts or [os.path.splitext(src)[0]]:
+    if only is None or part in only:
+        body = open(part + '.tex').read()
+        if 'FATAL' in body:
+            print('! Emergency stop.', flush=True)
+            time.sleep(60)
+            sys.exit(1)
+        if 'UNDEFINED' in body:
+            print('! Undefined control sequence.')
+            failed = True
+        tables = []
+        for _ in range(body.count('begin{xltabular}')):
+            table += 1
+            tables.append(table)
+        width = hashlib.md5(body.encode()).hexdigest()[:4]
+        old = open(part + '.aux').read() if os.path.exists(part + '.aux') else ''
+        known = f'LT@{width}' in old
+        rerun = rerun or (tables and not known)
+        for index in range(body.count('\n') // 3):
+            pages.append(f'page {page} {part} tables {tables} w{width if known or not tables else "?"} {index}')
+            page += 1
+        widths = f'\\LT@{width}\n' if tables else ''
+        open(part + '.aux', 'w').write(f'\\relax\n{widths}\\@setckpt{{{part}}}{{\n'
+                                       f'\\setcounter{{page}}{{{page}}}\n\\setcounter{{table}}{{{table}}}\n}}\n')
+    else:
+        aux = open(part + '.aux').read()
+        page = int(re.findall(r'\\setcounter\{page\}\{(\d+)\}', aux)[-1])
+        table = int(re.findall(r'\\setcounter\{table\}\{(\d+)\}', aux)[-1])
+if not standalone:
+    open(job + '.aux', 'w').write('aux')
+if pages and '-draftmode' not in args:
+    open(job + '.pdf', 'w').write('\n'.join(pages) + '\n')
+if rerun:
+    print('Package longtable Warning: Table widths have changed. Rerun LaTeX.')
+print('ok')
+sys.exit(1 if failed else 0)
+'''
+
+SECTIONS = {
+    'intro': ['Some opening words about the topic.'] * 6,
+    'middle': ['The middle section has plain prose.'] * 9,
+    'tables': ['a\tb', '1\t2', 'After the table.'] + ['More words follow here.'] * 5,
+    'end': ['Closing remarks for the reader.'] * 6,
+}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    script = tmp_path / 'bin' / 'pdflatex'
+    script.parent.mkdir()
+    script.write_text(f'#!{sys.executable}\n{FAKE_PDFLATEX}')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return ENGINES['pdflatex']._replace(path=str(script))
+
+
+def calls(engine):
+    path = os.path.join(os.path.dirname(engine.path), 'calls')
+    with open(path) as f:
+        lines = f.read().splitlines()
+    os.remove(path)
+    return lines
+
+
+def build(directory, sections, engine):
+    """Writes the document for sections into directory and compiles it; returns the PDF text."""
+    os.makedirs(directory, exist_ok=True)
+    source = os.path.join(directory, 'doc.txt')
+    with open(source, 'w', encoding='utf-8') as f:
+        f.write('Notes\n' + '\n'.join(f'## {name}\n' + '\n'.join(lines) for name, lines in sections.items()))
+    tex_path = os.path.join(directory, 'doc.tex')
+    write_sections(LatexTranspiler(), source, tex_path)
+    with open(compiler.compile_pdf_sections(tex_path, engine, use_format=False)) as f:
+        return f.read()
+
+
+def full_build(tmp_path, sections, engine):
+    pdf = build(str(tmp_path / 'fresh'), sections, engine)
+    calls(engine)
+    return pdf
+
+
+def test_unchanged_counters_retypeset_only_the_edited_part(tmp_path, engine):
+    work = str(tmp_path / 'work')
+    build(work, SECTIONS, engine)
+    calls(engine)
+
+    edited = {**SECTIONS, 'middle': ['The middle section has edited prose.'] * 9}
+    pdf = build(work, edited, engine)
+    typeset = [line for line in calls(engine) if 'includeonly' in line]
+    assert len(typeset) == 1 and r'\includeonly{doc-s002}' in typeset[0]
+    assert pdf == full_build(tmp_path, edited, engine)
+
+
+def test_changed_table_count_retypesets_later_parts(tmp_path, engine):
+    work = str(tmp_path / 'work')
+    build(work, SECTIONS, engine)
+    calls(engine)
+
+    # Same page count, but one more table: every later table number shifts
+    edited = {**SECTIONS, 'intro': ['x\ty', '3\t4', 'Some opening words about the topic.']}
+    pdf = build(work, edited, engine)
+    typeset = [line for line in calls(engine) if 'includeonly' in line]
+    assert typeset and r'\includeonly{doc-s001,doc-s002,doc-s003,doc-s004}' in typeset[-1]
+    assert pdf == full_build(tmp_path, edited, engine)
+    assert 'doc-s003 tables [2]' in pdf
+
+
+def test_includeonly_pass_reruns_until_table_widths_settle(tmp_path, engine):
+    work = str(tmp_path / 'work')
+    build(work, SECTIONS, engine)
+    calls(engine)
+
+    edited = {**SECTIONS, 'tables': ['a\tb', '10\t20', 'After the table.'] + ['More words follow here.'] * 5}
+    pdf = build(work, edited, engine)
+    typeset = [line for line in calls(engine) if 'includeonly' in line]
+    assert len(typeset) == 2
+    assert 'w?' not in pdf
+    assert pdf == full_build(tmp_path, edited, engine)
+
+
+def test_changed_page_count_shifts_later_pages(tmp_path, engine):
+    work = str(tmp_path / 'work')
+    build(work, SECTIONS, engine)
+    calls(engine)
+
+    edited = {**SECTIONS, 'intro': ['Some opening words about the topic.'] * 12}
+    pdf = build(work, edited, engine)
+    assert pdf == full_build(tmp_path, edited, engine)
+    assert [line.split()[1] for line in pdf.splitlines()] == [str(n) for n in range(1, len(pdf.splitlines()) + 1)]
+
+
+def pdf_bytes(size):
+    return b'%PDF-1.5\n' + b'x' * size + b'\n%%EOF\n'
+
+
+def test_pdf_cache_key_includes_the_date_only_for_today(tmp_path, monkeypatch):
+    cache = compiler.PdfCache(str(tmp_path / 'cache'))
+    os.makedirs(cache.directory)
+    dated, plain = tmp_path / 'dated.tex', tmp_path / 'plain.tex'
+    dated.write_text('\\title{T}\n\\date{\\today}\n')
+    plain.write_text('\\title{T}\n\\date{}\n')
+    command = [sys.executable, '-interaction=nonstopmode', 'doc.tex']
+    keys = {path: cache.key_for(str(path), command) for path in (dated, plain)}
+
+    class Tomorrow(compiler.date):
+        @classmethod
+        def today(cls):
+            return compiler.date(2100, 1, 2)
+    monkeypatch.setattr(compiler, 'date', Tomorrow)
+    assert cache.key_for(str(dated), command) != keys[dated]
+    assert cache.key_for(str(plain), command) == keys[plain]
+
+
+def test_pdf_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = compiler.PdfCache(str(tmp_path / 'cache'), max_bytes=3100)
+    os.makedirs(cache.directory)
+    output = tmp_path / 'out.pdf'
+    for index, key in enumerate(('a', 'b', 'c')):
+        output.write_bytes(pdf_bytes(1000))
+        cache.store(key, str(output))
+        os.utime(cache.entry_path(key), (index, index))
+    assert cache.fetch('a', str(output))     # a is now the most recently used
+
+    output.write_bytes(pdf_bytes(1000))
+    cache.store('d', str(output))
+    assert sorted(os.listdir(cache.directory)) == ['a.pdf', 'c.pdf', 'd.pdf']
+    assert not cache.fetch('b', str(output))
+
+
+@pytest.mark.parametrize('content', [b'', b'%PDF-1.5\ntruncated', b'not a pdf %%EOF'])
+def test_pdf_cache_drops_corrupt_entries(tmp_path, content):
+    cache = compiler.PdfCache(str(tmp_path / 'cache'))
+    os.makedirs(cache.directory)
+    with open(cache.entry_path('k'), 'wb') as f:
+        f.write(content)
+    output = tmp_path / 'out.pdf'
+    assert not cache.fetch('k', str(output))
+    assert not output.exists() and not os.path.exists(cache.entry_path('k'))
+
+
+def compile_document(tmp_path, engine, text):
+    """Transpiles text into tmp_path/doc.tex and compiles it; returns the PDF text and the engine calls."""
+    tex_path = tmp_path / 'doc.tex'
+    tex_path.write_text(LatexTranspiler().transpile(text), encoding='utf-8')
+    pdf_path = compiler.compile_pdf(str(tex_path), engine, use_format=False, use_cache=False)
+    with open(pdf_path) as f:
+        return f.read(), calls(engine)
+
+
+TABLE_DOCUMENT = 'Notes\n' + 'Some words here.\n' * 6 + 'a\tb\n1\t2\n'
+
+
+def test_first_pass_of_aux_dependent_document_is_draft(tmp_path, engine):
+    pdf, passes = compile_document(tmp_path, engine, TABLE_DOCUMENT)
+    assert [('-draftmode' in line) for line in passes] == [True, False]
+    assert 'w?' not in pdf
+
+    # With the .aux from the last compile the widths are known: one pass, no draft
+    _, passes = compile_document(tmp_path, engine, TABLE_DOCUMENT)
+    assert len(passes) == 1 and '-draftmode' not in passes[0]
+
+
+def test_stops_when_no_rerun_is_needed(tmp_path, engine):
+    _, passes = compile_document(tmp_path, engine, 'Notes\n' + 'Plain prose only.\n' * 9)
+    assert len(passes) == 1 and '-draftmode' not in passes[0]
+
+
+def test_recoverable_errors_do_not_stop_the_passes(tmp_path, engine):
+    # Every pass exits non-zero with an error, but writes the PDF
+    pdf, passes = compile_document(tmp_path, engine, TABLE_DOCUMENT + 'An UNDEFINED macro.\n' * 3)
+    assert len(passes) == 2 and 'w?' not in pdf
+
+
+def test_fatal_error_aborts_the_pass(tmp_path, engine):
+    start = time.monotonic()
+    with pytest.raises(subprocess.CalledProcessError) as raised:
+        compile_document(tmp_path, engine, TABLE_DOCUMENT + 'A FATAL line.\n')
+    # The engine hangs after the fatal error; it must have been killed instead of waited for
+    assert time.monotonic() - start < 30
+    assert 'Emergency stop' in raised.value.stdout
+    assert len(calls(engine)) == 1
+
+
+def test_log_watcher_reads_lines_split_across_chunks():
+    watcher = compiler.LogWatcher()
+    assert not watcher.feed('! Undefined control')
+    assert not watcher.feed(' sequence.\nLaTeX Warning: Rerun to get cross-references right.\n')
+    assert watcher.errors == ['Undefined control sequence.']
+    assert not watcher.failed(1)    # errors, but the PDF was written
+    assert not watcher.feed('! Emergency st')
+    assert watcher.feed('op.\n')
+    assert watcher.fatal and watcher.failed(0)
+
+    watcher = compiler.LogWatcher()
+    watcher.feed('No pages of output.\n')
+    assert not watcher.failed(0) and watcher.failed(1)
+
+
+@pytest.fixture
+def formats(tmp_path, monkeypatch):
+    """A format cache of the test's own, with no failed builds remembered."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setattr(compiler, '_failed_formats', set())
+    return compiler.cache_dir('formats')
+
+
+def test_format_is_built_once(engine, formats, tmp_path):
+    name = compiler.ensure_format(engine.path)
+    assert name == compiler.format_name(engine.path)
+    assert os.listdir(formats) == [name + '.fmt']    # the per-process build files are gone
+    with open(os.path.join(formats, name + '.fmt')) as f:
+        assert f.read().startswith(compiler.PREAMBLE_TEXT)
+    assert [call.split()[0] for call in calls(engine)] == ['-ini']
+
+    assert compiler.ensure_format(engine.path) == name
+    assert not os.path.exists(os.path.join(os.path.dirname(engine.path), 'calls'))
+    assert compiler.ensure_format(str(tmp_path / 'missing')) is None
+
+
+def test_format_name_follows_preamble_and_binary(engine, monkeypatch):
+    name = compiler.format_name(engine.path)
+    assert compiler.format_name(engine.path) == name
+    stat_result = os.stat(engine.path)
+    os.utime(engine.path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10 ** 9))
+    updated = compiler.format_name(engine.path)
+    assert updated != name
+    monkeypatch.setattr(compiler, 'PREAMBLE_TEXT', compiler.PREAMBLE_TEXT + '\\usepackage{tikz}\n')
+    assert compiler.format_name(engine.path) not in (name, updated)
+
+
+def test_failed_format_build_falls_back(engine, formats, tmp_path, monkeypatch):
+    monkeypatch.setenv('FAKE_INI_FAIL', '1')
+    tex_path = tmp_path / 'doc.tex'
+    tex_path.write_text(LatexTranspiler().transpile('Title\nSome text.'))
+    command, _, env = compiler.compile_command(str(tex_path), engine)
+    assert not any(arg.startswith('-fmt') for arg in command) and env == {}
+    assert os.listdir(formats) == []
+
+    # Not retried this session
+    assert compiler.ensure_format(engine.path) is None
+    assert len(calls(engine)) == 1
+
+
+def test_format_is_used_only_with_the_standard_preamble(engine, formats, tmp_path):
+    standard, custom = tmp_path / 'standard.tex', tmp_path / 'custom.tex'
+    standard.write_text(LatexTranspiler().transpile('Title\nSome text.'))
+    custom.write_text('\\documentclass{article}\n\\usepackage{tikz}\n\\begin{document}x\\end{document}\n')
+
+    command, working_dir, env = compiler.compile_command(str(custom), engine)
+    assert command == [engine.path, '-interaction=nonstopmode', 'custom.tex'] and env == {}
+    assert working_dir == str(tmp_path)
+    assert not os.path.exists(os.path.join(os.path.dirname(engine.path), 'calls'))    # no format built
+
+    command, _, env = compiler.compile_command(str(standard), engine)
+    name = compiler.format_name(engine.path)
+    assert command == [engine.path, '-interaction=nonstopmode', f'-fmt={name}', 'standard.tex']
+    assert env == {'TEXFORMATS': formats + os.pathsep}
+    assert compiler.compile_command(str(standard), engine, use_format=False)[0][-2:] == [
+        '-interaction=nonstopmode', 'standard.tex']
+    xelatex = ENGINES['xelatex']._replace(path=engine.path)
+    assert compiler.compile_command(str(standard), xelatex) == (
+        [engine.path, '-interaction=nonstopmode', 'standard.tex'], str(tmp_path), {})
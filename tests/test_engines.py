@@ -0,0 +1,89 @@
+"""Locating engine binaries (MacTeX first, then PATH), discovery and the choice of engine."""
+import json
+import os
+import stat
+
+import pytest
+
+import engines
+
+
+def install(directory, name):
+    """Creates an executable stand-in for an engine binary and returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write('#!/bin/sh\nexit 0\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    """A PATH and a MacTeX directory of their own, and a cache without a saved preference."""
+    path_dir, mactex_dir = str(tmp_path / 'bin'), str(tmp_path / 'texbin')
+    os.makedirs(path_dir)
+    monkeypatch.setenv('PATH', path_dir)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setattr(engines, 'MACTEX_BIN', mactex_dir)
+    return path_dir, mactex_dir
+
+
+def test_locate_prefers_mactex(dirs):
+    path_dir, mactex_dir = dirs
+    assert engines.locate('pdflatex') is None
+    on_path = install(path_dir, 'pdflatex')
+    assert engines.locate('pdflatex') == on_path
+    mactex = install(mactex_dir, 'pdflatex')
+    assert engines.locate('pdflatex') == mactex
+    assert engines.locate('xelatex') is None
+
+
+def test_discovery_keeps_preference_order(dirs):
+    path_dir, mactex_dir = dirs
+    assert engines.discover_engines() == {}
+    install(path_dir, 'latexmk')
+    install(path_dir, 'xelatex')
+    install(mactex_dir, 'pdflatex')
+    found = engines.discover_engines()
+    assert list(found) == ['pdflatex', 'xelatex', 'latexmk']
+    assert found['pdflatex'].path == os.path.join(mactex_dir, 'pdflatex')
+    assert found['latexmk'] == engines.ENGINES['latexmk']._replace(path=os.path.join(path_dir, 'latexmk'))
+
+
+def test_resolve_engine(dirs, tmp_path):
+    path_dir, _ = dirs
+    with pytest.raises(FileNotFoundError):
+        engines.resolve_engine()
+    xelatex = install(path_dir, 'xelatex')
+    pdflatex = install(path_dir, 'pdflatex')
+    assert engines.resolve_engine().path == pdflatex
+
+    # A saved benchmark winner is used while it is installed
+    with open(engines.preference_path(), 'w', encoding='utf-8') as f:
+        json.dump({'engine': 'xelatex'}, f)
+    assert engines.resolve_engine().name == 'xelatex'
+    os.remove(xelatex)
+    assert engines.resolve_engine().name == 'pdflatex'
+
+    # Explicit names and paths
+    assert engines.resolve_engine('pdflatex').path == pdflatex
+    with pytest.raises(FileNotFoundError):
+        engines.resolve_engine('lualatex')
+    with pytest.raises(ValueError):
+        engines.resolve_engine('word')
+    custom = install(str(tmp_path / 'custom'), 'LuaLaTeX.exe')
+    assert engines.resolve_engine(path=custom) == engines.ENGINES['lualatex']._replace(path=custom)
+    other = install(str(tmp_path / 'custom'), 'mytex')
+    assert engines.resolve_engine(path=other).name == 'pdflatex'
+    with pytest.raises(FileNotFoundError):
+        engines.resolve_engine(path=str(tmp_path / 'missing' / 'xelatex'))
+
+
+def test_benchmark_needs_a_sample(dirs, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        engines.main(['benchmark', '--samples', '0'])
+    assert exit_info.value.code == 2
+    assert 'must be 1 or more' in capsys.readouterr().err
+    with pytest.raises(ValueError):
+        engines.benchmark_engines({}, samples=0)
@@ -0,0 +1,82 @@
+"""Lookups in the memory-mapped lexicon, and reloading it when the file is rebuilt."""
+import os
+
+import pytest
+
+import lexicon
+from transpiler import LatexTranspiler, compile_rules
+
+WORDS = ['Apple', 'banana', 'cherry', 'kiwi', 'zebra', 'x', 'two words', 'café', 'banana']
+
+
+@pytest.fixture
+def lex_path(tmp_path):
+    path = str(tmp_path / 'words.lex')
+    lexicon.build_lexicon(WORDS, path)
+    return path
+
+
+def test_lookup_hits_and_misses(lex_path):
+    words = lexicon.Lexicon(lex_path)
+    try:
+        assert len(words) == 6
+        for word in ('apple', 'banana', 'cherry', 'kiwi', 'zebra', 'café'):
+            assert word in words
+        # Before the first and after the last entry, prefixes, extensions, case and skipped entries
+        for word in ('aardvark', 'zzz', 'ban', 'bananas', 'Apple', 'x', 'two words', 'two', ''):
+            assert word not in words
+        assert 'kiwi' in words and 'kiwis' not in words    # memoised answers stay the same
+    finally:
+        words.close()
+
+
+def test_empty_and_foreign_files(tmp_path):
+    empty = str(tmp_path / 'empty.lex')
+    assert lexicon.build_lexicon([], empty) == 0
+    words = lexicon.Lexicon(empty)
+    assert len(words) == 0 and 'apple' not in words
+    words.close()
+
+    foreign = tmp_path / 'foreign.lex'
+    foreign.write_bytes(b'NOTALEX!' + b'\0' * 16)
+    with pytest.raises(ValueError):
+        lexicon.Lexicon(str(foreign))
+
+
+def test_rebuilt_file_is_reloaded(lex_path):
+    first = lexicon.open_lexicon(lex_path)
+    assert lexicon.open_lexicon(lex_path) is first
+    stamp = lexicon.lexicon_stamp(lex_path)
+
+    # Same size, one word swapped; only the mtime tells the versions apart
+    lexicon.build_lexicon(['lime' if w == 'kiwi' else w for w in WORDS], lex_path)
+    os.utime(lex_path, ns=(stamp[0] + 10 ** 9, stamp[0] + 10 ** 9))
+    assert lexicon.lexicon_stamp(lex_path)[1] == stamp[1]
+    second = lexicon.open_lexicon(lex_path)
+    assert second is not first
+    assert 'lime' in second and 'kiwi' not in second
+    assert 'kiwi' in first    # the old mapping stays usable
+
+    lexicon.build_lexicon(WORDS + ['delta'], lex_path)
+    assert 'delta' in lexicon.open_lexicon(lex_path)
+
+
+def test_transpiler_picks_up_a_rebuilt_lexicon(lex_path):
+    transpiler = LatexTranspiler()
+    transpiler.update_settings({'lexicon': lex_path})
+    rules = compile_rules(transpiler.current_settings())
+    assert transpiler.process_inline_math('ab') == '$a_b$'
+
+    lexicon.build_lexicon(WORDS + ['ab'], lex_path)
+    rebuilt = compile_rules(transpiler.current_settings())
+    assert rebuilt is not rules and rebuilt.lexicon_stamp != rules.lexicon_stamp
+    assert LatexTranspiler().with_rules(rebuilt).process_inline_math('ab') == 'ab'
+
+
+def test_missing_file(tmp_path):
+    path = str(tmp_path / 'missing.lex')
+    assert lexicon.lexicon_stamp(path) is None
+    with pytest.raises(FileNotFoundError):
+        lexicon.open_lexicon(path)
+    with pytest.raises(FileNotFoundError):
+        compile_rules({'lexicon': path})
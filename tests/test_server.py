@@ -0,0 +1,112 @@
+"""Request validation, error replies, the error counter, warm transpilers and the socket of the JSON-lines server."""
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+import server
+
+BAD_REQUESTS = [
+    {'text': 'Title\nx = y', 'settings': {'table_segment_rows': -1}},
+    {'text': 'Title\nx = y', 'settings': {'table_segment_rows': True}},
+    {'text': 'Title\nx = y', 'settings': {'section_id': ''}},
+    {'text': 'Title\nx = y', 'settings': {'anchors': 'Figure'}},
+    {'text': 'Title\nx = y', 'settings': {'colour': 'red'}},
+    {'text': 'Title\nx = y', 'budget_ms': -5},
+    {'text': 'Title\nx = y', 'budget_ms': 0},
+    {'text': 'Title\nx = y', 'budget_ms': '200'},
+    {'text': 'Title\nx = y', 'budget_ms': True},
+    {'text': 42},
+]
+
+
+def request(transpile_server, payload):
+    return json.loads(transpile_server.handle_line(json.dumps(payload)))
+
+
+@pytest.mark.parametrize('payload', BAD_REQUESTS, ids=[json.dumps(p)[:60] for p in BAD_REQUESTS])
+def test_bad_requests_get_counted_error_replies(payload):
+    transpile_server = server.TranspileServer()
+    response = request(transpile_server, {'id': 7, **payload})
+    assert response['id'] == 7 and 'error' in response and 'latex' not in response
+    stats = request(transpile_server, {'cmd': 'stats'})
+    assert stats['errors'] == 1 and stats['requests'] == 0
+
+
+def test_batch_counts_each_failed_item():
+    transpile_server = server.TranspileServer()
+    response = request(transpile_server, {'id': 1, 'batch': [
+        {'text': 'Title\na\tb\n1\t2', 'settings': {'table_segment_rows': 1}},
+        *BAD_REQUESTS[:3],
+        'not an object',
+    ]})
+    results = response['results']
+    assert 'xltabular' in results[0]['latex']
+    assert all('error' in result for result in results[1:])
+    stats = request(transpile_server, {'cmd': 'stats'})
+    assert stats['errors'] == 4 and stats['requests'] == 1
+
+
+def test_valid_budget_and_settings_are_accepted():
+    transpile_server = server.TranspileServer()
+    response = request(transpile_server, {'text': 'Title\nx = y', 'budget_ms': 60000,
+                                          'settings': {'table_segment_rows': 0, 'lexicon': None}})
+    assert 'latex' in response
+
+
+def test_socket_path_holding_a_file_is_left_alone(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text('keep me')
+    with pytest.raises(FileExistsError):
+        server.serve_socket(server.TranspileServer(), str(path))
+    assert path.read_text() == 'keep me'
+    assert server.main(['--socket', str(path)]) == 2
+
+
+def start_server(path):
+    """Serves on path in a daemon thread and returns once it answers a ping."""
+    thread = threading.Thread(target=server.serve_socket, args=(server.TranspileServer(), path), daemon=True)
+    thread.start()
+    for _ in range(200):
+        try:
+            responses = server.send_requests(path, [{'id': 1, 'cmd': 'ping'}])
+            break
+        except (ConnectionRefusedError, FileNotFoundError):
+            thread.join(0.01)
+    assert responses == [{'id': 1, 'ok': True}]
+    return thread
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = str(tmp_path / 'stale.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+
+    start_server(path)
+    assert os.path.exists(path)
+
+
+def test_live_socket_is_left_alone(tmp_path):
+    path = str(tmp_path / 'live.sock')
+    start_server(path)
+    with pytest.raises(FileExistsError):
+        server.serve_socket(server.TranspileServer(), path)
+    assert server.send_requests(path, [{'cmd': 'ping'}]) == [{'ok': True}]
+
+
+def test_pool_keeps_one_warm_transpiler_per_settings():
+    pool = server.TranspilerPool(max_instances=2)
+    default = pool.get(None)
+    assert pool.get({}) is default
+    figure = pool.get({'anchors': ['Figure']})
+    assert figure is not default and figure.token_cache is not default.token_cache
+    assert pool.get({'anchors': ['Figure', 'Figure']}) is figure
+    assert 'Figure' in figure.rules.anchors and len(pool) == 2
+
+    figure.transpile('Title\nx = y for z1')
+    assert pool.get({'anchors': ['Figure']}).token_cache.misses > 0
+    pool.get({'primers': ['$']})     # evicts the default, least recently used
+    assert len(pool) == 2 and pool.get(None) is not default
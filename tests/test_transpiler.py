@@ -0,0 +1,333 @@
+"""Output equivalence of the transpile entry points, and linear time on hostile input."""
+import hashlib
+import io
+import json
+import math
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import benchmark
+from corpus import ADVERSARIAL_LINES, adversarial_document, adversarial_table, generate_document
+from transpiler import PROFILED_STAGES, LRUCache, LatexTranspiler, TranspileCancelled, compile_rules
+
+# (size in bytes, seed) of the corpus.generate_document fixtures
+DOCUMENTS = [(2_000, 0), (20_000, 1), (200_000, 2)]
+
+# Characters per corpus.ADVERSARIAL_LINES line in the output checks
+ADVERSARIAL_CHARS = 2000
+
+# Characters per input in the timing checks (the benchmark's --adversarial, smaller)
+TIMING_CHARS = 100_000
+
+# SHA-256 of transpile() output from the regex pipeline the single-pass math
+# engine and lex_inline replaced; any change in output shows up here
+GOLDEN = {
+    (2000, 0): '9103ff9e531ca35b35c8048ce67a602c3a2c65b9eab629154c4436fdf70c2f7e',
+    (20000, 1): '2181252268b071e9b6e5b2fd37be153198a6725554e8c02ec789fe3ceb29957d',
+    (200000, 2): 'd83c5117614265ca73a5a655ace69cead251a6e02d2b2432c04ca90cb43070b1',
+    'punct_run': '4a4d258ce4aa3b77fe2090411ad1992b88f56fd2bb1b1225ba28c572a5b03858',
+    'punct_mix': 'ea7adc55c06ad08ede24ce5c6632592c2ccac804e690ccc6d16ffb70e94d27a3',
+    'deep_parens': '623b3a05de23749cd472e4afa49e3ce86916c44f149a9824a8d8265b91ffcad0',
+    'deep_brackets': 'e0ca3c1b13006169c0452d051b3dd9d5bbe5824bda309c77962a5d0a99f68fc8',
+    'closing_run': 'be3ffe510dead6553c132fde205a16de0ac6ef101f54221678b48bba8b0eccc6',
+    'giant_word': 'fce8fd4029af057c7a3e9793f4c63705b972aced778c05a9cf024b61a4fab762',
+    'giant_greek': '4b8bd35aa488e6c940825d23c2ef43f91a1d6715358bdf115b24d4c5d4bb8de3',
+    'giant_math': '2499a035e4df3f5e8c4bafff078fd3e57be89b7f6c84c9a22be4777deb973b8a',
+    'ellipsis_run': '71d8da0414308fec0e34fcef7235f64781f83cfa89c5dec42404352f0fe9b77b',
+    'function_calls': '92ddea9c4a8b1aa902b2745f885d76ccf1a8722a41958d26dd2cc9bfb8bc77c0',
+    'capital_call': 'd812ee4e20f913dd948d791aebef77b569de9c5be545255201d8ec1cf61155de',
+    'roots': '946964d485cfa45b20e2327135a3035e288f8c94d32266007dc2d6526b45a81f',
+    'backslashes': 'd8b6ad307784e73d455c22a56c1e1dbeca2024d22d15b2c74e7ec26fa6aaec81',
+    'many_articles': 'c56862e7a4ab61f411691c783e240321e314957536d99f1f359df04ccdfa3595',
+    'space_run': 'cbd47208a629693cc0e91e088144065ca48a36163fff4b0a83c713eca10830c4',
+    'header_dots': '50291aa675f58100dd1f0438ef097ed7284ebc9d68ca3fe54dae4e7fcfc97175',
+    'list_item': '3c4fcf8339d2ed06f225e45c04a025d4a8b49179e9c319cedc09cc7733a925b3',
+    'table_row': '3497af9ccc02896f559d1656e2d5afbc91a160694f0b94c9d047331c39aa2983',
+    'newline_token': '6ef5056a9278c92efb9fcc30f73bab50dfe5e5c3dc049e637b8c8937c2b9cb37',
+}
+
+# Non-default settings the entry points must agree under as well
+SETTINGS = {'anchors': ['Figure', 'Table'], 'primers': ['$'], 'table_segment_rows': 3, 'include_title': False}
+
+
+def digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def inputs():
+    for size, seed in DOCUMENTS:
+        yield pytest.param(generate_document(size, seed), id=f'document-{size}-{seed}')
+    for name in ADVERSARIAL_LINES:
+        yield pytest.param(adversarial_document(name, ADVERSARIAL_CHARS), id=name)
+    yield pytest.param(adversarial_table(ADVERSARIAL_CHARS), id='table')
+    # A list with a table inside is flushed differently at the end of the input than before more text
+    yield pytest.param('Lists\n' + '- a\n- b\nx\ty\n1\t2\nafter the list\n' * 6 + '- c\nu\tv\n', id='list-table')
+    yield pytest.param('', id='empty')
+    yield pytest.param('Title only\n\n\n', id='title-only')
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        yield executor
+
+
+@pytest.fixture(params=[None, SETTINGS], ids=['defaults', 'settings'])
+def transpiler(request):
+    transpiler = LatexTranspiler()
+    if request.param:
+        transpiler.update_settings(request.param)
+    return transpiler
+
+
+@pytest.mark.parametrize('key', list(GOLDEN), ids=str)
+def test_output_matches_previous_pipeline(key):
+    if isinstance(key, tuple):
+        text = generate_document(*key)
+    else:
+        text = adversarial_document(key, ADVERSARIAL_CHARS)
+    assert digest(LatexTranspiler().transpile(text)) == GOLDEN[key]
+
+
+@pytest.mark.parametrize('text', list(inputs()))
+def test_entry_points_agree(text, transpiler, pool):
+    expected = transpiler.transpile(text)
+
+    assert transpiler.transpile(text, budget=60) == expected
+    assert LatexTranspiler().transpile(text, compile_rules(transpiler.rules.settings())) == expected
+    assert '\n'.join(transpiler.iter_transpile(text.split('\n'))) == expected
+    out = io.StringIO()
+    transpiler.transpile_stream(io.StringIO(text), out)
+    assert out.getvalue() == expected
+    assert transpiler.transpile_incremental(text) == expected
+    assert transpiler.transpile_incremental(text) == expected
+    assert transpiler.transpile_incremental(text, budget=60) == expected
+
+    assert transpiler.transpile_parallel(text, 2, executor=pool, min_chunk_lines=7) == expected
+    assert transpiler.transpile_parallel(text, 2, executor=pool, budget=60) == expected
+    out = io.StringIO()
+    transpiler.transpile_parallel_stream(io.StringIO(text), out, 2, executor=pool, chunk_lines=5)
+    assert out.getvalue() == expected
+
+
+def test_incremental_after_edits():
+    transpiler = LatexTranspiler()
+    lines = generate_document(20_000, 3).split('\n')
+    for cut in (len(lines) // 2, len(lines) // 3, 5):
+        edited = '\n'.join(lines[:cut] + ['- inserted item with x = y', 'a\tb'] + lines[cut:])
+        assert transpiler.transpile_incremental(edited) == transpiler.transpile(edited)
+
+
+def test_adversarial_inputs_stay_linear():
+    _, collapses = benchmark.bench_adversarial(TIMING_CHARS, 3)
+    assert collapses == []
+
+
+def test_budget_stops_single_blocks():
+    _, overruns = benchmark.bench_budget(TIMING_CHARS, 3)
+    assert overruns == []
+
+
+@pytest.mark.parametrize('segment_rows, segments', [(0, 1), (1, 5), (2, 3), (5, 1), (50, 1)])
+def test_table_segments_keep_every_row(segment_rows, segments):
+    transpiler = LatexTranspiler()
+    transpiler.update_settings({'table_segment_rows': segment_rows})
+    rows = ['h1\th2'] + [f'r{n}\tv{n}' for n in range(5)]
+    latex = transpiler.generate_table_block(rows)
+    assert latex.count(r'\begin{xltabular}') == latex.count(r'\end{xltabular}') == segments
+    assert latex.count(r'\addtocounter{table}{-1}') == segments - 1
+    assert all(f'r_{n}' in latex for n in range(5))
+
+
+def test_negative_table_segment_rows_are_rejected():
+    with pytest.raises(ValueError):
+        compile_rules({'table_segment_rows': -3})
+    transpiler = LatexTranspiler()
+    with pytest.raises(ValueError):
+        transpiler.update_settings({'table_segment_rows': -1})
+    assert transpiler.table_segment_rows == 0
+
+
+def test_rules_are_immutable():
+    rules = compile_rules({'anchors': ['Figure'], 'primers': ['$']})
+    for name in ('anchors', 'table_segment_rows', 'key', 'brand_new'):
+        with pytest.raises(AttributeError):
+            setattr(rules, name, None)
+    assert isinstance(rules.anchors, frozenset) and isinstance(rules.primers, tuple)
+    with pytest.raises(AttributeError):
+        rules.anchors.add('Table')
+
+    # update_settings switches snapshots instead of changing the shared one
+    transpiler = LatexTranspiler()
+    transpiler.update_settings(rules.settings())
+    assert transpiler.rules is rules
+    transpiler.update_settings({'primers': []})
+    assert transpiler.rules is not rules and rules.primers == ('$',)
+
+
+def test_rules_are_interned_by_settings():
+    settings = {'anchors': ['Figure'], 'table_segment_rows': 5}
+    rules = compile_rules(settings)
+    assert compile_rules(dict(settings)) is rules
+    assert compile_rules({**settings, 'anchors': ['Figure', 'Figure']}) is rules
+    assert compile_rules(rules.settings()) is rules
+    assert compile_rules({**settings, 'table_segment_rows': 6}) is not rules
+    assert len({rules, compile_rules(settings), compile_rules({**settings, 'table_segment_rows': 6})}) == 2
+
+    # Transpilers sharing the snapshot keep their own token caches
+    first, second = LatexTranspiler(), LatexTranspiler()
+    first.update_settings(settings)
+    second.update_settings(settings)
+    assert first.rules is second.rules and first.token_cache is not second.token_cache
+
+
+def test_lru_cache_evicts_least_recently_used_and_counts():
+    cache = LRUCache(3)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    assert cache.get('a') == 'A'           # a is now the most recently used
+    cache.put('d', 'D')
+    assert cache.get('b') is None and len(cache) == 3
+    assert [cache.get(key) for key in 'acd'] == ['A', 'C', 'D']
+    assert cache.stats() == {'hits': 4, 'misses': 1, 'evictions': 1, 'size': 3, 'maxsize': 3}
+
+    disabled = LRUCache(0)
+    disabled.put('a', 1)
+    assert disabled.get('a') is None and len(disabled) == 0
+
+
+def test_token_cache_stays_within_cache_size():
+    transpiler = LatexTranspiler(cache_size=8)
+    cache = transpiler.token_cache
+    before = cache.stats()
+    line = ' '.join(f'x{n}' for n in range(20))
+    first = transpiler.process_inline_math(line)
+    assert len(cache) == 8
+    assert cache.misses - before['misses'] == 20 and cache.evictions - before['evictions'] == 12
+
+    # Only the last eight tokens are cached, and the first twelve evict them again before they are reached
+    again = transpiler.process_inline_math(line)
+    assert again == first
+    assert cache.hits - before['hits'] == 0 and cache.misses - before['misses'] == 40
+    transpiler.process_inline_math(' '.join(f'x{n}' for n in range(12, 20)))
+    assert cache.hits - before['hits'] == 8 and len(cache) == 8
+
+
+def test_token_cache_counters_are_per_transpiler():
+    first, second = LatexTranspiler(), LatexTranspiler()
+    line = 'x1 + y2 = z3 for every word'
+    first.process_inline_math(line)
+    first.process_inline_math(line)
+    assert first.token_cache.hits > 0 and first.token_cache.misses > 0
+    assert second.token_cache.stats()['hits'] == 0 and second.token_cache.stats()['misses'] == 0
+
+    second.process_inline_math(line)
+    assert second.token_cache.hits == 0 and second.token_cache.misses == first.token_cache.misses
+
+    # New settings clear the entries rendered under the old ones, keeping the counters
+    size, hits = len(first.token_cache), first.token_cache.hits
+    first.update_settings({'anchors': ['Figure']})
+    assert size > 0 and len(first.token_cache) == 0 and first.token_cache.hits == hits
+    first.process_inline_math(line)
+    first.update_settings({'anchors': ['Figure']})    # unchanged settings keep the cache
+    assert len(first.token_cache) == size
+
+
+def test_transpile_math_matches_and_outruns_the_legacy_engine():
+    results, mismatches = benchmark.bench_math_engine(0, 3, 5000)
+    assert mismatches == []
+    assert results[-1]['speedup'] >= benchmark.MATH_MIN_SPEEDUP
+
+
+def test_primers_force_math_without_splitting_words():
+    transpiler = LatexTranspiler()
+    assert transpiler.process_inline_math('the wor@@ld is') == 'the wor@@ld is'
+    assert not transpiler.is_math_line('foo @@ bar')
+
+    transpiler.update_settings({'primers': ['@@', '∮']})
+    assert transpiler.process_inline_math('the wor@@ld is') == 'the $wor@@ld$ is'
+    # Letters glued to a primer are not subscripted; the rest of the token still is
+    assert transpiler.process_inline_math('x1+y@@ and ab@@cd') == '$x_1+y@@$ and $ab@@cd$'
+    assert transpiler.process_inline_math('∮ab, then') == '$∮ab$, then'
+
+    # A primer makes a line math like a math symbol does: only with fewer than two English words
+    assert transpiler.is_math_line('foo @@ bar')
+    assert transpiler.detect_structure('foo @@ bar') == ('math_display', 'foo @@ bar')
+    assert not transpiler.is_math_line('the value is @@ for this')
+
+
+PROFILED_TEXT ='Title\nx = y\nthe value of α is small\n- item one\n- item two\na\tb\n1\t2'
+PROFILED_CALLS = {
+    'transpile': 1, 'detect_structure': 4, 'is_math_line': 4, 'process_inline_math': 8, 'is_math_token': 13,
+    'transpile_math': 5, 'format_list_content': 2, 'generate_table_block': 1, 'render_table_rows': 1,
+}
+
+
+def test_profiling_counts_stage_calls():
+    transpiler = LatexTranspiler(profile=True)
+    expected = LatexTranspiler().transpile(PROFILED_TEXT)
+    assert transpiler.transpile(PROFILED_TEXT) == expected
+    assert transpiler.stats.calls == PROFILED_CALLS
+    assert all(seconds >= 0 for seconds in transpiler.stats.seconds.values())
+    report = transpiler.stats.report().split('\n')
+    assert report[1].split()[0] == 'transpile' and len(report) == len(PROFILED_CALLS) + 1
+
+    # Copies with other rules, or with a budget, profile into the same stats; each transpile resets them
+    assert transpiler.transpile(PROFILED_TEXT, compile_rules({'anchors': ['Figure']})) == expected
+    assert transpiler.stats.calls == PROFILED_CALLS
+    assert transpiler.transpile(PROFILED_TEXT, budget=60) == expected
+    assert transpiler.stats.calls['transpile'] == 1 and transpiler.stats.calls['detect_structure'] == 4
+
+    transpiler.enable_profiling(False)
+    assert transpiler.stats is None
+    assert not any(stage in transpiler.__dict__ for stage in PROFILED_STAGES)
+    assert transpiler.transpile(PROFILED_TEXT) == expected
+
+
+def test_benchmark_profile_reports_stages(tmp_path):
+    output = tmp_path / 'bench.json'
+    assert benchmark.main(['--sizes', '2KB', '--repeat', '1', '--jobs', '1', '--skip-stages',
+                           '--profile', '--output', str(output)]) == 0
+    profile = json.loads(output.read_text())['profile']
+    assert profile['transpile']['calls'] == 1
+    assert {'detect_structure', 'process_inline_math', 'transpile_math'} <= set(profile)
+
+
+@pytest.mark.parametrize('sizes', ['', ',', '1KB,huge'])
+def test_benchmark_rejects_bad_sizes(sizes, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        benchmark.main(['--sizes', sizes, '--profile'])
+    assert exit_info.value.code == 2 and '--sizes' in capsys.readouterr().err
+
+
+def test_cancel_stops_a_running_incremental_transpile():
+    transpiler = LatexTranspiler(cache_size=0)
+    small = generate_document(2_000, 4)
+    assert transpiler.transpile_incremental(small, budget=math.inf) == transpiler.transpile(small)
+    cached = transpiler._block_cache
+
+    text = adversarial_document('giant_math', 4_000_000)
+    started = threading.Event()
+    outcome = []
+
+    def run():
+        started.set()
+        try:
+            transpiler.transpile_incremental(text, budget=math.inf)
+            outcome.append('finished')
+        except TranspileCancelled:
+            outcome.append('cancelled')
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    started.wait()
+    while transpiler._deadline is None and worker.is_alive():
+        time.sleep(0.001)
+    start = time.monotonic()
+    transpiler.cancel()
+    worker.join(30)
+    assert outcome == ['cancelled'] and time.monotonic() - start < 5
+    assert transpiler._block_cache is cached and transpiler._deadline is None
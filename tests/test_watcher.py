@@ -0,0 +1,94 @@
+"""Debouncing, change detection and unchanged-content skips of the watch mode."""
+import hashlib
+import os
+import threading
+
+import watcher
+from cli import output_path_for
+
+
+def test_debouncer_coalesces_events_per_path():
+    debouncer = watcher.Debouncer(1.0)
+    for now in (0.0, 0.4, 0.8):
+        debouncer.touch('a.txt', now)
+    debouncer.touch('b.txt', 0.5)
+    assert len(debouncer) == 2
+    assert debouncer.next_deadline(set()) == 1.5
+
+    assert debouncer.ready(1.6, set(), 10) == ['b.txt']      # a.txt was touched again at 0.8
+    assert debouncer.ready(1.7, set(), 10) == []
+    assert debouncer.ready(1.8, set(), 10) == ['a.txt']      # once, for three events
+    assert len(debouncer) == 0
+
+
+def test_debouncer_holds_busy_paths_and_respects_the_limit():
+    debouncer = watcher.Debouncer(1.0)
+    for index, path in enumerate(('a.txt', 'b.txt', 'c.txt')):
+        debouncer.touch(path, index / 10)
+    assert debouncer.next_deadline({'a.txt'}) == 1.1
+    assert debouncer.ready(5.0, {'a.txt'}, 1) == ['b.txt']
+    assert debouncer.ready(5.0, {'a.txt'}, 0) == []
+    assert debouncer.ready(5.0, set(), 5) == ['a.txt', 'c.txt']
+
+
+def test_polling_watcher_reports_each_changed_file_once(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    old = tmp_path / 'old.txt'
+    old.write_text('old')
+    polling = watcher.PollingWatcher([str(tmp_path)], '.txt', interval=0)
+    assert polling.changes(0) == set()
+
+    new = tmp_path / 'sub' / 'new.txt'
+    for text in ('one', 'two', 'three'):
+        new.write_text(text)
+    (tmp_path / 'notes.md').write_text('ignored')
+    assert polling.changes(0) == {str(new)}
+    assert polling.changes(0) == set()
+
+    stamp = old.stat().st_mtime_ns
+    os.utime(old, ns=(stamp + 10 ** 9, stamp + 10 ** 9))
+    assert polling.changes(0) == {str(old)}
+
+
+def test_content_digest_hashes_in_chunks(tmp_path):
+    path = tmp_path / 'big.txt'
+    data = os.urandom(3 * (1 << 20) + 17)
+    path.write_bytes(data)
+    assert watcher.content_digest(str(path)) == hashlib.sha256(data).hexdigest()
+
+
+def test_timestamp_only_change_is_not_rebuilt(tmp_path):
+    roots = [str(tmp_path)]
+    first, second = tmp_path / 'first.txt', tmp_path / 'second.txt'
+    first.write_text('Notes\nx = y\n')
+    results = []
+    converted = threading.Event()
+    stop = threading.Event()
+
+    def make_job(path):
+        return (path, output_path_for(path, None, None), False, None, None, True, False, None)
+
+    def report(result):
+        results.append(result)
+        converted.set()
+        if result.source == str(second):
+            stop.set()
+
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.append(watcher.watch_folders(
+        roots, make_job, lambda path: make_job(path)[1], {}, report, 2, 0.05, True, stop=stop)))
+    thread.start()
+    try:
+        assert converted.wait(60)
+        stamp = first.stat().st_mtime_ns
+        os.utime(first, ns=(stamp + 10 ** 9, stamp + 10 ** 9))
+        # Quiet no earlier than first.txt, so by the time it is converted first.txt has been checked
+        second.write_text('Notes\na + b\n')
+        assert stop.wait(60)
+    finally:
+        stop.set()
+        thread.join(60)
+
+    assert [r.source for r in results] == [str(first), str(second)]
+    assert not any(r.error for r in results)
+    assert outcome == [(2, 1)]
@@ -1,120 +1,773 @@
+import os
 import re
-from typing import List, Tuple, Optional
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+# --- Math Engine Patterns ---
+# Function names and the Enc/Dec operators, rewritten in a single scan.
+FUNCTION_PATTERN = re.compile(r'\b(?:(Pr|log|sin|cos|lim)(?=[\[\(])|(Enc|Dec)k(?=\())')
+SQRT_ARG_PATTERN = re.compile(r'√(\w+)')
+# Letter+digit (x1) and letter+letter (ab) subscripts, rewritten in a single scan.
+SUBSCRIPT_PATTERN = re.compile(r'(?<!\\)\b([a-zA-Z])(?:(\d)|([a-zA-Z]))\b')
+# Longest stretch a match of each (lookahead included) covers, for budgeted scans in windows
+FUNCTION_REACH = 5
+SUBSCRIPT_REACH = 3
+
+# Characters escaped before math mapping (no padding, unlike math_map entries)
+MATH_ESCAPES = {'%': r'\%', '#': r'\#', '$': r'\$', '&': r'\&'}
+
+# --- Tokenizer & Structure Patterns ---
+FUNCTION_CALL_PATTERN = re.compile(r'\b[A-Z][a-zA-Z0-9]*\(')
+WORD_PATTERN = re.compile(r'\S+')
+ENGLISH_WORD_PATTERN = re.compile(r'\b[a-zA-Z]{2,}\b')
+HEADER_PATTERN = re.compile(r'^(\d+(?:\.\d+)+)\.?\s+(.*)')
+ENUMERATE_PATTERN = re.compile(r'^\d+\.\s+')
+
+# Lines that may continue a list run (checked after strip, before structure detection)
+LIST_ITEM_PATTERN = re.compile(r'(?:[-*] |\d+\.\s)')
+
+# Punctuation peeled off both ends of a token; it stays in text mode around $...$
+TOKEN_PUNCT = '.,;:?!()[]"\''
+# 'a'/'an' is math only when the next token contains one of these (e.g. "a + b")
+ARTICLE_MATH_CHARS = ('=', '+', '≤', '≥', '>', '<', '⊕', '≈')
+
+LATEX_PREAMBLE = (
+    r'\documentclass{article}',
+    r'\usepackage{amsmath, amssymb}',
+    r'\usepackage[utf8]{inputenc}',
+    r'\usepackage{xltabular}',
+    r'\usepackage{booktabs}',
+    r'\setlength{\parskip}{1em}',
+)
+
+# Non-prose characters that mark a token as math (in addition to math_map keys)
+MATH_TOKEN_CHARS = {'=', '<', '>', '+', '◦', '·', '±', '^', '_', '|', '\\', '/'}
+# Characters that mark a whole line as display math (in addition to math_map keys)
+MATH_LINE_CHARS = {'=', '≤', '≥', '≠', '≈', '→', '<', '>'}
+
+# Default section markers (settings 'section_id' / 'subsection_id')
+SECTION_ID = "##"
+SUBSECTION_ID = "###"
+
+# Text Mode: Characters that must be escaped in normal prose
+TEXT_SPECIAL_CHARS = {
+    '&': r'\&', '%': r'\%', '$': r'\$', '#': r'\#', '_': r'\_',
+    '{': r'\{', '}': r'\}', '~': r'\textasciitilde{}', '^': r'\^{}'
+}
+
+# Math Mode: Unicode -> LaTeX Command Map
+MATH_MAP = {
+    # Greek, Operators, etc.
+    'α': r'\alpha', 'β': r'\beta', 'γ': r'\gamma', 'δ': r'\delta', 'ϵ': r'\epsilon', 
+    'ε': r'\varepsilon', 'ζ': r'\zeta', 'η': r'\eta', 'θ': r'\theta', 'ι': r'\iota', 
+    'κ': r'\kappa', 'λ': r'\lambda', 'μ': r'\mu', 'ν': r'\nu', 'ξ': r'\xi', 
+    'π': r'\pi', 'ρ': r'\rho', 'σ': r'\sigma', 'τ': r'\tau', 'υ': r'\upsilon', 
+    'φ': r'\phi', 'χ': r'\chi', 'ψ': r'\psi', 'ω': r'\omega',
+    'Γ': r'\Gamma', 'Δ': r'\Delta', 'Θ': r'\Theta', 'Λ': r'\Lambda', 
+    'Ξ': r'\Xi', 'Π': r'\Pi', 'Σ': r'\Sigma', 'Φ': r'\Phi', 'Ψ': r'\Psi', 'Ω': r'\Omega',
+    '⊕': r'\oplus', '⊗': r'\otimes', '⊖': r'\ominus', '⊙': r'\odot',
+    '×': r'\times', '·': r'\cdot', '÷': r'\div', '±': r'\pm',
+    '≤': r'\le', '≥': r'\ge', '≠': r'\neq', '≈': r'\approx', '≡': r'\equiv',
+    '→': r'\to', '←': r'\gets', '⇒': r'\Rightarrow', '⇔': r'\Leftrightarrow', '↦': r'\mapsto',
+    '∀': r'\forall', '∃': r'\exists', '¬': r'\neg', '∧': r'\land', '∨': r'\lor',
+    '∈': r'\in', '∉': r'\notin', '⊂': r'\subset', '⊃': r'\supset', 
+    '⊆': r'\subseteq', '⊇': r'\supseteq', '∪': r'\cup', '∩': r'\cap', 
+    '∅': r'\emptyset', '∞': r'\infty', '∂': r'\partial', '∇': r'\nabla', 
+    '∑': r'\sum', '∏': r'\prod', '∫': r'\int', '...':r'\ldots', '◦':r'\circ',
+    '*': r'\times', '{': r'\{', '}': r'\}'
+}
+
+# English Anchor Words (Base Set); user anchors and the lexicon are layered over it
+BASE_ANCHORS = frozenset({
+    'the', 'and', 'for', 'is', 'are', 'this', 'that', 'with', 'from', 'to', 'in', 'on', 'by', 'send', 'sends', 'single', 'response',
+    'an', 'as', 'at', 'be', 'or', 'we', 'our', 'it', 'if', 'then', 'of', 'can', 'has', 'have','security',
+    'result', 'method', 'using', 'given', 'where', 'let', 'assume', 'note', 'function', 'define','fundamental',
+    'suppose', 'hence', 'thus', 'therefore', 'show', 'prove', 'prover', 'such', 'valid', 'check', 'random', 'no', 'input',
+    'am', 'do', 'go', 'he', 'me', 'my', 'ok', 'so', 'up', 'us', 'we', 'ip'
+})
+
+# Table rows rendered (and yielded as one fragment) at a time
+TABLE_BATCH_ROWS = 256
+# Distinct cells remembered per table (the memo is cleared when full)
+TABLE_CELL_MEMO = 65536
+
+# Tokens, words or regex matches handled between time budget checks within one line
+DEADLINE_STRIDE = 4096
+
+# Chunks submitted but not yet yielded, per worker, in iter_parallel
+IN_FLIGHT_PER_JOB = 2
+
+# Token cache entries per transpiler (shared with its with_rules views under the same rules)
+TOKEN_CACHE_SIZE = 4096
+# Distinct rule snapshots interned at once (least recently requested dropped)
+INTERNED_RULES = 64
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded least-recently-used mapping with hit/miss/eviction counters.
+
+    Safe to share between threads without a lock: each OrderedDict call is
+    atomic for str keys, and a lost race only costs a recomputation (or a
+    miscounted statistic).
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+            self._data.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        try:
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        except KeyError:
+            pass  # Another thread evicted it first
+
+    def clear(self):
+        """Drops all entries; counters are kept so they span the cache's lifetime (its transpiler's)."""
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._data), 'maxsize': self.maxsize}
+
+
+# Methods timed when profiling is enabled (nested stages count toward their callers too)
+PROFILED_STAGES = (
+    'detect_structure', 'is_math_line', 'process_inline_math', 'is_math_token',
+    'transpile_math', 'generate_table_block', 'render_table_rows', 'format_list_content',
+)
+
+
+class StageStats:
+    """Call counts and cumulative wall time per transpiler stage."""
 
-class LatexTranspiler:
     def __init__(self):
-        # --- Settings Defaults ---
-        self.section_id = "##"
-        self.subsection_id = "###"
-        self.include_title = True
-        
-        # 1. Text Mode: Characters that must be escaped in normal prose
-        self.text_special_chars = {
-            '&': r'\&', '%': r'\%', '$': r'\$', '#': r'\#', '_': r'\_',
-            '{': r'\{', '}': r'\}', '~': r'\textasciitilde{}', '^': r'\^{}'
-        }
-        
-        # 2. Math Mode: Unicode -> LaTeX Command Map
-        self.math_map = {
-            # Greek, Operators, etc.
-            'α': r'\alpha', 'β': r'\beta', 'γ': r'\gamma', 'δ': r'\delta', 'ϵ': r'\epsilon', 
-            'ε': r'\varepsilon', 'ζ': r'\zeta', 'η': r'\eta', 'θ': r'\theta', 'ι': r'\iota', 
-            'κ': r'\kappa', 'λ': r'\lambda', 'μ': r'\mu', 'ν': r'\nu', 'ξ': r'\xi', 
-            'π': r'\pi', 'ρ': r'\rho', 'σ': r'\sigma', 'τ': r'\tau', 'υ': r'\upsilon', 
-            'φ': r'\phi', 'χ': r'\chi', 'ψ': r'\psi', 'ω': r'\omega',
-            'Γ': r'\Gamma', 'Δ': r'\Delta', 'Θ': r'\Theta', 'Λ': r'\Lambda', 
-            'Ξ': r'\Xi', 'Π': r'\Pi', 'Σ': r'\Sigma', 'Φ': r'\Phi', 'Ψ': r'\Psi', 'Ω': r'\Omega',
-            '⊕': r'\oplus', '⊗': r'\otimes', '⊖': r'\ominus', '⊙': r'\odot',
-            '×': r'\times', '·': r'\cdot', '÷': r'\div', '±': r'\pm',
-            '≤': r'\le', '≥': r'\ge', '≠': r'\neq', '≈': r'\approx', '≡': r'\equiv',
-            '→': r'\to', '←': r'\gets', '⇒': r'\Rightarrow', '⇔': r'\Leftrightarrow', '↦': r'\mapsto',
-            '∀': r'\forall', '∃': r'\exists', '¬': r'\neg', '∧': r'\land', '∨': r'\lor',
-            '∈': r'\in', '∉': r'\notin', '⊂': r'\subset', '⊃': r'\supset', 
-            '⊆': r'\subseteq', '⊇': r'\supseteq', '∪': r'\cup', '∩': r'\cap', 
-            '∅': r'\emptyset', '∞': r'\infty', '∂': r'\partial', '∇': r'\nabla', 
-            '∑': r'\sum', '∏': r'\prod', '∫': r'\int', '...':r'\ldots', '◦':r'\circ',
-            '*': r'\times', '{': r'\{', '}': r'\}'
-        }
+        self.calls = {}
+        self.seconds = {}
+
+    def record(self, stage: str, seconds: float):
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def reset(self):
+        self.calls.clear()
+        self.seconds.clear()
+
+    def merge(self, stats: dict):
+        """Adds the counts of another StageStats, given as its as_dict()."""
+        for stage, entry in stats.items():
+            self.calls[stage] = self.calls.get(stage, 0) + entry['calls']
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + entry['seconds']
+
+    def as_dict(self) -> dict:
+        return {stage: {'calls': self.calls[stage], 'seconds': self.seconds[stage]} for stage in self.calls}
+
+    def report(self) -> str:
+        """Plain-text table, slowest stage first, with share of the whole transpile."""
+        total = self.seconds.get('transpile', 0.0)
+        lines = [f"{'stage':<22}{'calls':>10}{'total ms':>12}{'us/call':>10}{'share':>8}"]
+        for stage in sorted(self.seconds, key=self.seconds.get, reverse=True):
+            seconds, calls = self.seconds[stage], self.calls[stage]
+            share = f"{seconds / total:7.1%}" if total else ''
+            lines.append(f"{stage:<22}{calls:>10}{seconds * 1000:>12.2f}{seconds * 1e6 / calls:>10.2f}{share:>8}")
+        return '\n'.join(lines)
+
+
+def _timed(stats: StageStats, stage: str, method):
+    clock = time.perf_counter
+
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats.record(stage, clock() - start)
+    return timed
+
+
+def _timed_fragments(stats: StageStats, stage: str, fragments: Iterator[str]) -> Iterator[str]:
+    """Passes fragments through, recording the time spent producing them as one call of stage."""
+    clock = time.perf_counter
+    seconds = 0.0
+    try:
+        while True:
+            start = clock()
+            try:
+                fragment = next(fragments)
+            except StopIteration:
+                return
+            finally:
+                seconds += clock() - start
+            yield fragment
+    finally:
+        stats.record(stage, seconds)
+
+
+def _function_sub(match) -> str:
+    if match.group(1):
+        return '\\' + match.group(1)
+    return f"\\text{{{match.group(2)}}}_k"
+
+
+def _symbol_detector(symbols: Iterable[str]):
+    """Compiles symbols into one pattern; returns its search method (one linear scan per call).
+
+    Single characters share a character class, so the cost no longer grows
+    with the number of math_map keys; longer keys ('...', primers) are alternatives.
+    """
+    symbols = set(symbols)
+    chars = ''.join(re.escape(s) for s in sorted(symbols) if len(s) == 1)
+    longer = [re.escape(s) for s in sorted(symbols, key=len, reverse=True) if len(s) > 1]
+    alternatives = ([f'[{chars}]'] if chars else []) + longer
+    return re.compile('|'.join(alternatives) or r'(?!)').search
 
-        # 3. English Anchor Words (Base Set)
-        self.english_anchors = {
-            'the', 'and', 'for', 'is', 'are', 'this', 'that', 'with', 'from', 'to', 'in', 'on', 'by', 'send', 'sends', 'single', 'response',
-            'an', 'as', 'at', 'be', 'or', 'we', 'our', 'it', 'if', 'then', 'of', 'can', 'has', 'have','security',
-            'result', 'method', 'using', 'given', 'where', 'let', 'assume', 'note', 'function', 'define','fundamental',
-            'suppose', 'hence', 'thus', 'therefore', 'show', 'prove', 'prover', 'such', 'valid', 'check', 'random', 'no', 'input',
-            'am', 'do', 'go', 'he', 'me', 'my', 'ok', 'so', 'up', 'us', 'we', 'ip'
+
+class TranspileTimeout(TimeoutError):
+    """Raised when a transpile runs past its time budget."""
+
+
+class TranspileCancelled(Exception):
+    """Raised when a transpile is stopped by LatexTranspiler.cancel()."""
+
+
+class _Deadline:
+    """End of a transpile's time budget.
+
+    Checked as each line is read, per table batch and every DEADLINE_STRIDE
+    tokens or matches within a line, so a single huge line or table cannot
+    overrun it. Uses time.monotonic, which is valid across processes.
+    cancel() (from any thread) makes the next check raise TranspileCancelled.
+    """
+    __slots__ = ('seconds', 'at', 'cancelled')
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.at = time.monotonic() + seconds
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        self.at = float('-inf')
+
+    def check(self):
+        if time.monotonic() > self.at:
+            if self.cancelled:
+                raise TranspileCancelled("Transpile cancelled")
+            raise TranspileTimeout(f"Transpile exceeded its time budget of {self.seconds:g} s")
+
+    def iterate(self, items: Iterable, stride: int = 1) -> Iterator:
+        """Passes items through, checking before every stride-th one."""
+        for index, item in enumerate(items):
+            if not index % stride:
+                self.check()
+            yield item
+
+    def sub(self, pattern, repl, text: str, reach: int, window: int = DEADLINE_STRIDE * 16) -> str:
+        """pattern.sub(repl, text) for a callable repl, checking before every window of characters.
+
+        reach is how far past its start a match (with its lookahead) can
+        extend. Each scan starts at a position in the full text rather than a
+        slice, so lookbehinds and \\b still see the preceding character.
+        Dense matches are checked every DEADLINE_STRIDE calls of repl too.
+        """
+        pieces = []
+        done = start = 0
+        while start < len(text):
+            self.check()
+            end = start + window
+            for count, match in enumerate(pattern.finditer(text, start, end + reach), 1):
+                if match.start() >= end:
+                    break
+                if not count % DEADLINE_STRIDE:
+                    self.check()
+                pieces.append(text[done:match.start()])
+                pieces.append(repl(match))
+                done = match.end()
+            start = max(end, done)
+        pieces.append(text[done:])
+        return ''.join(pieces)
+
+
+def _stripped_lines(input_lines: Iterable[str]) -> Iterator[str]:
+    """Lazily yields the lines of ''.join(input_lines).strip().split('\\n').
+
+    Blank lines are only released once a later non-blank line arrives, so
+    trailing blanks are dropped without reading the whole input up front.
+    """
+    held = None
+    blank_run = 0
+    for line in input_lines:
+        if line.endswith('\n'):
+            line = line[:-1]
+        if not line.strip():
+            blank_run += held is not None
+            continue
+        if held is None:
+            line = line.lstrip()
+        else:
+            yield held
+            for _ in range(blank_run):
+                yield ''
+        held = line
+        blank_run = 0
+    yield held.rstrip() if held is not None else ''
+
+
+class InlineTokens:
+    """Lexed line: the space-separated tokens plus parallel arrays of core offsets.
+
+    The core of token i is tokens[i][core_start[i]:core_end[i]]; what lies
+    before and after it is punctuation. Tokens containing a newline keep the
+    regex semantics of the original tokenizer and are listed in legacy as
+    (prefix, core, suffix) instead. Tokens are str.split substrings, and no
+    token kinds are recorded: whether a core is math is up to the caller.
+    """
+    __slots__ = ('tokens', 'core_start', 'core_end', 'legacy')
+
+    def __init__(self, tokens: List[str], core_start: List[int], core_end: List[int], legacy: dict):
+        self.tokens = tokens
+        self.core_start = core_start
+        self.core_end = core_end
+        self.legacy = legacy
+
+
+def _legacy_split(token: str) -> Tuple[str, str, str]:
+    """Splits a token containing newlines the way the original punctuation regexes did.
+
+    Their '.' stopped at newlines: after a punctuation prefix only the text
+    up to the first newline is kept, and the suffix is peeled off the last
+    line (ignoring one trailing newline, as '$' did). Plain string scans
+    replace the lazy suffix pattern, which was quadratic in the line length.
+    """
+    body = token.lstrip(TOKEN_PUNCT)
+    prefix = token[:len(token) - len(body)]
+    if prefix:
+        body = body.partition('\n')[0]
+
+    # 1. Punctuation suffix of the last line
+    end = len(body) - 1 if body.endswith('\n') else len(body)
+    core_end = len(body[:end].rstrip(TOKEN_PUNCT))
+    if core_end == end:
+        core, suffix = body, ""
+    else:
+        core, suffix = body[body.rfind('\n', 0, end) + 1:core_end], body[core_end:end]
+
+    # 2. Balance: hand closing brackets the core still needs back from the suffix
+    for opening, closing in (('(', ')'), ('[', ']')):
+        depth = core.count(opening) - core.count(closing)
+        if depth > 0 and suffix.startswith(closing):
+            moved = min(depth, len(suffix) - len(suffix.lstrip(closing)))
+            core, suffix = core + suffix[:moved], suffix[moved:]
+    return prefix, core, suffix
+
+
+def lex_inline(line: str, deadline: Optional[_Deadline] = None) -> InlineTokens:
+    """Splits a line into tokens and locates each token's core in one pass.
+
+    Leading and trailing TOKEN_PUNCT runs are peeled off, then closing
+    brackets the core still needs are handed back to it from the suffix
+    ("f(x))." has core "f(x)" and suffix ").").
+    """
+    tokens = line.split(' ')
+    core_start = []
+    core_end = []
+    legacy = {}
+    indexed = enumerate(tokens)
+    if deadline is not None:
+        indexed = deadline.iterate(indexed, DEADLINE_STRIDE)
+    for i, token in indexed:
+        size = len(token)
+        start = 0
+        end = size
+        if size:
+            if '\n' in token:
+                legacy[i] = _legacy_split(token)
+            else:
+                # 1. Punctuation
+                if token[0] in TOKEN_PUNCT:
+                    start = size - len(token.lstrip(TOKEN_PUNCT))
+                if token[-1] in TOKEN_PUNCT:
+                    end = max(len(token.rstrip(TOKEN_PUNCT)), start)
+                # 2. Balance
+                if end < size:
+                    depth = token.count('(', start, end) - token.count(')', start, end)
+                    while depth > 0 and end < size and token[end] == ')':
+                        end += 1
+                        depth -= 1
+                    depth = token.count('[', start, end) - token.count(']', start, end)
+                    while depth > 0 and end < size and token[end] == ']':
+                        end += 1
+                        depth -= 1
+        core_start.append(start)
+        core_end.append(end)
+    return InlineTokens(tokens, core_start, core_end, legacy)
+
+
+def split_blocks(lines: Iterable[str]) -> Iterator[List[str]]:
+    """Groups body lines into blocks whose LaTeX does not depend on their neighbours.
+
+    Runs of list items and tab-separated rows form one block (lists stay
+    open across tables); every other line is a block of its own.
+    """
+    run = []
+    for line in lines:
+        stripped = line.strip()
+        if '\t' in stripped or LIST_ITEM_PATTERN.match(stripped):
+            run.append(line)
+            continue
+        if run:
+            yield run
+            run = []
+        yield [line]
+    if run:
+        yield run
+
+
+def chunk_blocks(lines: Iterable[str], max_lines: int) -> Iterator[List[str]]:
+    """Packs consecutive split_blocks into chunks of about max_lines lines (never splitting a block)."""
+    chunk = []
+    for block in split_blocks(lines):
+        chunk.extend(block)
+        if len(chunk) >= max_lines:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class TranspileRules:
+    """Immutable snapshot of the transpiler settings with everything derived from them precompiled.
+
+    Build with compile_rules(), which interns snapshots so jobs with equal
+    settings share one. Hashable and compared by settings; nothing in it
+    changes after construction, so one snapshot can serve any number of
+    threads. Token caches belong to the transpilers using it, not to the rules.
+    """
+    __slots__ = ('key', 'section_id', 'subsection_id', 'include_title', 'anchors', 'primers',
+                 'lexicon_path', 'table_segment_rows', 'lexicon_stamp', 'lexicon', 'math_table', 'math_multi_char',
+                 'math_token_detector', 'math_line_detector', 'text_table', '_hash')
+
+    def __init__(self, key: tuple):
+        (section_id, subsection_id, include_title, anchors, primers, lexicon_path, table_segment_rows,
+         lexicon_stamp) = key
+        lexicon = None
+        if lexicon_path:
+            from lexicon import open_lexicon
+            lexicon = open_lexicon(lexicon_path)
+
+        # 1. Math translation table: single characters in one pass, multi-character keys replaced first
+        table = {}
+        multi_char = []
+        for char, command in MATH_MAP.items():
+            if len(char) == 1:
+                table[ord(char)] = f" {command} "
+            else:
+                multi_char.append((char, f" {command} "))
+        for char, escaped in MATH_ESCAPES.items():
+            table[ord(char)] = escaped
+
+        # 2. Symbol detectors: math_map keys plus the token/line characters and the primers
+        symbols = [p for p in primers if p]
+        token_detector = _symbol_detector([*MATH_MAP, *MATH_TOKEN_CHARS, *symbols])
+        line_detector = _symbol_detector([*MATH_MAP, *MATH_LINE_CHARS, *symbols])
+
+        # 3. No escape contains a character escaped after it, so one table pass equals sequential replaces
+        text_table = {ord(char): escaped for char, escaped in TEXT_SPECIAL_CHARS.items()}
+
+        for name, value in (('key', key), ('section_id', section_id), ('subsection_id', subsection_id),
+                            ('include_title', include_title), ('anchors', anchors), ('primers', primers),
+                            ('lexicon_path', lexicon_path), ('table_segment_rows', table_segment_rows),
+                            ('lexicon_stamp', lexicon_stamp), ('lexicon', lexicon), ('math_table', table),
+                            ('math_multi_char', tuple(multi_char)), ('math_token_detector', token_detector),
+                            ('math_line_detector', line_detector), ('text_table', text_table),
+                            ('_hash', hash(key))):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TranspileRules is immutable; use compile_rules() for other settings")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return isinstance(other, TranspileRules) and self.key == other.key
+
+    def __repr__(self):
+        return f"TranspileRules({self.settings()!r})"
+
+    def settings(self) -> dict:
+        """The settings dict these rules were compiled from (as taken by compile_rules)."""
+        return {
+            'section_id': self.section_id,
+            'subsection_id': self.subsection_id,
+            'include_title': self.include_title,
+            'anchors': sorted(self.anchors - BASE_ANCHORS),
+            'primers': list(self.primers),
+            'lexicon': self.lexicon_path,
+            'table_segment_rows': self.table_segment_rows,
         }
 
+
+def rules_key(settings: dict) -> tuple:
+    """Normalised, hashable form of a settings dict (unknown keys are ignored).
+
+    It includes the lexicon file's stamp, so a lexicon rebuilt on disk gets
+    new rules (and a fresh token cache) the next time its settings are compiled.
+    Raises ValueError for a negative table_segment_rows.
+    """
+    table_segment_rows = int(settings.get('table_segment_rows') or 0)
+    if table_segment_rows < 0:
+        raise ValueError(f"table_segment_rows must be 0 (no split) or more, not {table_segment_rows}")
+    lexicon_path = settings.get('lexicon') or None
+    lexicon_stamp = None
+    if lexicon_path:
+        from lexicon import lexicon_stamp as stamp_of
+        lexicon_stamp = stamp_of(lexicon_path)
+    return (
+        settings.get('section_id', SECTION_ID),
+        settings.get('subsection_id', SUBSECTION_ID),
+        bool(settings.get('include_title', True)),
+        # User anchors are layered over the base set
+        BASE_ANCHORS.union(settings.get('anchors') or ()),
+        tuple(settings.get('primers') or ()),
+        lexicon_path,
+        # Rows per xltabular before a long table is split (0: never)
+        table_segment_rows,
+        lexicon_stamp,
+    )
+
+
+_interned_rules = LRUCache(INTERNED_RULES)
+
+
+def compile_rules(settings: Optional[dict] = None) -> TranspileRules:
+    """Returns the interned rule snapshot for settings (the dict update_settings takes).
+
+    Missing keys take their defaults. Equal settings give the same object
+    while it stays among the INTERNED_RULES most recently requested; two
+    threads racing on new settings may each build one, which is harmless.
+    """
+    key = rules_key(settings or {})
+    rules = _interned_rules.get(key)
+    if rules is None:
+        rules = TranspileRules(key)
+        _interned_rules.put(key, rules)
+    return rules
+
+
+# Worker-side transpiler for transpile_parallel; its token cache stays warm while the settings do
+_chunk_transpiler: Optional['LatexTranspiler'] = None
+
+
+def _transpile_chunk(settings: dict, text: str, at_end: bool, deadline: Optional[_Deadline] = None,
+                     profile: bool = False) -> Tuple[int, str, Optional[dict]]:
+    """Runs in a pool worker on newline-joined lines (cheaper to pickle than a list).
+
+    Returns the fragment count, the fragments joined by newlines and, when
+    profiling, the chunk's StageStats.as_dict().
+    """
+    global _chunk_transpiler
+    if _chunk_transpiler is None:
+        _chunk_transpiler = LatexTranspiler()
+    rules = compile_rules(settings)
+    _chunk_transpiler._apply_rules(rules)
+    transpiler = _chunk_transpiler.with_rules(rules)
+    transpiler.enable_profiling(profile)
+    transpiler._deadline = deadline
+    fragments = list(transpiler.iter_body(text.split('\n'), at_end))
+    stats = transpiler.stats.as_dict() if profile else None
+    return len(fragments), '\n'.join(fragments), stats
+
+
+class LatexTranspiler:
+    def __init__(self, cache_size: int = TOKEN_CACHE_SIZE, profile: bool = False):
+        self.cache_size = cache_size
+
+        # 1. Settings: the current TranspileRules, mirrored into attributes by _apply_rules
+        self.rules: Optional[TranspileRules] = None
+        # Token Cache: core token -> rendered math (None for prose) under the current rules
+        self.token_cache = LRUCache(cache_size)
+        self._apply_rules(compile_rules(None))
+
+        # 2. Block Cache for transpile_incremental: (block text, at_end) -> fragments
+        self._block_cache = {}
+        self._block_fingerprint = None
+
+        # 3. Profiling: StageStats of the last transpile when enabled, else None
+        self.stats: Optional[StageStats] = None
+        self.enable_profiling(profile)
+
+        # 4. Time Budget: the _Deadline of the running transpile (set on _with_deadline copies, and on
+        # self during a transpile_incremental with a budget, which cancel() can stop)
+        self._deadline: Optional[_Deadline] = None
+
+    def _apply_rules(self, rules: TranspileRules):
+        """Makes rules current, copying its fields to attributes for cheap access in the hot paths.
+
+        The token cache is cleared when the rules change, since its entries were rendered under the old ones.
+        """
+        if rules != self.rules:
+            self.token_cache.clear()
+        self.rules = rules
+        self.section_id = rules.section_id
+        self.subsection_id = rules.subsection_id
+        self.include_title = rules.include_title
+        self.table_segment_rows = rules.table_segment_rows
+        # Base set plus the user's anchors; the optional lexicon.Lexicon is consulted after them
+        self.english_anchors = rules.anchors
+        self.lexicon = rules.lexicon
+        # Math Primers: substrings that mark a token (or line) as math, like math_map symbols
+        self.math_primers = rules.primers
+        self._math_table = rules.math_table
+        self._math_multi_char = rules.math_multi_char
+        self._math_token_detector = rules.math_token_detector
+        self._math_line_detector = rules.math_line_detector
+        self._text_table = rules.text_table
+
+    def enable_profiling(self, enabled: bool = True):
+        """Times every stage in PROFILED_STAGES; stats are reset at the start of each transpile.
+
+        Timed wrappers are installed as instance attributes shadowing the
+        methods, so with profiling off the class methods run untouched.
+        """
+        for stage in PROFILED_STAGES:
+            self.__dict__.pop(stage, None)
+        if not enabled:
+            self.stats = None
+            return
+        self.stats = StageStats()
+        for stage in PROFILED_STAGES:
+            setattr(self, stage, _timed(self.stats, stage, getattr(self, stage)))
+
     def update_settings(self, settings_dict):
-        """Updates internal parameters based on GUI input."""
-        if 'anchors' in settings_dict and settings_dict['anchors']:
-            # Combine default anchors with user provided ones
-            self.english_anchors.update(set(settings_dict['anchors']))
-            
-        self.section_id = settings_dict.get('section_id', self.section_id)
-        self.subsection_id = settings_dict.get('subsection_id', self.subsection_id)
-        self.include_title = settings_dict.get('include_title', self.include_title)
+        """Updates internal parameters based on GUI input (keys left out keep their value).
+
+        Switches this instance to another rule snapshot; to transpile with
+        other settings without changing shared state, use transpile(text, rules).
+        """
+        self._apply_rules(compile_rules({**self.rules.settings(), **settings_dict}))
+
+    def with_rules(self, rules: TranspileRules) -> 'LatexTranspiler':
+        """A cheap copy of this transpiler using rules; self is not modified.
+
+        The copy has its own block cache. With the same rules it shares
+        self's thread-safe token cache (and its counters), otherwise it gets
+        an empty one of its own; either way it may run concurrently with
+        other copies and with self. If self is profiling, the copy's stages
+        are timed into self.stats too.
+        """
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        for stage in PROFILED_STAGES:
+            view.__dict__.pop(stage, None)
+        view._block_cache = {}
+        view._block_fingerprint = None
+        if rules != self.rules:
+            view.token_cache = LRUCache(self.cache_size)
+        view._apply_rules(rules)
+        if self.stats is not None:
+            for stage in PROFILED_STAGES:
+                setattr(view, stage, _timed(self.stats, stage, getattr(view, stage)))
+        return view
+
+    def _with_deadline(self, deadline: _Deadline) -> 'LatexTranspiler':
+        """A with_rules copy bound by deadline."""
+        view = self.with_rules(self.rules)
+        view._deadline = deadline
+        return view
 
     def sanitize_text(self, text: str) -> str:
-        for char, escaped in self.text_special_chars.items():
-            text = text.replace(char, escaped)
-        return text
+        return text.translate(self._text_table)
 
     def transpile_math(self, text: str) -> str:
         """Converts raw string to LaTeX math, including subscript injection."""
 
-        # 0. PRE-SANITIZATION
-        text = text.replace('%', r'\%')
-        text = text.replace('#', r'\#')
-        text = text.replace('$', r'\$')
-        text = text.replace('&', r'\&') 
-        
-        # 1. Handle Functions First
-        text = re.sub(r'\bPr(?=[\[\(])', r'\\Pr', text)
-        text = re.sub(r'\blog(?=[\[\(])', r'\\log', text)
-        text = re.sub(r'\bsin(?=[\[\(])', r'\\sin', text)
-        text = re.sub(r'\bcos(?=[\[\(])', r'\\cos', text)
-        text = re.sub(r'\blim(?=[\[\(])', r'\\lim', text)
-
-        # --- Handle Domain Specific Operators (Enck/Deck) ---
-        text = re.sub(r'\b(Enc|Dec)k(?=\()', r'\\text{\1}_k', text)
-
-        # 2. Map Unicode Symbols
-        for char, command in self.math_map.items():
-            text = text.replace(char, f" {command} ")
-            
+        # 1. Handle Functions First (Pr, log, sin, cos, lim, Enck/Deck)
+        deadline = self._deadline
+        if '(' in text or '[' in text:
+            if deadline is None:
+                text = FUNCTION_PATTERN.sub(_function_sub, text)
+            else:
+                text = deadline.sub(FUNCTION_PATTERN, _function_sub, text, FUNCTION_REACH)
+
+        # 2. Map Unicode Symbols & Pre-Sanitize (%, #, $, &) in one table pass
+        for chars, command in self._math_multi_char:
+            text = text.replace(chars, command)
+        text = text.translate(self._math_table)
+
         # 3. Handle Square Roots
         if '√' in text:
-            text = re.sub(r'√(\w+)', r'\\sqrt{\1}', text)
-            text = re.sub(r'√', r'\\sqrt', text)
+            text = SQRT_ARG_PATTERN.sub(r'\\sqrt{\1}', text)
+            text = text.replace('√', r'\sqrt')
 
-        # 4. Automatic Subscripting
-        text = re.sub(r'(?<!\\)\b([a-zA-Z])(\d)\b', r'\1_\2', text)
-        
-        def two_letter_sub(match):
-            word = match.group(0)
-            if word in self.english_anchors or "Pr" in word:
-                return word
-            return f"{match.group(1)}_{match.group(2)}"
+        # 4. Automatic Subscripting (x1 -> x_1, ab -> a_b unless anchored)
+        if deadline is None:
+            text = SUBSCRIPT_PATTERN.sub(self._subscript_sub, text)
+        else:
+            text = deadline.sub(SUBSCRIPT_PATTERN, self._subscript_sub, text, SUBSCRIPT_REACH)
 
-        text = re.sub(r'(?<!\\)\b([a-zA-Z])([a-zA-Z])\b', two_letter_sub, text)
+        return ' '.join(text.split())
 
-        return re.sub(r'\s+', ' ', text).strip()
+    def _subscript_sub(self, match) -> str:
+        # A primer glued to letters is no word boundary: "wor@@ld" keeps "ld" whole
+        primers = self.math_primers
+        if primers:
+            text, start, end = match.string, match.start(), match.end()
+            if any(p and (text.endswith(p, 0, start) or text.startswith(p, end)) for p in primers):
+                return match.group(0)
+        if match.group(2):
+            return f"{match.group(1)}_{match.group(2)}"
+        word = match.group(0)
+        if self.is_anchor(word) or word == "Pr":
+            return word
+        return f"{match.group(1)}_{match.group(3)}"
+
+    def is_anchor(self, word: str) -> bool:
+        """True for words that force text mode (anchors first, then the lexicon)."""
+        return word in self.english_anchors or (self.lexicon is not None and word in self.lexicon)
 
     def is_math_token(self, token: str) -> bool:
         clean = token.strip(".,;:?!")
         if not clean: return False
         
-        if clean.lower() in self.english_anchors: return False
+        if self.is_anchor(clean.lower()): return False
 
         # Function Call Detection (e.g., Fk(, Gen()
-        if re.search(r'\b[A-Z][a-zA-Z0-9]*\(', clean):
+        if FUNCTION_CALL_PATTERN.search(clean):
             return True
 
-        math_chars = set(self.math_map.keys()) | {'=', '<', '>', '+', '◦', '·', '±', '^', '_', '|', '\\', '/'}
-        if any(c in clean for c in math_chars): return True
+        # Each scan below covers the whole token, which may be megabytes long
+        deadline = self._deadline
+        if deadline is not None: deadline.check()
+        if self._math_token_detector(clean): return True
 
-        if any(c.isdigit() for c in clean): return True
+        if deadline is not None: deadline.check()
+        if any(map(str.isdigit, clean)): return True
 
         if len(clean) == 1 and clean.isalpha():
             return clean not in ['a', 'A', 'I']
@@ -126,54 +779,66 @@ class LatexTranspiler:
 
         return False
 
+    def render_token(self, core: str) -> Optional[str]:
+        """Returns the LaTeX math for a token, or None if it is prose. Cached per token."""
+        rendered = self.token_cache.get(core, _MISSING)
+        if rendered is _MISSING:
+            rendered = self.transpile_math(core) if self.is_math_token(core) else None
+            self.token_cache.put(core, rendered)
+        return rendered
+
     def process_inline_math(self, line: str) -> str:
-        raw_tokens = line.split(' ')
-        output_tokens = []
-        
-        for i in range(len(raw_tokens)):
-            token = raw_tokens[i]
-            
-            # 1. Punctuation Stripping
-            prefix_match = re.match(r'^([.,;:?!()\[\]"\']+)(.*)', token)
-            prefix, body = prefix_match.groups() if prefix_match else ("", token)
-            
-            suffix_match = re.search(r'(.*?)([.,;:?!()\[\]"\']+)$', body)
-            core, suffix = suffix_match.groups() if suffix_match else (body, "")
-            
-            # 2. Balance Check
-            while core.count('(') > core.count(')') and suffix.startswith(')'):
-                core += ')'
-                suffix = suffix[1:]
-            while core.count('[') > core.count(']') and suffix.startswith(']'):
-                core += ']'
-                suffix = suffix[1:]
-
-            # 3. Logic Decision
-            is_math = False
-            
-            if core in ['an', 'a']:
-                next_is_math = False
-                if i + 1 < len(raw_tokens):
-                    next_token = raw_tokens[i+1].strip(".,;:?!")
-                    if any(c in next_token for c in {'=', '+', '≤', '≥', '>', '<', '⊕', '≈'}):
-                        next_is_math = True
-                is_math = next_is_math
+        lexed = lex_inline(line, self._deadline)
+        tokens, core_start, core_end, legacy = lexed.tokens, lexed.core_start, lexed.core_end, lexed.legacy
+        # Output is built from offsets into line: each run of prose between math tokens is escaped as one slice
+        pieces = []
+        prose_start = 0
+        position = 0
+        last = len(tokens) - 1
+        indexed = enumerate(tokens)
+        if self._deadline is not None:
+            indexed = self._deadline.iterate(indexed, DEADLINE_STRIDE)
+
+        for i, token in indexed:
+            token_start = position
+            position += len(token) + 1
+            if not token:
+                continue
+            if legacy and i in legacy:
+                prefix, core, suffix = legacy[i]
             else:
-                is_math = self.is_math_token(core)
+                start, end = core_start[i], core_end[i]
+                # The core is the token cache key and what transpile_math rewrites, so it is sliced
+                # out (most tokens have no punctuation and skip it)
+                core = token if start == 0 and end == len(token) else token[start:end]
+                prefix = suffix = None
 
-            # 4. Output Generation
-            if is_math:
-                tex_math = self.transpile_math(core)
-                output_tokens.append(f"{self.sanitize_text(prefix)}${tex_math}${self.sanitize_text(suffix)}")
+            # 1. Logic Decision
+            if core == 'a' or core == 'an':
+                tex_math = None
+                if i < last and any(c in tokens[i + 1] for c in ARTICLE_MATH_CHARS):
+                    tex_math = self.transpile_math(core)
             else:
-                output_tokens.append(self.sanitize_text(token))
-                
-        return " ".join(output_tokens)
+                tex_math = self.render_token(core)
+
+            # 2. Output Generation (punctuation never needs escaping)
+            if tex_math is not None:
+                if prefix is None:
+                    prefix, suffix = token[:start], token[end:]
+                if prose_start < token_start:
+                    pieces.append(self.sanitize_text(line[prose_start:token_start]))
+                pieces.append(f"{prefix}${tex_math}${suffix}")
+                prose_start = position - 1
+
+        if not pieces:
+            return self.sanitize_text(line)
+        pieces.append(self.sanitize_text(line[prose_start:]))
+        return ''.join(pieces)
 
     def format_list_content(self, raw_content: str) -> str:
         """Bold prefix before a colon if it appears within the first five words."""
         # Determine search boundary: end of the 5th word (if it exists)
-        word_spans = list(re.finditer(r'\S+', raw_content))
+        word_spans = list(islice(WORD_PATTERN.finditer(raw_content), 5))
         if not word_spans:
             return self.process_inline_math(raw_content)
 
@@ -196,11 +861,18 @@ class LatexTranspiler:
         return f"\\textbf{{{prefix_tex}}} {suffix_tex}"
 
     def is_math_line(self, line: str) -> bool:
-        words = re.findall(r'\b[a-zA-Z]{2,}\b', line.lower())
-        english_count = sum(1 for w in words if w in self.english_anchors)
-        if english_count >= 2: return False
-        strong_indicators = set(self.math_map.keys()) | {'=', '≤', '≥', '≠', '≈', '→', '<', '>'}
-        if any(c in line for c in strong_indicators): return True
+        # Stops at the second English word instead of collecting every word of the line
+        anchors, lexicon = self.english_anchors, self.lexicon
+        english_count = 0
+        matches = ENGLISH_WORD_PATTERN.finditer(line.lower())
+        if self._deadline is not None:
+            matches = self._deadline.iterate(matches, DEADLINE_STRIDE)
+        for match in matches:
+            word = match.group()
+            if word in anchors or (lexicon is not None and word in lexicon):
+                english_count += 1
+                if english_count >= 2: return False
+        if self._math_line_detector(line): return True
         return False
 
     def detect_structure(self, line: str) -> Tuple[str, str]:
@@ -213,81 +885,191 @@ class LatexTranspiler:
         if self.is_math_line(line): return ('math_display', line)
         
         # Priority 2: Standard Numbering (Academic Style)
-        header_match = re.match(r'^(\d+\.\d+(?:\.\d+)*)\s+(.*)', line)
         # The \.? allows for an optional trailing dot (e.g., matches "1.1." and "1.1")
-        header_match = re.match(r'^(\d+(?:\.\d+)+)\.?\s+(.*)', line)
+        header_match = HEADER_PATTERN.match(line)
         if header_match:
             numbering, title = header_match.group(1), header_match.group(2).strip()
             if numbering.endswith('.0'): return ('section', title)
             elif numbering.count('.') == 1: return ('subsection', title)
             return ('subsubsection', title)
             
-        if re.match(r'^\d+\.\s+', line): return ('enumerate', re.sub(r'^\d+\.\s+', '', line))
+        enum_match = ENUMERATE_PATTERN.match(line)
+        if enum_match: return ('enumerate', line[enum_match.end():])
         if line.startswith('- ') or line.startswith('* '): return ('itemize', line[2:].strip())
         if line: return ('paragraph', line)
         return ('empty', '')
 
     def generate_table_block(self, rows: List[str]) -> str:
-        if not rows: return ""
-        
+        return '\n'.join(self.iter_table_block(rows))
+
+    def iter_table_block(self, rows: List[str]) -> Iterator[str]:
+        """Yields the xltabular for tab-separated rows, TABLE_BATCH_ROWS rows per fragment.
+
+        Each distinct cell is rendered once per table. With the
+        table_segment_rows setting, long tables are split into several
+        xltabular environments of that many rows (same number, header
+        repeated), so pdflatex's work grows linearly with the rows.
+        """
+        if not rows: return
+
+        cells = {}
         header_cols = rows[0].split('\t')
-        num_cols = len(header_cols)
-        col_spec = "X" * num_cols
-        
-        safe_headers = [f"\\textbf{{{self.process_inline_math(h.strip())}}}" for h in header_cols]
+        col_spec = "X" * len(header_cols)
+        safe_headers = [f"\\textbf{{{cell}}}" for cell in self.render_table_cells(header_cols, cells)]
         header_row = " & ".join(safe_headers) + r' \\'
 
-        latex_block = []
-        latex_block.append(fr'\begin{{xltabular}}{{\textwidth}}{{@{{}}{col_spec}@{{}}}}')
-        latex_block.append(r'\caption{Auto-generated table} \\')
-        latex_block.append(r'\toprule')
-        latex_block.append(header_row)
-        latex_block.append(r'\midrule')
-        latex_block.append(r'\endfirsthead')
-        latex_block.append(r'\caption[]{Auto-generated table (continued)} \\')
-        latex_block.append(r'\toprule')
-        latex_block.append(header_row)
-        latex_block.append(r'\midrule')
-        latex_block.append(r'\endhead')
-        latex_block.append(r'\bottomrule')
-        latex_block.append(r'\endfoot')
-
-        for row in rows[1:]:
-            cols = row.split('\t')
-            safe_cols = [self.process_inline_math(c.strip()) for c in cols]
-            latex_block.append(" & ".join(safe_cols) + r' \\')
-            latex_block.append(r'\addlinespace')
-            
-        latex_block.append(r'\end{xltabular}')
-        return '\n'.join(latex_block)
+        body = rows[1:]
+        segment_rows = self.table_segment_rows or len(body) or 1
+        for segment_start in range(0, max(len(body), 1), segment_rows):
+            segment_end = min(segment_start + segment_rows, len(body))
+            latex_block = []
+            if segment_start:
+                # Every xltabular steps the table counter; continuations keep the table's number
+                latex_block.append(r'\addtocounter{table}{-1}')
+            latex_block.append(fr'\begin{{xltabular}}{{\textwidth}}{{@{{}}{col_spec}@{{}}}}')
+            if segment_start:
+                latex_block.append(r'\caption[]{Auto-generated table (continued)} \\')
+            else:
+                latex_block.append(r'\caption{Auto-generated table} \\')
+            latex_block.append(r'\toprule')
+            latex_block.append(header_row)
+            latex_block.append(r'\midrule')
+            latex_block.append(r'\endfirsthead')
+            latex_block.append(r'\caption[]{Auto-generated table (continued)} \\')
+            latex_block.append(r'\toprule')
+            latex_block.append(header_row)
+            latex_block.append(r'\midrule')
+            latex_block.append(r'\endhead')
+            latex_block.append(r'\bottomrule')
+            latex_block.append(r'\endfoot')
+            yield '\n'.join(latex_block)
+
+            for batch_start in range(segment_start, segment_end, TABLE_BATCH_ROWS):
+                if self._deadline is not None:
+                    self._deadline.check()
+                yield self.render_table_rows(body[batch_start:min(batch_start + TABLE_BATCH_ROWS, segment_end)], cells)
+            yield r'\end{xltabular}'
+
+    def table_fragments(self, rows: List[str]) -> Iterator[str]:
+        """iter_table_block as streamed by iter_body; profiled as one generate_table_block call per table."""
+        fragments = self.iter_table_block(rows)
+        if self.stats is not None:
+            return _timed_fragments(self.stats, 'generate_table_block', fragments)
+        return fragments
+
+    def render_table_rows(self, rows: List[str], cells: dict) -> str:
+        """LaTeX for a batch of table body rows; cells memoises rendered cells across batches."""
+        latex_rows = []
+        for row in rows:
+            latex_rows.append(" & ".join(self.render_table_cells(row.split('\t'), cells)) + ' \\\\\n\\addlinespace')
+        return '\n'.join(latex_rows)
+
+    def render_table_cells(self, cols: List[str], cells: dict) -> List[str]:
+        rendered = []
+        if self._deadline is not None:
+            cols = self._deadline.iterate(cols, DEADLINE_STRIDE)
+        for col in cols:
+            cell = cells.get(col)
+            if cell is None:
+                if len(cells) >= TABLE_CELL_MEMO:
+                    cells.clear()
+                cell = cells[col] = self.process_inline_math(col.strip())
+            rendered.append(cell)
+        return rendered
+
+    def transpile(self, raw_input: str, rules: Optional[TranspileRules] = None,
+                  budget: Optional[float] = None) -> str:
+        """Transpiles a whole document, with rules (see compile_rules) instead of the current settings if given.
+
+        With a budget in seconds, raises TranspileTimeout once it is used up.
+        """
+        if rules is not None:
+            return self.with_rules(rules).transpile(raw_input, budget=budget)
+        return '\n'.join(self.iter_transpile(raw_input.split('\n'), budget))
+
+    def transpile_stream(self, input_lines: Iterable[str], output_writer: TextIO,
+                         budget: Optional[float] = None) -> None:
+        """Writes the document to output_writer block by block, without buffering the input."""
+        separator = ''
+        for fragment in self.iter_transpile(input_lines, budget):
+            output_writer.write(separator + fragment)
+            separator = '\n'
+
+    def iter_transpile(self, input_lines: Iterable[str], budget: Optional[float] = None) -> Iterator[str]:
+        """Yields the LaTeX output fragments (joined by newlines) as each block completes."""
+        if budget is not None:
+            yield from self._with_deadline(_Deadline(budget)).iter_transpile(input_lines)
+            return
+        if self.stats is not None:
+            self.stats.reset()
+            start = time.perf_counter()
+        yield from LATEX_PREAMBLE
+
+        lines = _stripped_lines(input_lines)
+        if self._deadline is not None:
+            lines = self._deadline.iterate(lines)
 
-    def transpile(self, raw_input: str) -> str:
-        lines = raw_input.strip().split('\n')
-        
         # Extract Title (First Line)
-        title_text = lines.pop(0) if lines else "Untitled Document"
-        
-        latex_output = []
-        latex_output.append(r'\documentclass{article}')
-        latex_output.append(r'\usepackage{amsmath, amssymb}') 
-        latex_output.append(r'\usepackage[utf8]{inputenc}')
-        latex_output.append(r'\usepackage{xltabular}')
-        latex_output.append(r'\usepackage{booktabs}')
-        latex_output.append(r'\setlength{\parskip}{1em}')
-        
-        latex_output.append(fr'\title{{{self.process_inline_math(title_text)}}}')
-        latex_output.append(r'\author{}')
-        latex_output.append(r'\date{\today}')
-        
-        latex_output.append(r'\begin{document}')
-        
+        title_text = next(lines, "Untitled Document")
+        yield from self.iter_front_matter(title_text)
+
+        yield from self.iter_body(lines)
+        if self._deadline is not None:
+            self._deadline.check()
+
+        yield r'\end{document}'
+        if self.stats is not None:
+            self.stats.record('transpile', time.perf_counter() - start)
+
+    def transpile_sections(self, raw_input: str, part_prefix: str,
+                           budget: Optional[float] = None) -> Tuple[str, List[Tuple[str, str]]]:
+        """Splits the document into a master file and one \\include'd part per \\section.
+
+        Returns (master, [(part name, part content), ...]). Part names are
+        part_prefix-sNNN (no extension); part 0 holds the title and any text
+        before the first section. Each part starts on a new page, as \\include
+        requires, which lets a compile typeset only the parts that changed.
+        """
+        if budget is not None:
+            return self._with_deadline(_Deadline(budget)).transpile_sections(raw_input, part_prefix)
+        lines = _stripped_lines(raw_input.split('\n'))
+        if self._deadline is not None:
+            lines = self._deadline.iterate(lines)
+        title_text = next(lines, "Untitled Document")
+        front = list(self.iter_front_matter(title_text))
+        split_at = front.index(r'\begin{document}') + 1
+
+        part_fragments = [front[split_at:]]
+        for fragment in self.iter_body(lines):
+            if fragment.startswith('\\section{'):
+                part_fragments.append([])
+            part_fragments[-1].append(fragment)
+        if self._deadline is not None:
+            self._deadline.check()
+
+        parts = [(f"{part_prefix}-s{index:03d}", '\n'.join(fragments) + '\n')
+                 for index, fragments in enumerate(part_fragments) if fragments]
+        master = [*LATEX_PREAMBLE, *front[:split_at]]
+        master.extend(f'\\include{{{name}}}' for name, _ in parts)
+        master.append(r'\end{document}')
+        return '\n'.join(master) + '\n', parts
+
+    def iter_front_matter(self, title_text: str) -> Iterator[str]:
+        yield fr'\title{{{self.process_inline_math(title_text)}}}'
+        yield r'\author{}'
+        yield r'\date{\today}'
+
+        yield r'\begin{document}'
+
         # Dynamic Title Toggle
         if self.include_title:
-            latex_output.append(r'\maketitle')
-        
+            yield r'\maketitle'
+
+    def iter_body(self, lines: Iterable[str], at_end: bool = True) -> Iterator[str]:
+        """Yields the body fragments for lines; at_end=False flushes as if more text followed."""
         table_buffer = []
         current_list_type: Optional[str] = None
-        
+
         for line in lines:
             line = line.strip()
 
@@ -295,7 +1077,7 @@ class LatexTranspiler:
                 table_buffer.append(line)
                 continue
             elif table_buffer:
-                latex_output.append(self.generate_table_block(table_buffer))
+                yield from self.table_fragments(table_buffer)
                 table_buffer = []
 
             structure, raw_content = self.detect_structure(line)
@@ -303,27 +1085,194 @@ class LatexTranspiler:
             if structure in ['itemize', 'enumerate']:
                 safe_content = self.format_list_content(raw_content)
                 if current_list_type and current_list_type != structure:
-                    latex_output.append(f'\\end{{{current_list_type}}}')
+                    yield f'\\end{{{current_list_type}}}'
                     current_list_type = None
                 if not current_list_type:
-                    latex_output.append(f'\\begin{{{structure}}}')
+                    yield f'\\begin{{{structure}}}'
                     current_list_type = structure
-                latex_output.append(f'    \\item {safe_content}')
+                yield f'    \\item {safe_content}'
                 continue
             elif current_list_type:
-                latex_output.append(f'\\end{{{current_list_type}}}')
+                yield f'\\end{{{current_list_type}}}'
                 current_list_type = None
 
             if structure == 'math_display':
-                latex_output.append(f'\\[ {self.transpile_math(raw_content)} \\]')
+                yield f'\\[ {self.transpile_math(raw_content)} \\]'
             elif structure == 'paragraph':
-                latex_output.append(f'{self.process_inline_math(raw_content)}\n\n')
+                yield f'{self.process_inline_math(raw_content)}\n\n'
             elif structure.startswith('section') or structure.startswith('sub'):
                 safe_content = self.process_inline_math(raw_content) 
-                latex_output.append(f'\\{structure}{{{safe_content}}}')
+                yield f'\\{structure}{{{safe_content}}}'
 
-        if current_list_type: latex_output.append(f'\\end{{{current_list_type}}}')
-        if table_buffer: latex_output.append(self.generate_table_block(table_buffer))
-            
+        # The next (non-table, non-list) line would flush the table before closing the list
+        if not at_end and table_buffer:
+            yield from self.table_fragments(table_buffer)
+            table_buffer = []
+        if current_list_type: yield f'\\end{{{current_list_type}}}'
+        if table_buffer: yield from self.table_fragments(table_buffer)
+
+    def current_settings(self) -> dict:
+        """The settings dict that makes a fresh instance behave like this one (see update_settings)."""
+        return self.rules.settings()
+
+    def transpile_parallel(self, raw_input: str, jobs: Optional[int] = None, executor=None,
+                           min_chunk_lines: int = 2000, budget: Optional[float] = None) -> str:
+        """Same output as transpile(), with the body transpiled in chunks by a process pool.
+
+        Chunks end on split_blocks boundaries, so no list or table run is cut.
+        jobs is the number of workers (default: CPU count); to reuse workers
+        across calls, pass a concurrent.futures executor along with its
+        worker count. Documents too small for more than one chunk are
+        transpiled serially. With a budget, TranspileTimeout is raised once it
+        is used up; pending chunks are cancelled and running ones stop at
+        their next check.
+        """
+        jobs = jobs or os.cpu_count() or 1
+        # A few chunks per worker evens out the load
+        chunk_lines = max(min_chunk_lines, -(-raw_input.count('\n') // (jobs * 4)))
+        return '\n'.join(self.iter_parallel(raw_input.split('\n'), jobs, executor, chunk_lines, budget))
+
+    def transpile_parallel_stream(self, input_lines: Iterable[str], output_writer: TextIO,
+                                  jobs: Optional[int] = None, executor=None, chunk_lines: int = 2000,
+                                  budget: Optional[float] = None) -> None:
+        """Writes the same output as transpile_stream(), with the body transpiled by a process pool (see iter_parallel)."""
+        separator = ''
+        for fragment in self.iter_parallel(input_lines, jobs, executor, chunk_lines, budget):
+            output_writer.write(separator + fragment)
+            separator = '\n'
+
+    def iter_parallel(self, input_lines: Iterable[str], jobs: Optional[int] = None, executor=None,
+                      chunk_lines: int = 2000, budget: Optional[float] = None) -> Iterator[str]:
+        """Yields the output of iter_transpile() (joined by newlines), the body in chunks transpiled by a pool.
+
+        Input is read lazily, chunk_lines lines (rounded up to whole blocks)
+        at a time; at most IN_FLIGHT_PER_JOB chunks per worker are pending
+        and results are yielded in input order, so memory stays bounded.
+        Inputs of a single chunk are transpiled serially. When profiling,
+        the stage stats of all chunks are merged into self.stats (their
+        times summed over the workers).
+        """
+        jobs = jobs or os.cpu_count() or 1
+        if jobs <= 1:
+            yield from self.iter_transpile(input_lines, budget)
+            return
+        if self.stats is not None:
+            self.stats.reset()
+            start = time.perf_counter()
+        deadline = _Deadline(budget) if budget is not None else None
+        yield from LATEX_PREAMBLE
+
+        lines = _stripped_lines(input_lines)
+        title_text = next(lines, "Untitled Document")
+        yield from self.iter_front_matter(title_text)
+
+        chunks = chunk_blocks(lines, chunk_lines)
+        chunk = next(chunks, [])
+        following = next(chunks, None)
+        if following is None:
+            transpiler = self if deadline is None else self._with_deadline(deadline)
+            yield from transpiler.iter_body(chunk)
+        else:
+            yield from self._pool_chunks(chunk, following, chunks, jobs, executor, deadline)
+        if deadline is not None:
+            deadline.check()
+
+        yield r'\end{document}'
+        if self.stats is not None:
+            self.stats.record('transpile', time.perf_counter() - start)
+
+    def _pool_chunks(self, chunk: List[str], following: Optional[List[str]], chunks: Iterator[List[str]],
+                     jobs: int, executor, deadline: Optional[_Deadline]) -> Iterator[str]:
+        """Pipelines chunks through the pool for iter_parallel, yielding their output in order."""
+        from concurrent.futures import TimeoutError as FutureTimeout
+        settings = self.current_settings()
+        profile = self.stats is not None
+        own_pool = executor is None
+        if own_pool:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=jobs)
+        pending = deque()
+        try:
+            while chunk is not None or pending:
+                if chunk is not None and len(pending) < jobs * IN_FLIGHT_PER_JOB:
+                    if deadline is not None:
+                        deadline.check()
+                    pending.append(executor.submit(_transpile_chunk, settings, '\n'.join(chunk),
+                                                   following is None, deadline, profile))
+                    chunk, following = following, next(chunks, None) if following is not None else None
+                    continue
+                timeout = None if deadline is None else max(0.0, deadline.at - time.monotonic())
+                try:
+                    count, text, stats = pending.popleft().result(timeout)
+                except FutureTimeout:
+                    raise TranspileTimeout(f"Transpile exceeded its time budget of {deadline.seconds:g} s") from None
+                if stats:
+                    self.stats.merge(stats)
+                if count:
+                    yield text
+        finally:
+            for future in pending:
+                future.cancel()
+            if own_pool:
+                executor.shutdown()
+
+    def settings_fingerprint(self) -> int:
+        """Hash of every setting that affects body output (not the title toggle)."""
+        rules = self.rules
+        return hash((rules.section_id, rules.subsection_id, rules.anchors, rules.lexicon_path, rules.primers,
+                     rules.table_segment_rows, rules.lexicon_stamp))
+
+    def cancel(self):
+        """Stops a transpile_incremental with a budget running on this instance (from another thread).
+
+        It raises TranspileCancelled at its next deadline check, leaving the
+        block cache as it was before the call.
+        """
+        deadline = self._deadline
+        if deadline is not None:
+            deadline.cancel()
+
+    def transpile_incremental(self, raw_input: str, budget: Optional[float] = None) -> str:
+        """Same output as transpile(), but only re-renders blocks changed since the last call.
+
+        Block output is cached by block text; the cache is dropped when the
+        settings fingerprint changes and only keeps blocks of the latest input.
+        With a budget in seconds (math.inf for none, but cancellable), raises
+        TranspileTimeout once it is used up; cancel() stops it early.
+        """
+        if budget is not None:
+            self._deadline = _Deadline(budget)
+            try:
+                return self.transpile_incremental(raw_input)
+            finally:
+                self._deadline = None
+        if self.stats is not None:
+            self.stats.reset()
+            start = time.perf_counter()
+        lines = _stripped_lines(raw_input.split('\n'))
+        title_text = next(lines, "Untitled Document")
+        latex_output = list(LATEX_PREAMBLE)
+        latex_output.extend(self.iter_front_matter(title_text))
+
+        fingerprint = self.settings_fingerprint()
+        previous = self._block_cache if fingerprint == self._block_fingerprint else {}
+        current = {}
+        blocks = list(split_blocks(lines))
+        last = len(blocks) - 1
+        for index, block in enumerate(blocks):
+            at_end = index == last
+            key = ('\n'.join(block), at_end)
+            fragments = previous.get(key)
+            if fragments is None:
+                fragments = current.get(key)
+            if fragments is None:
+                fragments = tuple(self.iter_body(block, at_end))
+            current[key] = fragments
+            latex_output.extend(fragments)
+
+        self._block_cache = current
+        self._block_fingerprint = fingerprint
         latex_output.append(r'\end{document}')
+        if self.stats is not None:
+            self.stats.record('transpile', time.perf_counter() - start)
         return '\n'.join(latex_output)
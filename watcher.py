@@ -0,0 +1,326 @@
+"""Watch-folder mode: transpile (and compile) exports as soon as they land in a directory.
+
+Usage:
+    python cli.py --watch exports/ -o out/ --pdf
+
+Changes are picked up with inotify on Linux (through ctypes, no extra
+dependency) and by polling elsewhere or with --poll (network shares often
+deliver no inotify events). A file is processed once it has been quiet for
+the debounce delay, only if its content hash changed since it was last
+processed, and never twice at the same time; at most `jobs` files are in
+flight while later changes wait, coalesced per file.
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Quiet time after the last write before a file is picked up
+DEBOUNCE_SECONDS = 1.0
+
+# Rescan interval of the polling watcher
+POLL_INTERVAL = 1.0
+
+# Longest sleep of the main loop, so stop requests and finished jobs are noticed promptly
+TICK_SECONDS = 0.1
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = getattr(os, 'O_NONBLOCK', 0)
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def scan_tree(roots: Iterable[str], extension: str) -> Dict[str, Tuple[int, int]]:
+    """(mtime_ns, size) of every matching file under roots."""
+    found = {}
+    for root in roots:
+        for directory, _, files in os.walk(root):
+            for name in files:
+                if name.endswith(extension):
+                    path = os.path.join(directory, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found[path] = (st.st_mtime_ns, st.st_size)
+    return found
+
+
+class PollingWatcher:
+    """Finds changed files by rescanning the tree; works on any file system."""
+
+    def __init__(self, roots: List[str], extension: str, interval: float = POLL_INTERVAL):
+        self.roots = roots
+        self.extension = extension
+        self.interval = interval
+        self.snapshot = scan_tree(roots, extension)
+        self.next_scan = time.monotonic() + interval
+
+    def changes(self, timeout: float) -> Set[str]:
+        """Waits up to timeout and returns the files created or modified since the last call."""
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        if wait > 0:
+            time.sleep(wait)
+        self.next_scan = time.monotonic() + self.interval
+        snapshot = scan_tree(self.roots, self.extension)
+        changed = {path for path, stamp in snapshot.items() if self.snapshot.get(path) != stamp}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify watches on every directory of the tree, added as directories appear."""
+
+    def __init__(self, roots: List[str], extension: str):
+        self.extension = extension
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        self.directories: Dict[int, str] = {}
+        for root in roots:
+            self._watch_tree(root)
+
+    def _watch_tree(self, root: str) -> Set[str]:
+        """Watches root and its subdirectories; returns the matching files already in them."""
+        found = set()
+        for directory, _, files in os.walk(root):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+            self.directories[wd] = directory
+            found.update(os.path.join(directory, name) for name in files if name.endswith(self.extension))
+        return found
+
+    def changes(self, timeout: float) -> Set[str]:
+        """Waits up to timeout and returns the files created or modified since the last call."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+                offset += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped: report everything, the content hash filters the rest
+                    changed.update(scan_tree(self.roots, self.extension))
+                    continue
+                directory = self.directories.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        changed.update(self._watch_tree(path))
+                elif path.endswith(self.extension):
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_watcher(roots: List[str], extension: str, poll: bool = False):
+    """inotify where available, otherwise (or when asked to) polling."""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(roots, extension)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, extension)
+
+
+class Debouncer:
+    """Holds each path until no new event has arrived for `delay` seconds."""
+
+    def __init__(self, delay: float = DEBOUNCE_SECONDS):
+        self.delay = delay
+        self.deadlines: Dict[str, float] = {}
+
+    def touch(self, path: str, now: Optional[float] = None):
+        self.deadlines[path] = (time.monotonic() if now is None else now) + self.delay
+
+    def next_deadline(self, busy: Set[str]) -> Optional[float]:
+        return min((d for p, d in self.deadlines.items() if p not in busy), default=None)
+
+    def ready(self, now: float, busy: Set[str], limit: int) -> List[str]:
+        """Pops up to limit quiet paths, oldest first, leaving busy ones for later."""
+        due = sorted((deadline, path) for path, deadline in self.deadlines.items()
+                     if deadline <= now and path not in busy)
+        paths = [path for _, path in due[:max(limit, 0)]]
+        for path in paths:
+            del self.deadlines[path]
+        return paths
+
+    def __len__(self):
+        return len(self.deadlines)
+
+
+def content_digest(path: str) -> str:
+    """SHA-256 of the file, read in chunks so large exports are never held in memory whole."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stale_inputs(roots: List[str], extension: str, output_for: Callable[[str], str]) -> List[str]:
+    """Files whose output is missing or older than they are (picked up at start-up)."""
+    stale = []
+    for path, (mtime_ns, _) in scan_tree(roots, extension).items():
+        try:
+            if os.stat(output_for(path)).st_mtime_ns >= mtime_ns:
+                continue
+        except OSError:
+            pass
+        stale.append(path)
+    return sorted(stale)
+
+
+def _init_watch_worker(settings: dict):
+    # Ctrl-C reaches the whole process group; only the watcher should handle it
+    from cli import _init_worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(settings)
+
+
+def job_result(future, source: str, tex_path: str):
+    """The future's JobResult, or a failed one if the job itself raised (e.g. its worker died)."""
+    from cli import JobResult
+    try:
+        return future.result()
+    except Exception as e:
+        return JobResult(source, tex_path, None, 0, 0.0, 0.0, f"{type(e).__name__}: {e}")
+
+
+def watch_folders(roots: List[str], make_job: Callable[[str], tuple], output_for: Callable[[str], str],
+                  settings: dict, report: Callable, jobs: int = 1, debounce: float = DEBOUNCE_SECONDS,
+                  poll: bool = False, extension: str = '.txt',
+                  stop: Optional[threading.Event] = None) -> Tuple[int, int]:
+    """Processes files under roots as they change until stop is set (or Ctrl-C).
+
+    make_job turns a path into the cli.convert_file arguments; each result
+    is passed to report. A file whose output another existing file already
+    writes is reported as failed instead of converted. Returns (files
+    processed, unchanged files skipped).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    from cli import JobResult, convert_file
+
+    stop = stop or threading.Event()
+    watcher = open_watcher(roots, extension, poll)
+    debouncer = Debouncer(debounce)
+    digests: Dict[str, str] = {}
+    owners: Dict[str, str] = {}  # output path -> the source converted to it
+    in_flight = {}
+    processed = skipped = 0
+
+    # Exports that arrived while nobody was watching are due straight away
+    start = time.monotonic() - debounce
+    for path in stale_inputs(roots, extension, output_for):
+        debouncer.touch(path, start)
+
+    def start_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=jobs, initializer=_init_watch_worker, initargs=(settings,))
+
+    pool = start_pool()
+    broken = False
+    try:
+        while not stop.is_set():
+            # 1. Collect finished jobs; a failed file is retried on its next change
+            for future in [f for f in in_flight if f.done()]:
+                path, digest, tex_path = in_flight.pop(future)
+                broken = broken or isinstance(future.exception(), BrokenProcessPool)
+                result = job_result(future, path, tex_path)
+                if result.error:
+                    digests.pop(path, None)
+                processed += 1
+                report(result)
+            if broken and not in_flight:
+                # A worker died (and took the pool with it): carry on with a fresh one
+                pool.shutdown(wait=False)
+                pool, broken = start_pool(), False
+
+            # 2. Start quiet files, never more than `jobs` at once nor the same file twice
+            now = time.monotonic()
+            busy = {path for path, _, _ in in_flight.values()}
+            for path in debouncer.ready(now, busy, jobs - len(in_flight)):
+                try:
+                    digest = content_digest(path)
+                except OSError:
+                    continue  # Deleted or renamed again before it settled
+                if digests.get(path) == digest:
+                    skipped += 1
+                    continue
+                job = make_job(path)
+                tex_path = job[1]
+                output = os.path.normcase(os.path.abspath(tex_path))
+                owner = owners.get(output, path)
+                if owner != path and os.path.exists(owner):
+                    processed += 1
+                    report(JobResult(path, tex_path, None, 0, 0.0, 0.0, f"{owner} already writes {tex_path}"))
+                    continue
+                owners[output] = path
+                digests[path] = digest
+                try:
+                    future = pool.submit(convert_file, *job)
+                except BrokenProcessPool:
+                    broken = True
+                    digests.pop(path, None)
+                    debouncer.touch(path)  # Retried once the pool has been restarted
+                    continue
+                in_flight[future] = (path, digest, tex_path)
+
+            # 3. Wait for events until the next debounce deadline or until a job may have finished
+            busy = {path for path, _, _ in in_flight.values()}
+            if len(in_flight) >= jobs:
+                timeout = TICK_SECONDS
+            else:
+                timeout = TICK_SECONDS * 5
+                deadline = debouncer.next_deadline(busy)
+                if deadline is not None:
+                    timeout = max(0.0, min(timeout, deadline - time.monotonic()))
+                if in_flight:
+                    timeout = min(timeout, TICK_SECONDS)
+            for path in watcher.changes(timeout):
+                debouncer.touch(path)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future, (path, _, tex_path) in in_flight.items():
+            if future.done() and not future.cancelled():
+                processed += 1
+                report(job_result(future, path, tex_path))
+    return processed, skipped